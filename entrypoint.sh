@@ -13,6 +13,9 @@ fi
 echo "Running migrations..."
 python manage.py migrate --noinput || true
 
+echo "Creating cache table..."
+python manage.py createcachetable || true
+
 echo "Collecting static files..."
 python manage.py collectstatic --noinput || true
 
@@ -0,0 +1,105 @@
+import random
+import threading
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connection, transaction
+from django.db.models import Sum
+
+from bookings import reservations
+from bookings.models import Booking, Customer
+from tours.models import TourDate, TourPackage
+
+
+class Command(BaseCommand):
+    help = (
+        'Hammer one tour date with concurrent bookings and report throughput and '
+        'oversell count. Works on a scratch tour package that is deleted afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--attempts', type=int, default=25, help='Booking attempts per thread')
+        parser.add_argument('--seats', type=int, default=100, help='Seats on the tour date')
+        parser.add_argument('--hold-ratio', type=float, default=0.5, help='Share of attempts that hold seats first')
+        parser.add_argument(
+            '--naive', action='store_true',
+            help='Use the old read, subtract and save approach for comparison'
+        )
+
+    def handle(self, *args, **options):
+        package = TourPackage.objects.create(
+            name='Reservation benchmark', description='', duration=1, price=100, max_participants=options['seats'],
+            difficulty='easy', location='Benchmark', included_services='', excluded_services='', itinerary='',
+            is_active=False,
+        )
+        tour_date = TourDate.objects.create(
+            tour_package=package, start_date=date.today() + timedelta(days=30),
+            end_date=date.today() + timedelta(days=31), available_spots=options['seats'],
+        )
+        user = User.objects.create(username=f'reservation-benchmark-{time.time_ns()}')
+        customer = Customer.objects.create(user=user)
+
+        stats = {'booked': 0, 'rejected': 0, 'errors': 0}
+        lock = threading.Lock()
+
+        def worker(seed):
+            rng = random.Random(seed)
+            for _ in range(options['attempts']):
+                participants = rng.randint(1, 4)
+                try:
+                    if options['naive']:
+                        self._naive_booking(customer, tour_date.id, participants)
+                    else:
+                        self._booking(customer, user, tour_date.id, participants, rng.random() < options['hold_ratio'])
+                    outcome = 'booked'
+                except reservations.SeatsUnavailable:
+                    outcome = 'rejected'
+                except OperationalError:
+                    outcome = 'errors'
+                with lock:
+                    stats[outcome] += 1
+            connection.close()
+
+        threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(options['threads'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        sold = Booking.objects.filter(tour_date_id=tour_date.id).aggregate(seats=Sum('participants'))['seats'] or 0
+        remaining = TourDate.objects.get(pk=tour_date.id).available_spots
+        attempts = options['threads'] * options['attempts']
+
+        self.stdout.write(f"Backend:          {connection.vendor}")
+        self.stdout.write(f"Mode:             {'naive' if options['naive'] else 'reservation engine'}")
+        self.stdout.write(f"Attempts:         {attempts} ({options['threads']} threads)")
+        self.stdout.write(f"Booked:           {stats['booked']}, rejected: {stats['rejected']}, errors: {stats['errors']}")
+        self.stdout.write(f"Throughput:       {attempts / elapsed:.0f} attempts/s, {stats['booked'] / elapsed:.0f} bookings/s")
+        self.stdout.write(f"Seats sold:       {sold} of {options['seats']}, {remaining} left on the date")
+        oversold = max(0, sold - options['seats'])
+        drift = options['seats'] - sold - remaining
+        style = self.style.SUCCESS if not oversold and not drift else self.style.ERROR
+        self.stdout.write(style(f"Oversold seats:   {oversold}; counter drift: {drift}"))
+
+        package.delete()
+        user.delete()
+
+    def _booking(self, customer, user, tour_date_id, participants, hold_first):
+        hold = reservations.hold_seats(user, tour_date_id, participants) if hold_first else None
+        booking = Booking(customer=customer, tour_date_id=tour_date_id, participants=participants, total_price=100 * participants)
+        reservations.place_booking(booking, user, hold_id=hold.id if hold else None)
+
+    def _naive_booking(self, customer, tour_date_id, participants):
+        # The pre-reservation-engine book_tour flow
+        with transaction.atomic():
+            tour_date = TourDate.objects.get(pk=tour_date_id)
+            if tour_date.available_spots < participants:
+                raise reservations.SeatsUnavailable(tour_date.available_spots)
+            Booking.objects.create(customer=customer, tour_date=tour_date, participants=participants, total_price=100 * participants)
+            tour_date.available_spots -= participants
+            tour_date.save()
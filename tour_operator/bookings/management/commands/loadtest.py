@@ -0,0 +1,299 @@
+import random
+import re
+import statistics
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, Q, Sum
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from bookings.models import Booking, Customer, SeatHold
+from feedback.models import GuideFeedback, TourFeedback
+from guides import stats as guide_stats
+from guides.models import Guide, GuideAvailability
+from tour_operator import counters
+from tours.models import TourDate, TourPackage
+
+SCENARIOS = ['book', 'feedback', 'schedule']
+HOLD_INPUT = re.compile(rb'name="hold" value="(\d+)"')
+# endpoint -> the statuses of a request that worked; book_tour redirects away
+# from a sold-out date and re-renders its form when the seats run out
+EXPECTED = {
+    'book_tour GET': {200, 302},
+    'book_tour hold POST': {200, 302},
+    'book_tour POST': {200, 302},
+    'submit_feedback POST': {302},
+    'guide_schedule GET': {200},
+    'guide_schedule POST': {302},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a scratch dataset and run concurrent clients against book_tour, submit_feedback '
+        'and guide_schedule through the WSGI app, then report latency percentiles, throughput, '
+        'queries per request and invariant violations. Writes to the configured database; the '
+        'seeded rows are deleted afterwards unless --keep is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads')
+        parser.add_argument('--requests', type=int, default=50, help='Scenario iterations per client')
+        parser.add_argument('--tours', type=int, default=3)
+        parser.add_argument('--dates', type=int, default=2, help='Tour dates per tour')
+        parser.add_argument('--seats', type=int, default=20, help='Seats per tour date')
+        parser.add_argument('--guides', type=int, default=2)
+        parser.add_argument(
+            '--mix', default='book=6,feedback=2,schedule=2',
+            help='Relative weight of each scenario, e.g. book=1,feedback=0,schedule=0'
+        )
+        parser.add_argument('--host', default='localhost', help='Host header sent with each request (must be allowed)')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded data')
+
+    def handle(self, *args, **options):
+        weights = self._parse_mix(options['mix'])
+        self.prefix = f'loadtest-{time.time_ns()}'
+        data = self._seed(options)
+        self.stdout.write(
+            f"Seeded {len(data['tour_dates'])} tour dates x {options['seats']} seats, "
+            f"{options['clients']} customers, {options['guides']} guides"
+        )
+
+        samples = []
+        lock = threading.Lock()
+
+        def client_thread(index):
+            rng = random.Random(options['seed'] + index)
+            customer_user = data['customers'][index]
+            customer = Client(raise_request_exception=False, HTTP_HOST=options['host'])
+            customer.force_login(customer_user)
+            guide_user = data['guides'][index % len(data['guides'])]
+            guide = Client(raise_request_exception=False, HTTP_HOST=options['host'])
+            guide.force_login(guide_user)
+            pending_feedback = list(data['completed'][customer_user.pk])
+
+            def timed(label, client, method, path, payload=None):
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, payload or {})
+                    elapsed = time.perf_counter() - started
+                with lock:
+                    samples.append((label, elapsed, len(queries), response.status_code))
+                return response
+
+            for _ in range(options['requests']):
+                scenario = rng.choices(SCENARIOS, weights=[weights[name] for name in SCENARIOS])[0]
+                if scenario == 'book':
+                    tour_date_id = rng.choice(data['tour_dates'])
+                    path = f'/bookings/book/{tour_date_id}/'
+                    participants = rng.randint(1, 3)
+                    response = timed('book_tour GET', customer, 'get', path)
+                    # Half of the customers hold their seats before booking
+                    if response.status_code == 200 and rng.random() < 0.5:
+                        timed('book_tour hold POST', customer, 'post', path, {
+                            'action': 'hold', 'participants': participants, 'special_requests': '',
+                        })
+                        response = timed('book_tour GET', customer, 'get', path)
+                    hold = HOLD_INPUT.search(response.content) if response.status_code == 200 else None
+                    timed('book_tour POST', customer, 'post', path, {
+                        'participants': participants,
+                        'special_requests': '',
+                        'hold': hold.group(1).decode() if hold else '',
+                    })
+                elif scenario == 'feedback' and pending_feedback:
+                    # Submitting twice for the same booking exercises the duplicate guard
+                    booking_id = pending_feedback[0] if rng.random() < 0.2 else pending_feedback.pop(0)
+                    timed('submit_feedback POST', customer, 'post', f'/feedback/submit/{booking_id}/', {
+                        'overall_rating': 5, 'guide_rating': 4, 'accommodation_rating': 4,
+                        'value_for_money_rating': 4, 'comments': 'Load test', 'would_recommend': 'on',
+                        'suggestions': '', 'knowledge_rating': 5, 'communication_rating': 5,
+                        'professionalism_rating': 5,
+                    })
+                else:
+                    timed('guide_schedule GET', guide, 'get', '/guides/schedule/')
+                    timed('guide_schedule POST', guide, 'post', '/guides/schedule/', {
+                        'date': (date.today() + timedelta(days=rng.randint(0, 59))).isoformat(),
+                        'is_available': 'on' if rng.random() < 0.5 else '',
+                    })
+            connection.close()
+
+        threads = [threading.Thread(target=client_thread, args=(index,)) for index in range(options['clients'])]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        failures = self._report(samples, elapsed)
+        violations = self._check_invariants(data)
+        if not options['keep']:
+            self._cleanup(data)
+        if violations:
+            self.stdout.write(self.style.ERROR(f'{violations} invariant violation(s)'))
+        else:
+            self.stdout.write(self.style.SUCCESS('All invariants hold'))
+        if failures or violations:
+            raise CommandError(f'{failures} failed request(s), {violations} invariant violation(s)')
+
+    def _parse_mix(self, mix):
+        weights = dict.fromkeys(SCENARIOS, 0)
+        for part in mix.split(','):
+            name, _, weight = part.partition('=')
+            if name.strip() in weights:
+                weights[name.strip()] = float(weight or 1)
+        return weights
+
+    def _seed(self, options):
+        today = date.today()
+        tour_dates, capacity = [], {}
+        for i in range(options['tours']):
+            package = TourPackage.objects.create(
+                name=f'{self.prefix} tour {i}', description='Load test tour', duration=3, price=100,
+                max_participants=options['seats'], difficulty='easy', location='Load test',
+                included_services='', excluded_services='', itinerary='', is_active=True,
+            )
+            for j in range(options['dates']):
+                start = today + timedelta(days=30 + 7 * j)
+                tour_date = TourDate.objects.create(
+                    tour_package=package, start_date=start, end_date=start + timedelta(days=2),
+                    available_spots=options['seats'],
+                )
+                tour_dates.append(tour_date.id)
+                capacity[tour_date.id] = options['seats']
+
+        guides = []
+        for i in range(options['guides']):
+            user = User.objects.create_user(f'{self.prefix}-guide-{i}', password=None, first_name='Load', last_name=f'Guide {i}')
+            Guide.objects.create(user=user, phone='0', experience_years=1, languages='English', specializations='Testing', bio='')
+            guides.append(user)
+
+        # Past, completed bookings give the feedback scenario something to review
+        past_package = TourPackage.objects.create(
+            name=f'{self.prefix} past tour', description='', duration=1, price=100, max_participants=1000,
+            difficulty='easy', location='Load test', included_services='', excluded_services='', itinerary='',
+            is_active=False,
+        )
+        past_date = TourDate.objects.create(
+            tour_package=past_package, start_date=today - timedelta(days=30),
+            end_date=today - timedelta(days=29), available_spots=0, is_available=False,
+        )
+        customers, completed = [], {}
+        for i in range(options['clients']):
+            user = User.objects.create_user(f'{self.prefix}-customer-{i}', password=None)
+            customer = Customer.objects.create(user=user)
+            bookings = Booking.objects.bulk_create([
+                Booking(
+                    customer=customer, tour_date=past_date, participants=1, total_price=100, status='completed',
+                    guide=Guide.objects.get(user=guides[k % len(guides)]),
+                )
+                for k in range(options['requests'])
+            ])
+            guide_stats.count_bookings(added=Counter((booking.guide_id, booking.status) for booking in bookings))
+            counters.forget('bookings')
+            customers.append(user)
+            completed[user.pk] = [booking.pk for booking in bookings]
+
+        return {
+            'tour_dates': tour_dates,
+            'capacity': capacity,
+            'customers': customers,
+            'guides': guides,
+            'completed': completed,
+            'packages': [package.pk for package in TourPackage.objects.filter(name__startswith=self.prefix)],
+        }
+
+    def _report(self, samples, elapsed):
+        """Print the per-endpoint table; returns the number of failed requests"""
+        by_label = defaultdict(list)
+        for label, latency, queries, status in samples:
+            by_label[label].append((latency, queries, status))
+
+        self.stdout.write('')
+        self.stdout.write(f"{'endpoint':24} {'requests':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'queries':>8} {'failed':>6}")
+        failures = 0
+        for label, rows in sorted(by_label.items()):
+            latencies = sorted(latency * 1000 for latency, queries, status in rows)
+            failed = sum(1 for latency, queries, status in rows if status not in EXPECTED[label])
+            failures += failed
+            self.stdout.write(
+                f"{label:24} {len(rows):8} {self._percentile(latencies, 50):8.1f} "
+                f"{self._percentile(latencies, 95):8.1f} {self._percentile(latencies, 99):8.1f} "
+                f"{statistics.mean(queries for latency, queries, status in rows):8.1f} "
+                f"{failed:6}"
+            )
+        self.stdout.write(f'\n{len(samples)} requests in {elapsed:.2f}s: {len(samples) / elapsed:.1f} requests/sec\n')
+        return failures
+
+    def _percentile(self, values, percent):
+        if not values:
+            return 0.0
+        index = min(len(values) - 1, max(0, round(percent / 100 * len(values)) - 1))
+        return values[index]
+
+    def _check_invariants(self, data):
+        violations = 0
+
+        def violation(message):
+            nonlocal violations
+            violations += 1
+            self.stdout.write(self.style.ERROR(f'  {message}'))
+
+        self.stdout.write('Invariants:')
+        dates = TourDate.objects.filter(pk__in=data['tour_dates']).annotate(
+            sold=Sum('booking__participants', filter=~Q(booking__status='cancelled')),
+        )
+        held = dict(
+            SeatHold.objects.filter(tour_date_id__in=data['tour_dates'])
+            .values_list('tour_date_id').annotate(seats=Sum('seats'))
+        )
+        for tour_date in dates:
+            capacity = data['capacity'][tour_date.id]
+            sold = tour_date.sold or 0
+            if tour_date.available_spots < 0:
+                violation(f'tour date {tour_date.id} has negative available_spots ({tour_date.available_spots})')
+            if sold > capacity:
+                violation(f'tour date {tour_date.id} sold {sold} seats of {capacity}')
+            if tour_date.available_spots != capacity - sold - held.get(tour_date.id, 0):
+                violation(
+                    f'tour date {tour_date.id} seat counter drift: {tour_date.available_spots} available, '
+                    f'{sold} sold, {held.get(tour_date.id, 0)} held, capacity {capacity}'
+                )
+
+        booking_ids = [pk for ids in data['completed'].values() for pk in ids]
+        duplicates = (
+            GuideFeedback.objects.filter(booking_id__in=booking_ids)
+            .values('booking_id').annotate(n=Count('id')).filter(n__gt=1).count()
+        )
+        if duplicates:
+            violation(f'{duplicates} bookings have more than one guide review')
+        orphans = GuideFeedback.objects.filter(booking_id__in=booking_ids).exclude(
+            booking__tourfeedback__isnull=False
+        ).count()
+        if orphans:
+            violation(f'{orphans} guide reviews were saved without their tour review')
+
+        guide_ids = Guide.objects.filter(user__in=data['guides']).values_list('id', flat=True)
+        double_booked = GuideAvailability.objects.filter(guide_id__in=guide_ids).values('guide_id', 'date').annotate(
+            n=Count('id')
+        ).filter(n__gt=1).count()
+        if double_booked:
+            violation(f'{double_booked} duplicate guide availability rows')
+
+        reviewed = TourFeedback.objects.filter(booking_id__in=booking_ids).count()
+        self.stdout.write(
+            f"  checked {len(data['tour_dates'])} tour dates, {reviewed} reviews, "
+            f"{GuideAvailability.objects.filter(guide_id__in=guide_ids).count()} availability rows"
+        )
+        return violations
+
+    def _cleanup(self, data):
+        TourPackage.objects.filter(pk__in=data['packages']).delete()
+        User.objects.filter(username__startswith=self.prefix).delete()
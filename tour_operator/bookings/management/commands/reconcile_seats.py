@@ -0,0 +1,33 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.reconcile import CHUNK_SIZE, reconcile_seats
+
+
+class Command(BaseCommand):
+    help = (
+        'Recount TourDate.available_spots from capacity, non-cancelled bookings and live seat '
+        'holds, fixing and reporting any drift. Safe to run from cron while the site is up.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without writing it back')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='Tour dates per transaction')
+        parser.add_argument('--limit', type=int, default=20, help='Drifted dates to list (0 for all)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        drift = reconcile_seats(dry_run=options['dry_run'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        shown = drift if not options['limit'] else drift[:options['limit']]
+        for tour_date_id, recorded, expected in shown:
+            self.stdout.write(f'  tour date {tour_date_id}: {recorded} -> {expected} ({expected - recorded:+d})')
+        if len(shown) < len(drift):
+            self.stdout.write(f'  ... and {len(drift) - len(shown)} more')
+
+        seats = sum(expected - recorded for tour_date_id, recorded, expected in drift)
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        message = f'{verb} {len(drift)} drifted tour dates ({seats:+d} seats) in {elapsed:.2f}s'
+        self.stdout.write(self.style.WARNING(message) if drift else self.style.SUCCESS(message))
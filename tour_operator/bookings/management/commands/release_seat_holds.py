@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from bookings.reservations import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = 'Return the seats of expired booking holds to their tour dates'
+
+    def handle(self, *args, **options):
+        holds, seats = release_expired_holds()
+        self.stdout.write(self.style.SUCCESS(f'Released {holds} expired holds ({seats} seats)'))
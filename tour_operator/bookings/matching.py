@@ -0,0 +1,182 @@
+"""
+Matching of custom tour requests against the bookable catalog.
+
+Catalog.build() reads every upcoming, available tour date of an active
+package once and lays it out column-wise: parallel arrays of durations,
+prices, free seats and start dates, plus an inverted index from
+destination words (package name and location) to rows, weighted by how
+rare each word is across the catalog.
+
+match_requests() scores any number of requests against one Catalog. Only
+rows sharing a destination word with a request are considered, so the
+work grows with the number of plausible candidates rather than with
+requests x catalog. Each candidate scores between 0 and 1 on
+
+    destination  weight of the shared words over the request's words
+    duration     closeness of the tour length to the requested days
+    budget       per-person price against the parsed budget range
+    dates        distance of the departure from the preferred window
+
+and dates without enough free seats for the group are skipped. Unparsed
+budgets and dates score a neutral 0.5.
+"""
+import heapq
+import math
+import re
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date
+
+from django.db.models import F
+
+from tours.models import TourDate
+
+WEIGHTS = {'destination': 0.45, 'duration': 0.15, 'budget': 0.2, 'dates': 0.2}
+NEUTRAL = 0.5
+DATE_SLACK_DAYS = 60
+STOPWORDS = {
+    'the', 'and', 'for', 'with', 'tour', 'tours', 'trip', 'trek', 'trekking', 'adventure',
+    'holiday', 'package', 'days', 'day', 'visit', 'experience',
+}
+WORD = re.compile(r'[a-z]{3,}')
+STEM_LENGTH = 6
+
+
+def words(text):
+    """
+    Normalized destination words of a piece of text, cut to their first
+    letters so "Himalaya" meets "Himalayan" and "Rajasthani" "Rajasthan"
+    """
+    found = set(WORD.findall((text or '').lower())) - STOPWORDS
+    return {word[:STEM_LENGTH] for word in found}
+
+
+@dataclass
+class Match:
+    tour_date_id: int
+    package_id: int
+    package_name: str
+    start_date: date
+    price: float
+    available_spots: int
+    score: float
+    parts: dict
+
+    @property
+    def percent(self):
+        return round(self.score * 100)
+
+
+class Catalog:
+    """Column-wise features of every bookable tour date"""
+
+    def __init__(self, rows):
+        self.tour_date_ids = array('q')
+        self.package_ids = array('q')
+        self.durations = array('i')
+        self.prices = array('d')
+        self.seats = array('i')
+        self.starts = array('i')
+        self.names = []
+        self.postings = defaultdict(list)
+
+        for index, row in enumerate(rows):
+            self.tour_date_ids.append(row['id'])
+            self.package_ids.append(row['tour_package_id'])
+            self.durations.append(row['duration'])
+            self.prices.append(float(row['price']))
+            self.seats.append(row['available_spots'])
+            self.starts.append(row['start_date'].toordinal())
+            self.names.append(row['name'])
+            for word in words(f"{row['name']} {row['location']}"):
+                self.postings[word].append(index)
+
+        # Rarer words say more about a destination
+        total = max(len(self.names), 1)
+        self.idf = {word: math.log(1 + total / len(rows)) for word, rows in self.postings.items()}
+
+    @classmethod
+    def build(cls, today=None):
+        today = today or date.today()
+        rows = TourDate.objects.filter(
+            start_date__gte=today, is_available=True, available_spots__gt=0, tour_package__is_active=True
+        ).order_by('start_date', 'pk').values(
+            'id', 'tour_package_id', 'start_date', 'available_spots',
+            name=F('tour_package__name'), location=F('tour_package__location'),
+            duration=F('tour_package__duration'), price=F('tour_package__price'),
+        )
+        return cls(rows)
+
+    def __len__(self):
+        return len(self.names)
+
+
+def _budget_score(price, low, high):
+    if low is None and high is None:
+        return NEUTRAL
+    if high is not None and price > high:
+        return max(0.0, 1 - (price - high) / high) if high else 0.0
+    if low is not None and price < low:
+        # Cheaper than asked for is still a fit, just a less likely one
+        return max(0.5, 1 - (low - price) / low) if low else 1.0
+    return 1.0
+
+
+def _date_score(start, window_from, window_to):
+    if window_from is None:
+        return NEUTRAL
+    if window_from <= start <= window_to:
+        return 1.0
+    distance = window_from - start if start < window_from else start - window_to
+    return max(0.0, 1 - distance / DATE_SLACK_DAYS)
+
+
+def match_requests(requests, catalog=None, limit=3):
+    """
+    Rank catalog tour dates for each CustomTourRequest; returns
+    {request.pk: [Match, ...]} with at most `limit` matches, best first.
+    """
+    catalog = catalog if catalog is not None else Catalog.build()
+    results = {}
+    for request in requests:
+        request_words = words(request.destination)
+        wanted = sum(catalog.idf.get(word, 1.0) for word in request_words)
+        overlap = defaultdict(float)
+        for word in request_words:
+            weight = catalog.idf.get(word)
+            for index in catalog.postings.get(word, ()):
+                overlap[index] += weight
+
+        low = float(request.budget_min) if request.budget_min is not None else None
+        high = float(request.budget_max) if request.budget_max is not None else None
+        window_from = request.date_from.toordinal() if request.date_from else None
+        window_to = request.date_to.toordinal() if request.date_to else None
+        days = max(request.duration or 1, 1)
+
+        scored = []
+        for index, shared in overlap.items():
+            if catalog.seats[index] < request.participants:
+                continue
+            parts = {
+                'destination': shared / wanted,
+                'duration': max(0.0, 1 - abs(catalog.durations[index] - days) / days),
+                'budget': _budget_score(catalog.prices[index], low, high),
+                'dates': _date_score(catalog.starts[index], window_from, window_to),
+            }
+            scored.append((sum(WEIGHTS[name] * value for name, value in parts.items()), index, parts))
+
+        results[request.pk] = [
+            Match(
+                tour_date_id=catalog.tour_date_ids[index],
+                package_id=catalog.package_ids[index],
+                package_name=catalog.names[index],
+                start_date=date.fromordinal(catalog.starts[index]),
+                price=catalog.prices[index],
+                available_spots=catalog.seats[index],
+                score=score,
+                parts=parts,
+            )
+            for score, index, parts in heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1]))
+        ]
+    return results
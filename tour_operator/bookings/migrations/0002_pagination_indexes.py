@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['customer', 'booking_date', 'id'], name='booking_customer_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customtourrequest',
+            index=models.Index(fields=['created_at', 'id'], name='customrequest_created_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:17
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('tours', '0008_image_variants'),
+        ('bookings', '0002_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatHold',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('seats', models.PositiveIntegerField()),
+                ('expires_at', models.DateTimeField()),
+                ('claim', models.UUIDField(blank=True, editable=False, help_text='Set by the booking or release consuming this hold', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tour_date', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to='tours.tourdate')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_holds', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['expires_at'], name='seathold_expires_idx'), models.Index(fields=['claim'], name='seathold_claim_idx')],
+            },
+        ),
+    ]
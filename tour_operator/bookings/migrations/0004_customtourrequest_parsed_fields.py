@@ -0,0 +1,120 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:28
+
+import calendar
+import re
+from datetime import date
+from decimal import Decimal
+
+from django.db import migrations, models
+
+# Intentionally frozen: a small parser for this one-off backfill, kept apart
+# from bookings.request_parsing so later changes there cannot change what
+# this migration does. Do not update it along with the live parser. It reads
+# plain amounts and ranges ("5000", "10k-20k", "2-3 lakhs", "under 5k"), ISO
+# dates and "March 2025"; whatever it cannot read stays empty until the
+# request is next saved, which runs the full parser.
+
+AMOUNT = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(k|lakhs?|lac)?\b(?:\s*(people|persons?|pax|adults?|days?|nights?)\b)?', re.IGNORECASE
+)
+MULTIPLIERS = {'k': 1000, 'lakh': 100000, 'lakhs': 100000, 'lac': 100000}
+UPPER_BOUND = re.compile(r'\b(under|below|less than|up to|upto|max(?:imum)?|within)\b', re.IGNORECASE)
+LOWER_BOUND = re.compile(r'\b(over|above|more than|from|min(?:imum)?|at least)\b|\+', re.IGNORECASE)
+# The most the new budget columns (10 digits, 2 decimal places) can hold
+MAX_BUDGET = Decimal('99999999.99')
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+ISO_DATE = re.compile(r'\b(\d{4})-(\d{1,2})-(\d{1,2})\b')
+MONTH_YEAR = re.compile(
+    r'\b(' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\b\.?\s*,?\s*(\d{4})\b', re.IGNORECASE
+)
+
+
+def parse_budget(text):
+    numbers = [
+        (Decimal(number), MULTIPLIERS.get(suffix.lower(), 1))
+        for number, suffix, unit in AMOUNT.findall((text or '').replace(',', '')) if not unit
+    ]
+    if not numbers:
+        return None, None
+    if len(numbers) >= 2:
+        (low, low_multiplier), (high, high_multiplier) = numbers[:2]
+        if low_multiplier == 1 and low <= high:
+            low_multiplier = high_multiplier
+        low, high = sorted([low * low_multiplier, high * high_multiplier])
+    else:
+        low = high = numbers[0][0] * numbers[0][1]
+        if UPPER_BOUND.search(text):
+            low = None
+        elif LOWER_BOUND.search(text):
+            high = None
+    return tuple(
+        amount.quantize(Decimal('0.01')) if amount is not None and amount <= MAX_BUDGET else None
+        for amount in (low, high)
+    )
+
+
+def parse_dates(text):
+    spans = []
+    for year, month, day in ISO_DATE.findall(text or ''):
+        try:
+            spans.append((date(int(year), int(month), int(day)),) * 2)
+        except ValueError:
+            continue
+    for name, year in MONTH_YEAR.findall(text or ''):
+        month, year = MONTHS[name.lower()], int(year)
+        spans.append((date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])))
+    if not spans:
+        return None, None
+    return min(start for start, end in spans), max(end for start, end in spans)
+
+
+def parse_existing_requests(apps, schema_editor):
+    CustomTourRequest = apps.get_model('bookings', 'CustomTourRequest')
+    requests = list(CustomTourRequest.objects.only('id', 'budget_range', 'preferred_dates'))
+    for request in requests:
+        request.budget_min, request.budget_max = parse_budget(request.budget_range)
+        request.date_from, request.date_to = parse_dates(request.preferred_dates)
+    CustomTourRequest.objects.bulk_update(
+        requests, ['budget_min', 'budget_max', 'date_from', 'date_to'], batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_seathold'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customtourrequest',
+            name='budget_max',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='customtourrequest',
+            name='budget_min',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='customtourrequest',
+            name='date_from',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='customtourrequest',
+            name='date_to',
+            field=models.DateField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='customtourrequest',
+            index=models.Index(fields=['date_from', 'date_to'], name='customrequest_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customtourrequest',
+            index=models.Index(fields=['budget_min', 'budget_max'], name='customrequest_budget_idx'),
+        ),
+        migrations.RunPython(parse_existing_requests, migrations.RunPython.noop),
+    ]
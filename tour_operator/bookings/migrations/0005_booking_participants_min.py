@@ -0,0 +1,19 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:09
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_customtourrequest_parsed_fields'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='booking',
+            name='participants',
+            field=models.IntegerField(validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+    ]
@@ -1,7 +1,10 @@
+from django.core.validators import MinValueValidator
 from django.db import models
 from django.contrib.auth.models import User
 from tours.models import TourDate
 from guides.models import Guide
+from tour_operator.tracking import CountedFields
+from .request_parsing import parse_budget, parse_dates
 
 class Customer(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
@@ -16,7 +19,7 @@ class Customer(models.Model):
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
 
-class Booking(models.Model):
+class Booking(CountedFields, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -27,16 +30,46 @@ class Booking(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     tour_date = models.ForeignKey(TourDate, on_delete=models.CASCADE)
     guide = models.ForeignKey(Guide, on_delete=models.SET_NULL, null=True, blank=True)
-    participants = models.IntegerField()
+    participants = models.IntegerField(validators=[MinValueValidator(1)])
     total_price = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     special_requests = models.TextField(blank=True)
     booking_date = models.DateTimeField(auto_now_add=True)
     payment_status = models.BooleanField(default=False)
 
+    COUNTED_FIELDS = ('guide_id', 'status')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['booking_date', 'id'], name='booking_date_idx'),
+            models.Index(fields=['customer', 'booking_date', 'id'], name='booking_customer_date_idx'),
+        ]
+
     def __str__(self):
         return f"Booking {self.id} - {self.customer} - {self.tour_date.tour_package.name}"
 
+class SeatHold(models.Model):
+    """
+    Seats set aside on a tour date while a customer completes the booking
+    form. The seats are taken off TourDate.available_spots when the hold is
+    placed and handed back when it expires; see bookings.reservations.
+    """
+    tour_date = models.ForeignKey(TourDate, on_delete=models.CASCADE, related_name='seat_holds')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='seat_holds')
+    seats = models.PositiveIntegerField()
+    expires_at = models.DateTimeField()
+    claim = models.UUIDField(null=True, blank=True, editable=False, help_text="Set by the booking or release consuming this hold")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['expires_at'], name='seathold_expires_idx'),
+            models.Index(fields=['claim'], name='seathold_claim_idx'),
+        ]
+
+    def __str__(self):
+        return f"Hold {self.id} - {self.seats} seats on {self.tour_date_id} until {self.expires_at}"
+
 class CustomTourRequest(models.Model):
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE)
     destination = models.CharField(max_length=200)
@@ -48,5 +81,28 @@ class CustomTourRequest(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     is_processed = models.BooleanField(default=False)
 
+    # Parsed from budget_range and preferred_dates on save (see bookings.request_parsing)
+    budget_min = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    budget_max = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True, editable=False)
+    date_from = models.DateField(null=True, blank=True, editable=False)
+    date_to = models.DateField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='customrequest_created_idx'),
+            models.Index(fields=['date_from', 'date_to'], name='customrequest_dates_idx'),
+            models.Index(fields=['budget_min', 'budget_max'], name='customrequest_budget_idx'),
+        ]
+
+    def parse_fields(self):
+        """Fill the parsed budget and date columns from the free-text fields"""
+        self.budget_min, self.budget_max = parse_budget(self.budget_range)
+        reference = self.created_at.date() if self.created_at else None
+        self.date_from, self.date_to = parse_dates(self.preferred_dates, reference)
+
+    def save(self, *args, **kwargs):
+        self.parse_fields()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"Custom Tour Request - {self.customer} - {self.destination}"
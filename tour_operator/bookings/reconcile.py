@@ -0,0 +1,78 @@
+"""
+Reconciliation of TourDate.available_spots with the bookings behind it.
+
+The seat counter is maintained incrementally (see bookings.reservations),
+so anything that writes bookings or tour dates directly, such as the Django
+admin, imports or older code paths, can leave it out of step. Recounting
+is always safe:
+
+    available_spots = capacity - participants of non-cancelled bookings
+                               - seats of every hold still on record
+
+Expired holds keep their seats until release_expired_holds() deletes
+them and adds the seats back, so they are counted like live ones, and a
+run starts by releasing them.
+
+reconcile_seats() walks the tour dates in primary key chunks. Each chunk
+is one transaction that locks its dates with a no-op UPDATE (the first
+statement, so SQLite starts with a write and concurrent bookings on these
+dates wait for it), counts booked and held seats with one grouped
+aggregate each, and writes the differing rows back with bulk_update().
+The reconcile_seats command runs it; schedule it nightly next to
+release_seat_holds.
+"""
+from django.db import transaction
+from django.db.models import F, Sum
+
+from tours.models import TourDate
+from .models import Booking, SeatHold
+from .reservations import release_expired_holds, seats_changed
+
+CHUNK_SIZE = 500
+
+
+def _reconcile_chunk(tour_date_ids, dry_run):
+    with transaction.atomic():
+        if not dry_run:
+            TourDate.objects.filter(pk__in=tour_date_ids).update(available_spots=F('available_spots'))
+
+        booked = dict(
+            Booking.objects.filter(tour_date_id__in=tour_date_ids).exclude(status='cancelled')
+            .values_list('tour_date_id').annotate(seats=Sum('participants')).order_by()
+        )
+        held = dict(
+            SeatHold.objects.filter(tour_date_id__in=tour_date_ids)
+            .values_list('tour_date_id').annotate(seats=Sum('seats')).order_by()
+        )
+
+        drift, changed = [], []
+        dates = TourDate.objects.filter(pk__in=tour_date_ids).values_list('pk', 'capacity', 'available_spots')
+        for pk, capacity, recorded in dates:
+            expected = capacity - booked.get(pk, 0) - held.get(pk, 0)
+            if expected != recorded:
+                drift.append((pk, recorded, expected))
+                changed.append(TourDate(pk=pk, available_spots=expected))
+
+        if changed and not dry_run:
+            TourDate.objects.bulk_update(changed, ['available_spots'])
+            seats_changed([tour_date.pk for tour_date in changed])
+    return drift
+
+
+def reconcile_seats(dry_run=False, chunk_size=CHUNK_SIZE, tour_date_ids=None):
+    """
+    Recount available_spots for every tour date (or the given ones).
+    Returns a list of (tour_date_id, recorded, expected) for each date
+    that had drifted; with dry_run nothing is written.
+    """
+    dates = TourDate.objects.order_by('pk')
+    if tour_date_ids is not None:
+        dates = dates.filter(pk__in=tour_date_ids)
+    ids = list(dates.values_list('pk', flat=True))
+    if not dry_run:
+        release_expired_holds()
+
+    drift = []
+    for start in range(0, len(ids), chunk_size):
+        drift.extend(_reconcile_chunk(ids[start:start + chunk_size], dry_run))
+    return drift
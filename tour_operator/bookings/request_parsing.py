@@ -0,0 +1,150 @@
+"""
+Parsing of the free-text budget and date fields of CustomTourRequest.
+
+    parse_budget('₹1000-2000')             -> (Decimal('1000'), Decimal('2000'))
+    parse_budget('under 5k')               -> (None, Decimal('5000'))
+    parse_budget('2-3 lakhs')              -> (Decimal('200000'), Decimal('300000'))
+    parse_budget('3 people, 5000 each')    -> (Decimal('5000'), Decimal('5000'))
+    parse_dates('March 2024')              -> (date(2024, 3, 1), date(2024, 3, 31))
+    parse_dates('2027-01-16 to 2027-01-26') -> (date(2027, 1, 16), date(2027, 1, 26))
+    parse_dates('10-24 March 2025')        -> (date(2025, 3, 10), date(2025, 3, 24))
+
+Anything that cannot be read gives (None, None); the original text is
+always kept. Budgets are per person, like TourPackage.price.
+"""
+import calendar
+import re
+from datetime import date
+from decimal import Decimal, InvalidOperation
+
+MONTHS = {name.lower(): number for number, name in enumerate(calendar.month_name) if name}
+MONTHS.update({name.lower(): number for number, name in enumerate(calendar.month_abbr) if name})
+MONTHS['sept'] = 9
+MONTH = r'\b(?P<{}>' + '|'.join(sorted(MONTHS, key=len, reverse=True)) + r')\b\.?'
+
+# A number, its multiplier if any, and a unit that makes it something other than money
+AMOUNT = re.compile(
+    r'(\d+(?:\.\d+)?)\s*(k|l|lakh|lakhs|lac)?\b(?:\s*(people|persons?|pax|adults?|days?|nights?)\b)?',
+    re.IGNORECASE,
+)
+MULTIPLIERS = {'k': 1000, 'l': 100000, 'lakh': 100000, 'lakhs': 100000, 'lac': 100000}
+# The most CustomTourRequest.budget_min/budget_max (10 digits, 2 decimal places) can hold
+MAX_BUDGET = Decimal('99999999.99')
+CENT = Decimal('0.01')
+UPPER_BOUND = re.compile(r'\b(under|below|less than|up to|upto|max(?:imum)?|within)\b', re.IGNORECASE)
+LOWER_BOUND = re.compile(r'\b(over|above|more than|from|min(?:imum)?|at least)\b|\+', re.IGNORECASE)
+
+RANGE = r'(?:-|–|—|to|till|until)'
+DATE_TOKENS = re.compile('|'.join([
+    r'(?P<iso_y>\d{4})-(?P<iso_m>\d{1,2})-(?P<iso_d>\d{1,2})',
+    r'(?P<dmy_d>\d{1,2})[/.](?P<dmy_m>\d{1,2})[/.](?P<dmy_y>\d{4})',
+    # The first day of "10-24 March", which takes its month from the second
+    r'(?<!\d)(?P<dd_d>\d{1,2})(?:st|nd|rd|th)?\s*' + RANGE + r'\s*(?=\d{1,2}(?:st|nd|rd|th)?\s+' + MONTH.format('dd_m') + ')',
+    r'(?P<dm_d>\d{1,2})(?:st|nd|rd|th)?\s+' + MONTH.format('dm_m') + r'(?:\s*,?\s*(?P<dm_y>\d{4}))?',
+    # "March 10" or "March 10-24"
+    MONTH.format('md_m') + r'\s+(?P<md_d>\d{1,2})(?:st|nd|rd|th)?(?!\d)'
+    r'(?:\s*' + RANGE + r'\s*(?P<md_e>\d{1,2})(?:st|nd|rd|th)?(?!\d))?(?:\s*,?\s*(?P<md_y>\d{4}))?',
+    MONTH.format('m_m') + r'(?:\s*,?\s*(?P<m_y>\d{4}))?',
+    r'\b(?P<y_y>(?:19|20)\d{2})\b',
+]), re.IGNORECASE)
+
+
+def _storable(amount):
+    """The amount to the cent, or None when it is too large to store"""
+    return amount.quantize(CENT) if amount is not None and amount <= MAX_BUDGET else None
+
+
+def parse_budget(text):
+    """
+    (minimum, maximum) per-person budget as Decimals; either may be None,
+    as is an amount above MAX_BUDGET
+    """
+    low, high = _parse_budget((text or '').replace(',', ''))
+    return _storable(low), _storable(high)
+
+
+def _parse_budget(text):
+    numbers = []
+    for number, suffix, unit in AMOUNT.findall(text):
+        if unit:
+            continue
+        try:
+            numbers.append((Decimal(number), MULTIPLIERS.get(suffix.lower(), 1)))
+        except InvalidOperation:
+            continue
+    if not numbers:
+        return None, None
+    if len(numbers) >= 2:
+        (low, low_multiplier), (high, high_multiplier) = numbers[:2]
+        # "2-3 lakhs": a lone trailing multiplier covers both ends
+        if low_multiplier == 1 and low <= high:
+            low_multiplier = high_multiplier
+        amounts = low * low_multiplier, high * high_multiplier
+        return min(amounts), max(amounts)
+    amounts = [number * multiplier for number, multiplier in numbers]
+    if UPPER_BOUND.search(text):
+        return None, amounts[0]
+    if LOWER_BOUND.search(text):
+        return amounts[0], None
+    return amounts[0], amounts[0]
+
+
+def _tokens(text):
+    """(year or None, month, day or None) for each date mention, in order"""
+    for match in DATE_TOKENS.finditer(text):
+        groups = {key: value for key, value in match.groupdict().items() if value}
+        for prefix in ('iso', 'dmy', 'dd', 'dm', 'md', 'm', 'y'):
+            if any(key.startswith(prefix + '_') for key in groups):
+                break
+        year = groups.get(f'{prefix}_y')
+        month = groups.get(f'{prefix}_m')
+        if month and not month.isdigit():
+            month = MONTHS[month.lower()]
+        year, month = int(year) if year else None, int(month) if month else None
+        for key in ('d', 'e'):
+            day = groups.get(f'{prefix}_{key}')
+            if key == 'd' or day:
+                yield year, month, int(day) if day else None
+
+
+def _span(year, month, day):
+    if month is None:
+        return date(year, 1, 1), date(year, 12, 31)
+    if day is None:
+        return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+    return date(year, month, day), date(year, month, day)
+
+
+def parse_dates(text, reference=None):
+    """
+    (first, last) date of the period a request mentions, or (None, None).
+    Months without a year take the year mentioned after them ("March-April
+    2025"), else the year of the date before them ("May 10 2025 - May 20"),
+    otherwise their next occurrence from `reference` (today).
+    """
+    reference = reference or date.today()
+    tokens = list(_tokens(text or ''))
+    spans = []
+    previous = None
+    for index, (year, month, day) in enumerate(tokens):
+        if year is None:
+            later = next((token[0] for token in tokens[index + 1:] if token[0]), None)
+            if later is not None:
+                year = later
+                # "December - January 2026" starts the year before
+                following_month = tokens[index + 1][1] if index + 1 < len(tokens) else None
+                if following_month and month and month > following_month and tokens[index + 1][0] is not None:
+                    year -= 1
+            elif previous is not None:
+                # An end date follows its start, into the next year if need be
+                year = previous[0] + (1 if (month or 1, day or 1) < previous[1:] else 0)
+            else:
+                year = reference.year + (1 if month and month < reference.month else 0)
+        try:
+            spans.append(_span(year, month, day))
+        except ValueError:
+            continue
+        previous = (year, month or 1, day or 1)
+    if not spans:
+        return None, None
+    return min(start for start, end in spans), max(end for start, end in spans)
@@ -0,0 +1,256 @@
+"""
+Seat reservation engine for tour dates.
+
+Seats are only ever taken with a single conditional UPDATE:
+
+    UPDATE tours_tourdate SET available_spots = available_spots - n
+    WHERE id = ... AND is_available AND available_spots >= n
+
+which cannot oversell: the database evaluates the condition and applies
+the decrement under the row lock (PostgreSQL) or the database write lock
+(SQLite), so concurrent requests queue on the row instead of racing on a
+value read earlier in Python.
+
+A SeatHold takes its seats when it is placed and gives them back when it
+expires. Holds are consumed by "claiming" them, an UPDATE that stamps a
+fresh token on rows whose claim is still empty. A claim is the first
+statement of every transaction that consumes holds, so the booking that
+converts a hold and the sweep that releases it can never both count the
+same seats, and SQLite transactions start with a write rather than
+upgrading a read lock.
+
+transition_bookings() moves many bookings to a new status or payment state
+at once. Seats of bookings entering or leaving "cancelled" are returned or
+taken again with one UPDATE over the affected tour dates, each adding the
+sum of its moving bookings' participants from a grouped subquery.
+
+Signals do not fire for these bulk updates, so the availability summary,
+package timestamp and catalog cache are refreshed after commit.
+"""
+import uuid
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from guides import stats as guide_stats
+from tour_operator import catalog_cache, counters
+from tours.availability import refresh_availability
+from tours.models import TourDate, TourPackage
+from .models import Booking, SeatHold
+
+
+class SeatsUnavailable(Exception):
+    """Raised when a tour date does not have enough seats left"""
+
+    def __init__(self, available_spots):
+        self.available_spots = available_spots
+        super().__init__(f'Only {available_spots} seats left')
+
+
+def hold_duration():
+    return timedelta(minutes=getattr(settings, 'SEAT_HOLD_MINUTES', 10))
+
+
+def seats_changed(tour_date_ids):
+    """Refresh state derived from available_spots once the transaction commits"""
+    tour_date_ids = list(tour_date_ids)
+
+    def refresh():
+        package_ids = set(
+            TourDate.objects.filter(pk__in=tour_date_ids).values_list('tour_package_id', flat=True)
+        )
+        TourPackage.objects.filter(pk__in=package_ids).update(updated_at=timezone.now())
+        for package_id in package_ids:
+            refresh_availability(package_id)
+            catalog_cache.bump('tours', f'tour:{package_id}')
+
+    # Derived state can be rebuilt later; never fail a committed booking over it
+    transaction.on_commit(refresh, robust=True)
+
+
+def _available_spots(tour_date_id):
+    return TourDate.objects.filter(pk=tour_date_id).values_list('available_spots', flat=True).first() or 0
+
+
+def take_seats(tour_date_id, seats):
+    """Take `seats` from a tour date, raising SeatsUnavailable if too few remain"""
+    if seats < 1:
+        raise ValueError(f'Cannot take {seats} seats')
+    taken = TourDate.objects.filter(
+        pk=tour_date_id, is_available=True, available_spots__gte=seats
+    ).update(available_spots=F('available_spots') - seats)
+    if not taken:
+        raise SeatsUnavailable(_available_spots(tour_date_id))
+    seats_changed([tour_date_id])
+
+
+def return_seats(tour_date_id, seats):
+    """Give `seats` back to a tour date"""
+    if seats <= 0:
+        return
+    TourDate.objects.filter(pk=tour_date_id).update(available_spots=F('available_spots') + seats)
+    seats_changed([tour_date_id])
+
+
+def active_hold(user, hold_id):
+    """The user's unexpired, unclaimed hold with this id, or None"""
+    if not str(hold_id or '').isdigit():
+        return None
+    return SeatHold.objects.filter(
+        pk=hold_id, user=user, claim__isnull=True, expires_at__gt=timezone.now()
+    ).first()
+
+
+def current_hold(user, tour_date_id):
+    """The user's unexpired, unclaimed hold on a tour date, or None"""
+    return SeatHold.objects.filter(
+        user=user, tour_date_id=tour_date_id, claim__isnull=True, expires_at__gt=timezone.now()
+    ).first()
+
+
+def _claim(holds):
+    """Claim unclaimed holds; returns the claim token and the number claimed"""
+    token = uuid.uuid4()
+    return token, holds.filter(claim__isnull=True).update(claim=token)
+
+
+@transaction.atomic
+def hold_seats(user, tour_date_id, seats=1):
+    """
+    Hold `seats` on a tour date for `user`, replacing any hold they already
+    have on it. Returns the SeatHold or raises SeatsUnavailable.
+    """
+    if seats < 1:
+        raise ValueError(f'Cannot hold {seats} seats')
+    now = timezone.now()
+    token, claimed = _claim(SeatHold.objects.filter(user=user, tour_date_id=tour_date_id, expires_at__gt=now))
+    previous = 0
+    if claimed:
+        previous = SeatHold.objects.filter(claim=token).aggregate(seats=Sum('seats'))['seats']
+        SeatHold.objects.filter(claim=token).delete()
+
+    # Only the difference touches the tour date
+    if seats > previous:
+        take_seats(tour_date_id, seats - previous)
+    else:
+        return_seats(tour_date_id, previous - seats)
+
+    return SeatHold.objects.create(user=user, tour_date_id=tour_date_id, seats=seats, expires_at=now + hold_duration())
+
+
+@transaction.atomic
+def place_booking(booking, user, hold_id=None):
+    """
+    Save an unsaved Booking, taking its seats from the user's hold on the
+    same tour date when it is still valid and from the tour date otherwise.
+    Raises SeatsUnavailable, leaving any hold untouched, if the seats
+    cannot be found.
+    """
+    if booking.participants < 1:
+        raise ValueError(f'Cannot book {booking.participants} participants')
+    held = 0
+    if str(hold_id or '').isdigit():
+        token, claimed = _claim(SeatHold.objects.filter(
+            pk=hold_id, user=user, tour_date_id=booking.tour_date_id, expires_at__gt=timezone.now()
+        ))
+        if claimed:
+            held = SeatHold.objects.get(claim=token).seats
+            SeatHold.objects.filter(claim=token).delete()
+
+    if booking.participants > held:
+        take_seats(booking.tour_date_id, booking.participants - held)
+    else:
+        return_seats(booking.tour_date_id, held - booking.participants)
+
+    booking.save()
+    return booking
+
+
+@transaction.atomic
+def release_expired_holds(now=None):
+    """Return the seats of every expired hold in bulk; returns (holds, seats) released"""
+    token, claimed = _claim(SeatHold.objects.filter(expires_at__lte=now or timezone.now()))
+    if not claimed:
+        return 0, 0
+
+    released = dict(
+        SeatHold.objects.filter(claim=token).values_list('tour_date_id').annotate(seats=Sum('seats'))
+    )
+    TourDate.objects.filter(pk__in=released).update(available_spots=F('available_spots') + Case(
+        *[When(pk=tour_date_id, then=Value(seats)) for tour_date_id, seats in released.items()],
+        default=Value(0),
+    ))
+    SeatHold.objects.filter(claim=token).delete()
+    seats_changed(released)
+    return claimed, sum(released.values())
+
+
+def _seats_of(bookings):
+    """Per tour date, the participants of `bookings` as a subquery for UPDATEs"""
+    per_date = bookings.filter(tour_date=OuterRef('pk')).values('tour_date').annotate(
+        seats=Sum('participants')
+    ).values('seats')
+    return Coalesce(Subquery(per_date), 0)
+
+
+@transaction.atomic
+def transition_bookings(bookings, status=None, payment_status=None):
+    """
+    Set the status and/or payment_status of every booking in the `bookings`
+    queryset in one transaction. Cancelling returns seats to the tour dates
+    and reinstating a cancelled booking takes them again; SeatsUnavailable
+    is raised, and nothing changes, if a tour date has too few seats for
+    the bookings coming back.
+
+    Returns a dict with the number of bookings whose status and payment
+    changed, and the seats returned (negative when taken).
+    """
+    selected = Booking.objects.filter(pk__in=bookings.values('pk'))
+    result = {'status': 0, 'payment': 0, 'seats': 0}
+    tour_date_ids = []
+
+    if status and status != 'cancelled':
+        moving, sign = selected.filter(status='cancelled'), -1
+    elif status:
+        moving, sign = selected.exclude(status='cancelled'), 1
+    else:
+        moving = None
+
+    if moving is not None:
+        dates = TourDate.objects.filter(pk__in=moving.values('tour_date'))
+        # The seat UPDATE comes first so the transaction starts with a write
+        if dates.update(available_spots=F('available_spots') + sign * _seats_of(moving)):
+            short = dates.filter(available_spots__lt=0).annotate(
+                before=F('available_spots') + _seats_of(moving)
+            ).values_list('before', flat=True).first()
+            if short is not None:
+                raise SeatsUnavailable(short)
+            tour_date_ids = list(dates.values_list('pk', flat=True))
+            result['seats'] = sign * (moving.aggregate(seats=Sum('participants'))['seats'] or 0)
+
+    guide_ids = set()
+    if status:
+        changing = selected.exclude(status=status)
+        # update() skips the signals that keep GuideStats' booking counters
+        before = guide_stats.booking_counts(changing)
+        guide_ids.update(guide_id for guide_id, old_status in before)
+        result['status'] = changing.update(status=status)
+        after = Counter()
+        for (guide_id, old_status), count in before.items():
+            after[guide_id, status] += count
+        guide_stats.count_bookings(removed=before, added=after)
+        counters.forget('bookings')
+    if payment_status is not None:
+        result['payment'] = selected.exclude(payment_status=payment_status).update(payment_status=payment_status)
+
+    if tour_date_ids:
+        seats_changed(tour_date_ids)
+    for guide_id in guide_ids:
+        # Guide profiles list each guide's recent tours (see bookings.signals)
+        catalog_cache.bump(f'guide:{guide_id}')
+    return result
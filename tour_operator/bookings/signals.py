@@ -0,0 +1,38 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from guides import stats
+from tour_operator import catalog_cache, counters
+from .models import Booking, Customer, CustomTourRequest
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    # Guide profiles list each guide's recent tours
+    if instance.guide_id:
+        catalog_cache.bump(f'guide:{instance.guide_id}')
+
+
+@receiver(post_save, sender=Booking)
+def booking_saved(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        stats.booking_saved(instance, created)
+
+
+@receiver(post_delete, sender=Booking)
+def booking_deleted(sender, instance, **kwargs):
+    stats.booking_deleted(instance)
+
+
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=Customer)
+@receiver(post_save, sender=CustomTourRequest)
+def row_counted(sender, instance, created, **kwargs):
+    counters.saved(instance, created)
+
+
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=Customer)
+@receiver(post_delete, sender=CustomTourRequest)
+def row_uncounted(sender, instance, **kwargs):
+    counters.deleted(instance)
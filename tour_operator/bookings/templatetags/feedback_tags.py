@@ -5,8 +5,15 @@ register = template.Library()
 
 @register.filter
 def has_feedback(booking):
-    """Check if the booking already has feedback submitted"""
+    """
+    Check if the booking already has feedback submitted.
+
+    Views annotate bookings with feedback_submitted (an Exists subquery) so
+    this is a plain attribute lookup; un-annotated bookings fall back to a query.
+    """
+    if hasattr(booking, 'feedback_submitted'):
+        return booking.feedback_submitted
     try:
         return TourFeedback.objects.filter(booking=booking).exists()
     except:
-        return False
\ No newline at end of file
+        return False
@@ -1,3 +1,264 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from decimal import Decimal
+from io import StringIO
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from tours.models import TourDate, TourPackage
+from .forms import BookingForm
+from .models import Booking, Customer, SeatHold
+from .reconcile import reconcile_seats
+from .request_parsing import parse_budget, parse_dates
+from .reservations import (
+    SeatsUnavailable, hold_seats, place_booking, release_expired_holds, take_seats, transition_bookings,
+)
+
+
+class ParseBudgetTests(SimpleTestCase):
+    def test_docstring_examples(self):
+        self.assertEqual(parse_budget('₹1000-2000'), (Decimal('1000'), Decimal('2000')))
+        self.assertEqual(parse_budget('under 5k'), (None, Decimal('5000')))
+        self.assertEqual(parse_budget('2-3 lakhs'), (Decimal('200000'), Decimal('300000')))
+        self.assertEqual(parse_budget('3 people, 5000 each'), (Decimal('5000'), Decimal('5000')))
+
+    def test_trailing_multiplier_applies_to_both_ends(self):
+        self.assertEqual(parse_budget('1.5-2 lakh'), (Decimal('150000'), Decimal('200000')))
+        self.assertEqual(parse_budget('10-20k'), (Decimal('10000'), Decimal('20000')))
+
+    def test_multiplier_on_one_end_only(self):
+        self.assertEqual(parse_budget('500-2k'), (Decimal('500'), Decimal('2000')))
+        self.assertEqual(parse_budget('2k - 5000'), (Decimal('2000'), Decimal('5000')))
+
+    def test_counts_of_people_and_days_are_not_money(self):
+        self.assertEqual(parse_budget('5000 for 7 days'), (Decimal('5000'), Decimal('5000')))
+        self.assertEqual(parse_budget('2 pax, 3 nights, 40k'), (Decimal('40000'), Decimal('40000')))
+        self.assertEqual(parse_budget('4 persons'), (None, None))
+
+    def test_open_ranges(self):
+        self.assertEqual(parse_budget('10k+'), (Decimal('10000'), None))
+        self.assertEqual(parse_budget('at least 1,500'), (Decimal('1500'), None))
+        self.assertEqual(parse_budget('up to 2 lakh'), (None, Decimal('200000')))
+
+    def test_amounts_too_large_to_store_are_dropped(self):
+        self.assertEqual(parse_budget('1000000000'), (None, None))
+        self.assertEqual(parse_budget('50k - 2000000000'), (Decimal('50000'), None))
+        self.assertEqual(parse_budget('99999999.99'), (Decimal('99999999.99'), Decimal('99999999.99')))
+
+    def test_unreadable(self):
+        self.assertEqual(parse_budget(''), (None, None))
+        self.assertEqual(parse_budget('flexible'), (None, None))
+
+
+class ParseDatesTests(SimpleTestCase):
+    def test_docstring_examples(self):
+        self.assertEqual(parse_dates('March 2024'), (date(2024, 3, 1), date(2024, 3, 31)))
+        self.assertEqual(parse_dates('2027-01-16 to 2027-01-26'), (date(2027, 1, 16), date(2027, 1, 26)))
+
+    def test_month_range_takes_the_later_year(self):
+        self.assertEqual(parse_dates('March-April 2025'), (date(2025, 3, 1), date(2025, 4, 30)))
+        self.assertEqual(parse_dates('December - January 2026'), (date(2025, 12, 1), date(2026, 1, 31)))
+
+    def test_month_without_year_is_the_next_one(self):
+        reference = date(2025, 6, 15)
+        self.assertEqual(parse_dates('March', reference), (date(2026, 3, 1), date(2026, 3, 31)))
+        self.assertEqual(parse_dates('August', reference), (date(2025, 8, 1), date(2025, 8, 31)))
+
+    def test_day_ranges_within_a_month(self):
+        self.assertEqual(parse_dates('10-24 March 2025'), (date(2025, 3, 10), date(2025, 3, 24)))
+        self.assertEqual(parse_dates('10th to 24th March', date(2025, 6, 15)), (date(2026, 3, 10), date(2026, 3, 24)))
+        self.assertEqual(parse_dates('March 10-24, 2026'), (date(2026, 3, 10), date(2026, 3, 24)))
+
+    def test_end_without_a_year_follows_the_start(self):
+        self.assertEqual(parse_dates('May 10 2025 - May 20'), (date(2025, 5, 10), date(2025, 5, 20)))
+        self.assertEqual(parse_dates('Dec 20 2025 - Jan 5'), (date(2025, 12, 20), date(2026, 1, 5)))
+        self.assertEqual(parse_dates('28 Dec - 3 Jan 2026'), (date(2025, 12, 28), date(2026, 1, 3)))
+
+    def test_unreadable(self):
+        self.assertEqual(parse_dates('whenever suits'), (None, None))
+
+
+class SeatTestCase(TestCase):
+    """One customer and another user, and a tour date with five seats"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('customer')
+        cls.other_user = User.objects.create_user('other')
+        cls.customer = Customer.objects.create(user=cls.user)
+        package = TourPackage.objects.create(
+            name='Test tour', description='', duration=2, price=100, max_participants=10, difficulty='easy',
+            location='Test', included_services='', excluded_services='', itinerary='',
+        )
+        start = date.today() + timedelta(days=30)
+        cls.tour_date = TourDate.objects.create(
+            tour_package=package, start_date=start, end_date=start + timedelta(days=1), available_spots=5,
+        )
+
+    def spots(self):
+        return TourDate.objects.get(pk=self.tour_date.pk).available_spots
+
+    def booking(self, participants):
+        return Booking(customer=self.customer, tour_date=self.tour_date, participants=participants, total_price=100)
+
+    def expire(self, hold):
+        SeatHold.objects.filter(pk=hold.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+
+
+class ReservationTests(SeatTestCase):
+    def test_take_seats_raises_when_seats_run_out(self):
+        take_seats(self.tour_date.pk, 4)
+        with self.assertRaises(SeatsUnavailable) as raised:
+            take_seats(self.tour_date.pk, 2)
+        self.assertEqual(raised.exception.available_spots, 1)
+        self.assertEqual(self.spots(), 1)
+
+    def test_party_size_must_be_positive(self):
+        for participants in (0, -10):
+            form = BookingForm({'participants': participants, 'special_requests': ''})
+            self.assertIn('participants', form.errors)
+            with self.assertRaises(ValueError):
+                place_booking(self.booking(participants), self.user)
+        with self.assertRaises(ValueError):
+            take_seats(self.tour_date.pk, -10)
+        with self.assertRaises(ValueError):
+            hold_seats(self.user, self.tour_date.pk, 0)
+        self.assertEqual(self.spots(), 5)
+        self.assertFalse(Booking.objects.exists())
+
+    def test_negative_party_cannot_be_booked(self):
+        self.client.force_login(self.user)
+        response = self.client.post(f'/bookings/book/{self.tour_date.pk}/', {'participants': -10, 'special_requests': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(self.spots(), 5)
+
+    def test_viewing_the_form_writes_nothing(self):
+        expired = hold_seats(self.other_user, self.tour_date.pk, 1)
+        self.expire(expired)
+        self.client.force_login(self.user)
+        response = self.client.get(f'/bookings/book/{self.tour_date.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['hold'])
+        # Not even the expired hold is swept; that is release_seat_holds' job
+        self.assertEqual(self.spots(), 4)
+        self.assertEqual(list(SeatHold.objects.all()), [expired])
+
+    def test_seats_are_held_on_request(self):
+        self.client.force_login(self.user)
+        path = f'/bookings/book/{self.tour_date.pk}/'
+        response = self.client.post(path, {'action': 'hold', 'participants': 2, 'special_requests': ''})
+        self.assertRedirects(response, path)
+        hold = SeatHold.objects.get(user=self.user)
+        self.assertEqual((hold.seats, self.spots()), (2, 3))
+        # The form shows the live hold again rather than taking another
+        response = self.client.get(path)
+        self.assertEqual(response.context['hold'], hold)
+        self.assertEqual(response.context['spots_available'], 5)
+        self.assertEqual(self.spots(), 3)
+        self.client.post(path, {'participants': 2, 'special_requests': '', 'hold': hold.pk})
+        self.assertEqual(self.spots(), 3)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_expired_hold_is_released(self):
+        hold = hold_seats(self.user, self.tour_date.pk, 3)
+        self.assertEqual(self.spots(), 2)
+        self.assertEqual(release_expired_holds(), (0, 0))
+
+        self.expire(hold)
+        self.assertEqual(release_expired_holds(), (1, 3))
+        self.assertEqual(self.spots(), 5)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_place_booking_takes_seats_from_the_hold(self):
+        hold = hold_seats(self.user, self.tour_date.pk, 2)
+        place_booking(self.booking(3), self.user, hold.pk)
+        # Two seats came from the hold, one from the tour date
+        self.assertEqual(self.spots(), 2)
+        self.assertFalse(SeatHold.objects.exists())
+
+    def test_place_booking_ignores_an_expired_hold(self):
+        hold = hold_seats(self.user, self.tour_date.pk, 2)
+        self.expire(hold)
+        place_booking(self.booking(2), self.user, hold.pk)
+        # The expired hold keeps its seats until it is released
+        self.assertEqual(self.spots(), 1)
+        release_expired_holds()
+        self.assertEqual(self.spots(), 3)
+
+    def test_place_booking_without_seats_leaves_the_hold(self):
+        hold = hold_seats(self.user, self.tour_date.pk, 2)
+        hold_seats(self.other_user, self.tour_date.pk, 3)
+        with self.assertRaises(SeatsUnavailable):
+            place_booking(self.booking(3), self.user, hold.pk)
+        self.assertTrue(SeatHold.objects.filter(pk=hold.pk, claim__isnull=True).exists())
+        self.assertEqual(self.spots(), 0)
+        self.assertFalse(Booking.objects.exists())
+
+
+class BookingTransitionTests(SeatTestCase):
+    def test_cancel_and_reinstate(self):
+        first = place_booking(self.booking(2), self.user)
+        place_booking(self.booking(1), self.user)
+        self.assertEqual(self.spots(), 2)
+
+        result = transition_bookings(Booking.objects.all(), status='cancelled')
+        self.assertEqual(result['status'], 2)
+        self.assertEqual(result['seats'], 3)
+        self.assertEqual(self.spots(), 5)
+
+        result = transition_bookings(Booking.objects.filter(pk=first.pk), status='confirmed')
+        self.assertEqual(result['seats'], -2)
+        self.assertEqual(self.spots(), 3)
+
+    def test_reinstating_without_seats_changes_nothing(self):
+        booking = place_booking(self.booking(3), self.user)
+        transition_bookings(Booking.objects.filter(pk=booking.pk), status='cancelled')
+        take_seats(self.tour_date.pk, 4)
+        with self.assertRaises(SeatsUnavailable):
+            transition_bookings(Booking.objects.filter(pk=booking.pk), status='confirmed')
+        self.assertEqual(Booking.objects.get(pk=booking.pk).status, 'cancelled')
+        self.assertEqual(self.spots(), 1)
+
+    def test_admin_bulk_action_cancels_the_ticked_bookings(self):
+        first = place_booking(self.booking(2), self.user)
+        second = place_booking(self.booking(1), self.user)
+        self.client.force_login(User.objects.create_user('admin'))
+        response = self.client.post('/tour-admin/bookings/bulk/', {
+            'booking_ids': [first.pk], 'new_status': 'cancelled', 'new_payment': '',
+        }, follow=True)
+        self.assertIn(
+            '1 status and 0 payment changes applied. 2 seats returned to their tour dates.',
+            [str(message) for message in response.context['messages']],
+        )
+        self.assertEqual(list(Booking.objects.filter(status='cancelled')), [first])
+        self.assertEqual(Booking.objects.get(pk=second.pk).status, 'pending')
+        self.assertEqual(self.spots(), 4)
+
+
+class ReconcileTests(SeatTestCase):
+    def test_reconcile_after_holds_expire(self):
+        place_booking(self.booking(1), self.user)
+        hold = hold_seats(self.user, self.tour_date.pk, 2)
+        hold_seats(self.other_user, self.tour_date.pk, 1)
+        self.expire(hold)
+        # Drift the counter as a direct write would
+        TourDate.objects.filter(pk=self.tour_date.pk).update(available_spots=5)
+
+        self.assertEqual(reconcile_seats(), [(self.tour_date.pk, 7, 3)])
+        # 5 seats, 1 booked, 1 still held; the expired hold was released
+        self.assertEqual(self.spots(), 3)
+        self.assertEqual(SeatHold.objects.count(), 1)
+        self.assertEqual(reconcile_seats(), [])
+
+    def test_dry_run_reports_without_writing(self):
+        place_booking(self.booking(2), self.user)
+        TourDate.objects.filter(pk=self.tour_date.pk).update(available_spots=1)
+        self.assertEqual(reconcile_seats(dry_run=True), [(self.tour_date.pk, 1, 3)])
+        self.assertEqual(self.spots(), 1)
+        out = StringIO()
+        call_command('reconcile_seats', stdout=out)
+        self.assertIn('Fixed 1 drifted tour dates (+2 seats)', out.getvalue())
+        self.assertEqual(self.spots(), 3)
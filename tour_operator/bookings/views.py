@@ -2,35 +2,65 @@ from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import HttpResponse
-from .models import Booking, Customer, CustomTourRequest
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from .models import Booking, CustomTourRequest
 from tours.models import TourDate
+from feedback.models import TourFeedback
 from .forms import BookingForm, CustomTourRequestForm
+from . import reservations
+from notifications import emails
+from tour_operator.pagination import paginate
+from tour_operator.roles import get_customer
 
 @login_required
 def book_tour(request, tour_date_id):
-    tour_date = get_object_or_404(TourDate, id=tour_date_id, is_available=True)
+    tour_date = get_object_or_404(TourDate.objects.select_related('tour_package'), id=tour_date_id, is_available=True)
 
-    if request.method == 'POST':
+    if request.method == 'POST' and request.POST.get('action') == 'hold':
+        # Keep the seats aside while the details are filled in
+        form = BookingForm(request.POST)
+        if form.is_valid():
+            try:
+                reservations.hold_seats(request.user, tour_date.id, form.cleaned_data['participants'])
+            except reservations.SeatsUnavailable as e:
+                form.add_error('participants', f'Only {e.available_spots} spots are left for this date.')
+            else:
+                return redirect('book_tour', tour_date_id=tour_date.id)
+        hold = reservations.current_hold(request.user, tour_date.id)
+    elif request.method == 'POST':
         form = BookingForm(request.POST)
         if form.is_valid():
             booking = form.save(commit=False)
-            customer, created = Customer.objects.get_or_create(user=request.user)
-            booking.customer = customer
+            booking.customer = get_customer(request, create=True)
             booking.tour_date = tour_date
             booking.total_price = tour_date.tour_package.price * booking.participants
-            booking.save()
-
-            tour_date.available_spots -= booking.participants
-            tour_date.save()
-
-            messages.success(request, 'Booking created successfully!')
-            return redirect('booking_confirmation', booking_id=booking.id)
+            try:
+                # The confirmation email is queued with the booking or not at all
+                with transaction.atomic():
+                    reservations.place_booking(booking, request.user, hold_id=request.POST.get('hold'))
+                    emails.booking_created(booking)
+            except reservations.SeatsUnavailable as e:
+                form.add_error('participants', f'Only {e.available_spots} spots are left for this date.')
+            else:
+                messages.success(request, 'Booking created successfully!')
+                return redirect('booking_confirmation', booking_id=booking.id)
+        hold = reservations.active_hold(request.user, request.POST.get('hold'))
     else:
-        form = BookingForm()
+        # Viewing the form writes nothing; expired holds are swept by release_seat_holds
+        hold = reservations.current_hold(request.user, tour_date.id)
+        if hold is None and tour_date.available_spots < 1:
+            messages.error(request, 'Sorry, this tour date is sold out.')
+            return redirect('tour_detail', tour_id=tour_date.tour_package_id)
+        form = BookingForm(initial={'participants': hold.seats} if hold else None)
 
+    tour_date.refresh_from_db(fields=['available_spots'])
     return render(request, 'bookings/book_tour.html', {
         'form': form,
-        'tour_date': tour_date
+        'tour_date': tour_date,
+        'hold': hold,
+        # Seats this customer can book: what is left plus what they hold
+        'spots_available': tour_date.available_spots + (hold.seats if hold else 0),
     })
 
 @login_required
@@ -40,11 +70,13 @@ def booking_confirmation(request, booking_id):
 
 @login_required
 def my_bookings(request):
-    try:
-        customer = Customer.objects.get(user=request.user)
-        bookings = Booking.objects.filter(customer=customer).order_by('-booking_date')
-    except Customer.DoesNotExist:
-        bookings = []
+    # Tour, guide and feedback state come back with the bookings in one query
+    bookings = Booking.objects.filter(customer__user=request.user).select_related(
+        'tour_date__tour_package', 'guide__user'
+    ).annotate(
+        feedback_submitted=Exists(TourFeedback.objects.filter(booking=OuterRef('pk')))
+    )
+    bookings = paginate(request, bookings, ['-booking_date', '-id'])
     return render(request, 'bookings/my_bookings.html', {'bookings': bookings})
 
 @login_required
@@ -53,8 +85,7 @@ def custom_tour_request(request):
         form = CustomTourRequestForm(request.POST)
         if form.is_valid():
             custom_request = form.save(commit=False)
-            customer, created = Customer.objects.get_or_create(user=request.user)
-            custom_request.customer = customer
+            custom_request.customer = get_customer(request, create=True)
             custom_request.save()
             messages.success(request, 'Custom tour request submitted successfully!')
             return redirect('home')
@@ -0,0 +1,18 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from feedback.rollups import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the daily and monthly tour and guide feedback rollups from the feedback tables. '
+        'Run after bulk imports or anything else that bypassed the model signals.'
+    )
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        written = rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {written} rollup rows in {elapsed:.2f}s'))
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('feedback', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guidefeedback',
+            index=models.Index(fields=['created_at', 'id'], name='guidefeedback_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tourfeedback',
+            index=models.Index(fields=['created_at', 'id'], name='tourfeedback_created_idx'),
+        ),
+    ]
@@ -0,0 +1,98 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:44
+
+from django.db import migrations, models
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+import django.db.models.deletion
+
+
+def build_rollups(apps, schema_editor):
+    TourFeedback = apps.get_model('feedback', 'TourFeedback')
+    GuideFeedback = apps.get_model('feedback', 'GuideFeedback')
+    TourFeedbackRollup = apps.get_model('feedback', 'TourFeedbackRollup')
+    GuideFeedbackRollup = apps.get_model('feedback', 'GuideFeedbackRollup')
+
+    for period, truncate in (('day', TruncDate), ('month', TruncMonth)):
+        tours = (
+            TourFeedback.objects.annotate(bucket=truncate('created_at', output_field=DateField()))
+            .order_by().values('booking__tour_date__tour_package_id', 'bucket')
+            .annotate(
+                feedback_count=Count('id'),
+                overall_sum=Sum('overall_rating'),
+                guide_sum=Sum('guide_rating'),
+                accommodation_sum=Sum('accommodation_rating'),
+                value_sum=Sum('value_for_money_rating'),
+                recommend_count=Count('id', filter=Q(would_recommend=True)),
+            )
+        )
+        TourFeedbackRollup.objects.bulk_create([
+            TourFeedbackRollup(tour_package_id=row.pop('booking__tour_date__tour_package_id'), period=period, **row)
+            for row in tours
+        ], batch_size=500)
+        guides = (
+            GuideFeedback.objects.annotate(bucket=truncate('created_at', output_field=DateField()))
+            .order_by().values('guide_id', 'bucket')
+            .annotate(
+                feedback_count=Count('id'),
+                knowledge_sum=Sum('knowledge_rating'),
+                communication_sum=Sum('communication_rating'),
+                professionalism_sum=Sum('professionalism_rating'),
+            )
+        )
+        GuideFeedbackRollup.objects.bulk_create([GuideFeedbackRollup(period=period, **row) for row in guides], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0005_guide_stats'),
+        ('tours', '0009_tourdate_capacity'),
+        ('feedback', '0002_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuideFeedbackRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField(help_text='The day, or the first day of the month')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('knowledge_sum', models.PositiveIntegerField(default=0)),
+                ('communication_sum', models.PositiveIntegerField(default=0)),
+                ('professionalism_sum', models.PositiveIntegerField(default=0)),
+                ('guide', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedback_rollups', to='guides.guide')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TourFeedbackRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('month', 'Month')], max_length=5)),
+                ('bucket', models.DateField(help_text='The day, or the first day of the month')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('overall_sum', models.PositiveIntegerField(default=0)),
+                ('guide_sum', models.PositiveIntegerField(default=0)),
+                ('accommodation_sum', models.PositiveIntegerField(default=0)),
+                ('value_sum', models.PositiveIntegerField(default=0)),
+                ('recommend_count', models.PositiveIntegerField(default=0)),
+                ('tour_package', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feedback_rollups', to='tours.tourpackage')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'bucket'], name='tour_rollup_period_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='tourfeedbackrollup',
+            constraint=models.UniqueConstraint(fields=('tour_package', 'period', 'bucket'), name='tour_rollup_bucket_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='guidefeedbackrollup',
+            index=models.Index(fields=['period', 'bucket'], name='guide_rollup_period_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='guidefeedbackrollup',
+            constraint=models.UniqueConstraint(fields=('guide', 'period', 'bucket'), name='guide_rollup_bucket_uniq'),
+        ),
+        migrations.RunPython(build_rollups, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from bookings.models import Booking
 from guides.models import Guide
+from tour_operator.tracking import CountedFields
+from tours.models import TourPackage
 
-class TourFeedback(models.Model):
+class TourFeedback(CountedFields, models.Model):
     RATING_CHOICES = [
         (1, '1 - Poor'),
         (2, '2 - Fair'),
@@ -21,10 +23,19 @@ class TourFeedback(models.Model):
     suggestions = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    COUNTED_FIELDS = (
+        'booking_id', 'overall_rating', 'guide_rating', 'accommodation_rating', 'value_for_money_rating', 'would_recommend',
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='tourfeedback_created_idx'),
+        ]
+
     def __str__(self):
         return f"Feedback for {self.booking} - Rating: {self.overall_rating}/5"
 
-class GuideFeedback(models.Model):
+class GuideFeedback(CountedFields, models.Model):
     RATING_CHOICES = [
         (1, '1 - Poor'),
         (2, '2 - Fair'),
@@ -41,5 +52,73 @@ class GuideFeedback(models.Model):
     comments = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    COUNTED_FIELDS = ('guide_id', 'knowledge_rating', 'communication_rating', 'professionalism_rating')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='guidefeedback_created_idx'),
+        ]
+
+    @property
+    def rating(self):
+        """Overall score: the mean of the three ratings, rounded"""
+        return (self.knowledge_rating + self.communication_rating + self.professionalism_rating + 1) // 3
+
     def __str__(self):
         return f"Guide Feedback for {self.guide} from {self.booking}"
+
+PERIOD_CHOICES = [
+    ('day', 'Day'),
+    ('month', 'Month'),
+]
+
+class TourFeedbackRollup(models.Model):
+    """
+    Feedback on one tour package over one day or month: counts and rating
+    sums, maintained by feedback.rollups for trend charts
+    """
+    tour_package = models.ForeignKey(TourPackage, on_delete=models.CASCADE, related_name='feedback_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket = models.DateField(help_text="The day, or the first day of the month")
+    feedback_count = models.PositiveIntegerField(default=0)
+    overall_sum = models.PositiveIntegerField(default=0)
+    guide_sum = models.PositiveIntegerField(default=0)
+    accommodation_sum = models.PositiveIntegerField(default=0)
+    value_sum = models.PositiveIntegerField(default=0)
+    recommend_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tour_package', 'period', 'bucket'], name='tour_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            # Trends across every tour
+            models.Index(fields=['period', 'bucket'], name='tour_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tour_package_id} {self.period} {self.bucket}: {self.feedback_count}"
+
+class GuideFeedbackRollup(models.Model):
+    """
+    Feedback on one guide over one day or month: counts and rating sums,
+    maintained by feedback.rollups for trend charts
+    """
+    guide = models.ForeignKey(Guide, on_delete=models.CASCADE, related_name='feedback_rollups')
+    period = models.CharField(max_length=5, choices=PERIOD_CHOICES)
+    bucket = models.DateField(help_text="The day, or the first day of the month")
+    feedback_count = models.PositiveIntegerField(default=0)
+    knowledge_sum = models.PositiveIntegerField(default=0)
+    communication_sum = models.PositiveIntegerField(default=0)
+    professionalism_sum = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['guide', 'period', 'bucket'], name='guide_rollup_bucket_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['period', 'bucket'], name='guide_rollup_period_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.guide_id} {self.period} {self.bucket}: {self.feedback_count}"
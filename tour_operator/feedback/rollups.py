@@ -0,0 +1,194 @@
+"""
+Daily and monthly feedback rollups.
+
+TourFeedbackRollup and GuideFeedbackRollup hold, per tour package or
+guide and per day and month, the number of feedback rows, the sum of each
+rating and (for tours) how many would recommend. The signals in
+feedback.signals add each new, edited or deleted feedback row to its two
+buckets with an UPDATE ... SET total = total + n, inserting the bucket the
+first time it is seen.
+
+A trend over any window is then one indexed read of at most one row per
+bucket and tour or guide:
+
+    trend(GuideFeedbackRollup, 'month', date(2025, 1, 1), date(2025, 6, 1), guide=guide)
+
+and the all-time totals are the sum of the monthly rows. rebuild() (the
+rebuild_feedback_rollups command) recomputes both tables with one
+TruncDate and one TruncMonth GROUP BY per table.
+"""
+from collections import Counter
+from datetime import date
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DateField, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+from bookings.models import Booking
+from .models import GuideFeedback, GuideFeedbackRollup, TourFeedback, TourFeedbackRollup
+
+PERIODS = ('day', 'month')
+TRUNCATE = {'day': TruncDate, 'month': TruncMonth}
+
+# rollup column -> feedback field
+TOUR_SUMS = {
+    'overall_sum': 'overall_rating',
+    'guide_sum': 'guide_rating',
+    'accommodation_sum': 'accommodation_rating',
+    'value_sum': 'value_for_money_rating',
+}
+GUIDE_SUMS = {
+    'knowledge_sum': 'knowledge_rating',
+    'communication_sum': 'communication_rating',
+    'professionalism_sum': 'professionalism_rating',
+}
+
+
+def bucket_of(period, day):
+    return day.replace(day=1) if period == 'month' else day
+
+
+def months(count, today=None):
+    """The first days of the last `count` calendar months, oldest first"""
+    today = today or timezone.localdate()
+    index = today.year * 12 + today.month - 1
+    return [date((index - back) // 12, (index - back) % 12 + 1, 1) for back in range(count - 1, -1, -1)]
+
+
+def _add(model, owner, day, changes):
+    """Add `changes` ({column: n}) to the day and month buckets of `owner` ({'guide_id': ...})"""
+    changes = {name: count for name, count in changes.items() if count}
+    if not changes:
+        return
+    for period in PERIODS:
+        rows = model.objects.filter(**owner, period=period, bucket=bucket_of(period, day))
+        increments = {name: F(name) + count for name, count in changes.items()}
+        if rows.update(**increments):
+            continue
+        if any(count < 0 for count in changes.values()):
+            # Nothing was counted in a bucket that does not exist
+            continue
+        try:
+            with transaction.atomic():
+                model.objects.create(**owner, period=period, bucket=bucket_of(period, day), **changes)
+        except IntegrityError:
+            # Another request created the bucket first
+            rows.update(**increments)
+
+
+def _tour_changes(changes, values, sign):
+    if not values:
+        return
+    changes['feedback_count'] += sign
+    for column, field in TOUR_SUMS.items():
+        changes[column] += sign * values[field]
+    changes['recommend_count'] += sign * bool(values['would_recommend'])
+
+
+def _guide_changes(changes, values, sign):
+    if not values:
+        return
+    changes['feedback_count'] += sign
+    for column, field in GUIDE_SUMS.items():
+        changes[column] += sign * values[field]
+
+
+def tour_feedback_changed(before, after, created_at):
+    """Move a TourFeedback from the `before` values to `after` (either None)"""
+    booking_ids = {values['booking_id'] for values in (before, after) if values}
+    packages = dict(
+        Booking.objects.filter(pk__in=booking_ids).values_list('pk', 'tour_date__tour_package_id')
+    )
+    day = timezone.localdate(created_at)
+    per_package = {}
+    for values, sign in ((before, -1), (after, 1)):
+        if values and values['booking_id'] in packages:
+            changes = per_package.setdefault(packages[values['booking_id']], Counter())
+            _tour_changes(changes, values, sign)
+    for package_id, changes in per_package.items():
+        _add(TourFeedbackRollup, {'tour_package_id': package_id}, day, changes)
+
+
+def guide_feedback_changed(before, after, created_at):
+    """Move a GuideFeedback from the `before` values to `after` (either None)"""
+    day = timezone.localdate(created_at)
+    per_guide = {}
+    for values, sign in ((before, -1), (after, 1)):
+        if values and values['guide_id']:
+            _guide_changes(per_guide.setdefault(values['guide_id'], Counter()), values, sign)
+    for guide_id, changes in per_guide.items():
+        _add(GuideFeedbackRollup, {'guide_id': guide_id}, day, changes)
+
+
+def _sum_columns(model):
+    return [field.name for field in model._meta.concrete_fields if field.name.endswith(('_count', '_sum'))]
+
+
+def trend(model, period, start, end, **filters):
+    """
+    [{'bucket': date, 'feedback_count': n, '<rating>_sum': n, ...}] for every
+    bucket from start to end, oldest first, summed over the rollup rows
+    matching `filters` (every tour or guide when there are none). Buckets
+    without feedback come back with zeros.
+    """
+    columns = _sum_columns(model)
+    rows = (
+        model.objects.filter(period=period, bucket__gte=bucket_of(period, start), bucket__lte=end, **filters)
+        .order_by().values('bucket')
+        .annotate(**{f'total_{column}': Sum(column) for column in columns})
+    )
+    found = {row['bucket']: row for row in rows}
+    if period == 'month':
+        first, last = bucket_of(period, start), bucket_of(period, end)
+        span = (last.year - first.year) * 12 + last.month - first.month + 1
+        buckets = months(span, last) if span > 0 else []
+    else:
+        buckets = [date.fromordinal(ordinal) for ordinal in range(start.toordinal(), end.toordinal() + 1)]
+    return [
+        {'bucket': bucket, **{column: (found[bucket][f'total_{column}'] if bucket in found else 0) for column in columns}}
+        for bucket in buckets
+    ]
+
+
+def totals(model, **filters):
+    """All-time {column: total} from the monthly rows matching `filters`"""
+    columns = _sum_columns(model)
+    result = model.objects.filter(period='month', **filters).aggregate(**{column: Sum(column) for column in columns})
+    return {column: value or 0 for column, value in result.items()}
+
+
+def average(row, column):
+    """The mean rating behind a `<rating>_sum` column of a trend row or totals, or None"""
+    return round(row[column] / row['feedback_count'], 1) if row['feedback_count'] else None
+
+
+def rebuild():
+    """Recompute both rollup tables from the feedback tables; returns the rows written"""
+    tour_sums = {column: Sum(field) for column, field in TOUR_SUMS.items()}
+    guide_sums = {column: Sum(field) for column, field in GUIDE_SUMS.items()}
+    written = 0
+    with transaction.atomic():
+        # Deleting first takes the write lock, so no increment lands between the recount and the insert
+        TourFeedbackRollup.objects.all().delete()
+        GuideFeedbackRollup.objects.all().delete()
+        for period, truncate in TRUNCATE.items():
+            tours = (
+                TourFeedback.objects.annotate(bucket=truncate('created_at', output_field=DateField()))
+                .order_by().values('booking__tour_date__tour_package_id', 'bucket')
+                .annotate(feedback_count=Count('id'), recommend_count=Count('id', filter=Q(would_recommend=True)), **tour_sums)
+            )
+            TourFeedbackRollup.objects.bulk_create([
+                TourFeedbackRollup(tour_package_id=row.pop('booking__tour_date__tour_package_id'), period=period, **row)
+                for row in tours
+            ], batch_size=500)
+            guides = (
+                GuideFeedback.objects.annotate(bucket=truncate('created_at', output_field=DateField()))
+                .order_by().values('guide_id', 'bucket')
+                .annotate(feedback_count=Count('id'), **guide_sums)
+            )
+            GuideFeedbackRollup.objects.bulk_create([
+                GuideFeedbackRollup(period=period, **row) for row in guides
+            ], batch_size=500)
+        written = TourFeedbackRollup.objects.count() + GuideFeedbackRollup.objects.count()
+    return written
@@ -0,0 +1,53 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from guides import stats
+from tour_operator import catalog_cache, counters
+from . import rollups
+from .models import TourFeedback, GuideFeedback
+
+
+@receiver(post_save, sender=TourFeedback)
+@receiver(post_delete, sender=TourFeedback)
+def tour_feedback_changed(sender, instance, **kwargs):
+    catalog_cache.bump('feedback')
+
+
+@receiver(post_save, sender=GuideFeedback)
+@receiver(post_delete, sender=GuideFeedback)
+def guide_feedback_changed(sender, instance, **kwargs):
+    catalog_cache.bump(f'guide:{instance.guide_id}')
+
+
+@receiver(post_save, sender=TourFeedback)
+def tour_feedback_saved(sender, instance, created, raw=False, **kwargs):
+    counters.saved(instance, created)
+    if raw:
+        return
+    before, after = stats.previous(instance, created), stats.current(instance)
+    if before != after:
+        rollups.tour_feedback_changed(before, after, instance.created_at)
+    instance._counted = after
+
+
+@receiver(post_delete, sender=TourFeedback)
+def tour_feedback_deleted(sender, instance, **kwargs):
+    counters.deleted(instance)
+    rollups.tour_feedback_changed(stats.previous(instance, False), None, instance.created_at)
+
+
+@receiver(post_save, sender=GuideFeedback)
+def guide_feedback_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    before, after = stats.previous(instance, created), stats.current(instance)
+    if before != after:
+        stats.feedback_changed(before, after)
+        rollups.guide_feedback_changed(before, after, instance.created_at)
+    instance._counted = after
+
+
+@receiver(post_delete, sender=GuideFeedback)
+def guide_feedback_deleted(sender, instance, **kwargs):
+    before = stats.previous(instance, False)
+    stats.feedback_changed(before, None)
+    rollups.guide_feedback_changed(before, None, instance.created_at)
@@ -1,3 +1,118 @@
-from django.test import TestCase
+from datetime import date, timedelta
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+from django.utils import timezone
+
+from bookings.models import Booking, Customer
+from guides.models import Guide
+from tours.models import TourDate, TourPackage
+from . import rollups
+from .models import GuideFeedback, GuideFeedbackRollup, TourFeedback, TourFeedbackRollup
+
+
+def create_booking(customer, name, guide=None):
+    package = TourPackage.objects.create(
+        name=name, description='', duration=2, price=100, max_participants=10, difficulty='easy',
+        location='Test', included_services='', excluded_services='', itinerary='',
+    )
+    start = date.today() - timedelta(days=10)
+    tour_date = TourDate.objects.create(
+        tour_package=package, start_date=start, end_date=start + timedelta(days=1), available_spots=10,
+    )
+    return Booking.objects.create(
+        customer=customer, tour_date=tour_date, guide=guide, participants=1, total_price=100, status='completed',
+    )
+
+
+class MonthsTests(SimpleTestCase):
+    def test_months_cross_the_year(self):
+        self.assertEqual(
+            rollups.months(3, today=date(2025, 2, 14)),
+            [date(2024, 12, 1), date(2025, 1, 1), date(2025, 2, 1)],
+        )
+
+
+class RollupTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        customer = Customer.objects.create(user=User.objects.create_user('customer'))
+        guide_user = User.objects.create_user('anna')
+        cls.guide = Guide.objects.create(
+            user=guide_user, phone='0', experience_years=5, languages='English', specializations='Hiking', bio='',
+        )
+        cls.trek = create_booking(customer, 'Alpine trek', guide=cls.guide)
+        cls.cruise = create_booking(customer, 'Lake cruise')
+        cls.today = timezone.localdate()
+
+    def tour_feedback(self, booking, overall, would_recommend=True):
+        return TourFeedback.objects.create(
+            booking=booking, overall_rating=overall, guide_rating=4, accommodation_rating=4,
+            value_for_money_rating=4, comments='', would_recommend=would_recommend,
+        )
+
+    def rollup(self, package, period='month'):
+        return TourFeedbackRollup.objects.filter(tour_package=package, period=period).values(
+            'bucket', 'feedback_count', 'overall_sum', 'recommend_count',
+        ).first()
+
+    def test_feedback_lands_in_its_day_and_month(self):
+        self.tour_feedback(self.trek, 5)
+        self.tour_feedback(self.cruise, 2, would_recommend=False)
+        trek = self.trek.tour_date.tour_package
+        self.assertEqual(self.rollup(trek, 'day'), {
+            'bucket': self.today, 'feedback_count': 1, 'overall_sum': 5, 'recommend_count': 1,
+        })
+        self.assertEqual(self.rollup(trek)['bucket'], self.today.replace(day=1))
+        totals = rollups.totals(TourFeedbackRollup)
+        self.assertEqual((totals['feedback_count'], totals['overall_sum'], totals['recommend_count']), (2, 7, 1))
+        self.assertEqual(rollups.average(totals, 'overall_sum'), 3.5)
+
+    def test_edits_and_deletes_move_the_counts(self):
+        feedback = self.tour_feedback(self.trek, 5)
+        feedback = TourFeedback.objects.get(pk=feedback.pk)
+        feedback.overall_rating, feedback.would_recommend = 3, False
+        feedback.save()
+        trek, cruise = self.trek.tour_date.tour_package, self.cruise.tour_date.tour_package
+        self.assertEqual(self.rollup(trek)['overall_sum'], 3)
+        self.assertEqual(self.rollup(trek)['recommend_count'], 0)
+
+        # Moving the feedback to another booking moves it to that tour
+        feedback.booking = self.cruise
+        feedback.save()
+        self.assertEqual(self.rollup(trek)['feedback_count'], 0)
+        self.assertEqual(self.rollup(cruise)['overall_sum'], 3)
+
+        feedback.delete()
+        self.assertEqual(rollups.totals(TourFeedbackRollup)['feedback_count'], 0)
+
+    def test_guide_trend_fills_empty_months(self):
+        GuideFeedback.objects.create(
+            guide=self.guide, booking=self.trek, knowledge_rating=5, communication_rating=4,
+            professionalism_rating=3, comments='',
+        )
+        first = rollups.months(3)[0]
+        trend = rollups.trend(GuideFeedbackRollup, 'month', first, self.today, guide=self.guide)
+        self.assertEqual([row['bucket'] for row in trend], rollups.months(3))
+        self.assertEqual([row['feedback_count'] for row in trend], [0, 0, 1])
+        self.assertEqual(rollups.average(trend[-1], 'knowledge_sum'), 5)
+
+    def test_rebuild_matches_the_running_totals(self):
+        self.tour_feedback(self.trek, 5)
+        self.tour_feedback(self.cruise, 2, would_recommend=False)
+        GuideFeedback.objects.create(
+            guide=self.guide, booking=self.trek, knowledge_rating=5, communication_rating=4,
+            professionalism_rating=3, comments='',
+        )
+        columns = ['tour_package_id', 'period', 'bucket', 'feedback_count', 'overall_sum', 'recommend_count']
+        running = sorted(TourFeedbackRollup.objects.values_list(*columns))
+        guides = sorted(GuideFeedbackRollup.objects.values_list('guide_id', 'period', 'bucket', 'knowledge_sum'))
+        self.assertEqual(rollups.rebuild(), 6)
+        self.assertEqual(sorted(TourFeedbackRollup.objects.values_list(*columns)), running)
+        self.assertEqual(sorted(GuideFeedbackRollup.objects.values_list('guide_id', 'period', 'bucket', 'knowledge_sum')), guides)
+
+        # Writes that skip the signals are only picked up by a rebuild
+        TourFeedback.objects.filter(booking=self.cruise).update(overall_rating=4)
+        self.assertEqual(self.rollup(self.cruise.tour_date.tour_package)['overall_sum'], 2)
+        rollups.rebuild()
+        self.assertEqual(self.rollup(self.cruise.tour_date.tour_package)['overall_sum'], 4)
@@ -1,9 +1,12 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from .models import TourFeedback, GuideFeedback
 from bookings.models import Booking
 from .forms import TourFeedbackForm, GuideFeedbackForm
+from notifications import emails
+from tour_operator.catalog_cache import cache_public_page, catalog_version
 
 @login_required
 def submit_feedback(request, booking_id):
@@ -18,15 +21,20 @@ def submit_feedback(request, booking_id):
         guide_form = GuideFeedbackForm(request.POST) if booking.guide else None
 
         if tour_form.is_valid() and (not guide_form or guide_form.is_valid()):
-            tour_feedback = tour_form.save(commit=False)
-            tour_feedback.booking = booking
-            tour_feedback.save()
+            # Both reviews and the emails about them are saved together
+            with transaction.atomic():
+                tour_feedback = tour_form.save(commit=False)
+                tour_feedback.booking = booking
+                tour_feedback.save()
 
-            if guide_form and booking.guide:
-                guide_feedback = guide_form.save(commit=False)
-                guide_feedback.guide = booking.guide
-                guide_feedback.booking = booking
-                guide_feedback.save()
+                guide_feedback = None
+                if guide_form and booking.guide:
+                    guide_feedback = guide_form.save(commit=False)
+                    guide_feedback.guide = booking.guide
+                    guide_feedback.booking = booking
+                    guide_feedback.save()
+
+                emails.feedback_received(tour_feedback, guide_feedback)
 
             messages.success(request, 'Thank you for your feedback!')
             return redirect('my_bookings')
@@ -40,6 +48,13 @@ def submit_feedback(request, booking_id):
         'booking': booking
     })
 
+@cache_public_page('feedback')
 def feedback_list(request):
-    tour_feedbacks = TourFeedback.objects.all().order_by('-created_at')[:10]
-    return render(request, 'feedback/feedback_list.html', {'feedbacks': tour_feedbacks})
+    tour_feedbacks = TourFeedback.objects.select_related(
+        'booking__customer__user',
+        'booking__tour_date__tour_package'
+    ).order_by('-created_at')[:10]
+    return render(request, 'feedback/feedback_list.html', {
+        'feedbacks': tour_feedbacks,
+        'cache_version': catalog_version('feedback'),
+    })
@@ -0,0 +1,275 @@
+"""
+Batch assignment of guides to confirmed bookings.
+
+plan_assignments() takes every confirmed booking without a guide whose tour
+starts in a date window and proposes a guide for each, in memory and
+without writing anything. A guide can take a booking when they
+
+  * are marked available and have no unavailable day on the tour's dates
+    (guides.calendar)
+  * are not on another active booking overlapping those dates, counting the
+    ones already proposed in this run (guides.conflicts)
+  * speak every language the booking's special requests name (guides.tags)
+
+Bookings with the fewest such guides are placed first, then by start date,
+so the flexible ones do not use up the only guide a constrained booking
+could have had. Each booking goes to the candidate scoring best, between
+0 and 1, on
+
+    specialization  package name, location and description against the
+                    guide's specializations
+    language        the customer's nationality against the guide's languages
+    rating          the guide's rating out of 5
+    workload        fewer tour days already held in the window
+
+apply_plan() writes a plan back with one bulk_update. It locks the bookings
+and the chosen guides' active bookings, then checks each assignment again
+against them. Assignments whose booking was assigned or changed since the
+plan was made, or whose guide is no longer free, are rejected and returned
+with the reason rather than replaced. posted_plan() rebuilds a previewed
+plan from its (booking, guide) pairs so exactly that plan is applied.
+"""
+import re
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import date
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+
+from bookings.matching import words
+from bookings.models import Booking
+from tour_operator import catalog_cache
+from . import stats
+from .calendar import unavailable_days
+from .conflicts import ACTIVE_STATUSES, ConflictIndex
+from .models import Guide
+from .tags import split_tags
+
+WEIGHTS = {'specialization': 0.35, 'language': 0.15, 'rating': 0.15, 'workload': 0.35}
+NEUTRAL = 0.5
+# Package words a guide's specializations must share for a full score
+SPECIALIZATION_MATCHES = 2
+
+
+@dataclass
+class Assignment:
+    booking: Booking
+    guide: Guide
+    # Left empty for assignments rebuilt by posted_plan()
+    score: float = 0.0
+    parts: dict = field(default_factory=dict)
+
+    @property
+    def percent(self):
+        return round(self.score * 100)
+
+
+@dataclass
+class Plan:
+    date_from: date
+    date_to: date
+    assignments: list = field(default_factory=list)
+    unassigned: list = field(default_factory=list)
+    elapsed: float = 0.0
+
+    def workload(self):
+        """[(guide, bookings proposed)] busiest first"""
+        counts = {}
+        for assignment in self.assignments:
+            guide, count = counts.get(assignment.guide.pk, (assignment.guide, 0))
+            counts[assignment.guide.pk] = (guide, count + 1)
+        return sorted(counts.values(), key=lambda item: (-item[1], item[0].pk))
+
+
+class _Candidate:
+    """Per-guide features computed once per run"""
+    __slots__ = ('guide', 'languages', 'specializations', 'rating', 'days')
+
+    def __init__(self, guide):
+        self.guide = guide
+        self.languages = {tag.slug: tag.name for tag in guide.language_tags.all()}
+        self.specializations = words(' '.join(tag.name for tag in guide.specialization_tags.all()))
+        self.rating = min(float(guide.rating or 0) / 5, 1.0)
+        self.days = 0
+
+
+def _held_days(index, guide_id, first, last):
+    return sum(
+        min(end, last) - max(start, first) + 1
+        for start, end, booking_id in index.for_guide(guide_id).overlapping(first, last)
+    )
+
+
+def _unassigned_bookings(date_from, date_to):
+    return Booking.objects.filter(
+        status='confirmed',
+        guide__isnull=True,
+        tour_date__start_date__gte=date_from,
+        tour_date__start_date__lte=date_to,
+    ).select_related('tour_date__tour_package', 'customer__user').order_by('tour_date__start_date', 'pk')
+
+
+def plan_assignments(date_from, date_to, bookings=None, guides=None):
+    """
+    Propose guides for the unassigned confirmed bookings starting between
+    date_from and date_to (inclusive); returns a Plan. `bookings` and
+    `guides` default to those in the database.
+    """
+    started = time.perf_counter()
+    plan = Plan(date_from, date_to)
+    if bookings is None:
+        bookings = _unassigned_bookings(date_from, date_to)
+    bookings = list(bookings)
+    if guides is None:
+        guides = Guide.objects.filter(is_available=True).select_related('user').order_by('-rating', 'pk')
+    guides = list(guides)
+    prefetch_related_objects(guides, 'language_tags', 'specialization_tags')
+    candidates = [_Candidate(guide) for guide in guides]
+    if not bookings:
+        plan.elapsed = time.perf_counter() - started
+        return plan
+
+    guide_ids = [candidate.guide.pk for candidate in candidates]
+    calendars = unavailable_days(guide_ids)
+    index = ConflictIndex.build(guide_ids, since=date_from)
+    first = min(booking.tour_date.start_date for booking in bookings).toordinal()
+    last = max(booking.tour_date.end_date for booking in bookings).toordinal()
+    for candidate in candidates:
+        candidate.days = _held_days(index, candidate.guide.pk, first, last)
+
+    # Language names as they may appear in special requests -> slug
+    known = {}
+    for candidate in candidates:
+        known.update((name.lower(), slug) for slug, name in candidate.languages.items())
+    known_slugs = set(known.values())
+    mentions = re.compile(r'\b(' + '|'.join(map(re.escape, sorted(known, key=len, reverse=True))) + r')\b') if known else None
+    package_words = {}
+
+    # Constraints that do not depend on this run's choices, checked once
+    options = []
+    for booking in bookings:
+        tour_date = booking.tour_date
+        package = tour_date.tour_package
+        if package.pk not in package_words:
+            package_words[package.pk] = words(f'{package.name} {package.location} {package.description}')
+        required = {known[name] for name in mentions.findall(booking.special_requests.lower())} if mentions else set()
+        speakers = [candidate for candidate in candidates if required <= candidate.languages.keys()]
+        free = [
+            candidate for candidate in speakers
+            if not calendars[candidate.guide.pk].any_in(tour_date.start_date, tour_date.end_date)
+            and not index.conflicts(candidate.guide.pk, tour_date.start_date, tour_date.end_date)
+        ]
+        if not speakers:
+            plan.unassigned.append((booking, f"No available guide speaks {', '.join(sorted(required)).title()}"))
+        elif not free:
+            plan.unassigned.append((booking, 'No guide is free on these dates'))
+        else:
+            options.append((len(free), tour_date.start_date, booking.pk, booking, free))
+
+    specialization_fit = {}
+    options.sort(key=lambda option: option[:3])
+    for count, start_date, booking_id, booking, free in options:
+        tour_date = booking.tour_date
+        start, end = tour_date.start_date.toordinal(), tour_date.end_date.toordinal()
+        nationality = split_tags(booking.customer.nationality).keys() & known_slugs
+        best = None
+        for candidate in free:
+            if index.for_guide(candidate.guide.pk).overlaps(start, end):
+                continue
+            key = (candidate.guide.pk, tour_date.tour_package_id)
+            if key not in specialization_fit:
+                shared = len(candidate.specializations & package_words[tour_date.tour_package_id])
+                specialization_fit[key] = min(shared, SPECIALIZATION_MATCHES) / SPECIALIZATION_MATCHES
+            parts = {
+                'specialization': specialization_fit[key],
+                'language': (1.0 if nationality & candidate.languages.keys() else 0.0) if nationality else NEUTRAL,
+                'rating': candidate.rating,
+                'workload': 1 / (1 + candidate.days / max(end - start + 1, 1)),
+            }
+            score = sum(WEIGHTS[name] * value for name, value in parts.items())
+            if best is None or score > best[0]:
+                best = (score, candidate, parts)
+        if best is None:
+            plan.unassigned.append((booking, 'Every free guide went to an overlapping booking'))
+            continue
+        score, candidate, parts = best
+        index.add(candidate.guide.pk, tour_date.start_date, tour_date.end_date, booking.pk)
+        candidate.days += end - start + 1
+        plan.assignments.append(Assignment(booking, candidate.guide, score, parts))
+
+    plan.assignments.sort(key=lambda assignment: (assignment.booking.tour_date.start_date, assignment.booking.pk))
+    plan.unassigned.sort(key=lambda item: (item[0].tour_date.start_date, item[0].pk))
+    plan.elapsed = time.perf_counter() - started
+    return plan
+
+
+def posted_plan(date_from, date_to, pairs):
+    """
+    The Plan made of `pairs` of (booking id, guide id), as a preview posts
+    them back. Pairs naming a booking or guide that no longer exists are
+    dropped; everything else is checked by apply_plan().
+    """
+    pairs = dict(pairs)
+    bookings = Booking.objects.select_related('tour_date__tour_package').in_bulk(list(pairs))
+    guides = Guide.objects.select_related('user').in_bulk(set(pairs.values()))
+    plan = Plan(date_from, date_to)
+    for booking_id, guide_id in pairs.items():
+        if booking_id in bookings and guide_id in guides:
+            plan.assignments.append(Assignment(bookings[booking_id], guides[guide_id]))
+    return plan
+
+
+def apply_plan(plan):
+    """
+    Save a plan's assignments with one bulk_update. Returns the number saved
+    and a list of (assignment, reason) for those rejected: bookings that
+    were given a guide, or stopped being confirmed, after the plan was made,
+    and guides who have since been marked unavailable, taken an overlapping
+    booking or marked one of the tour's days unavailable.
+    """
+    by_id = {assignment.booking.pk: assignment for assignment in plan.assignments}
+    if not by_id:
+        return 0, []
+    guide_ids = {assignment.guide.pk for assignment in by_id.values()}
+    with transaction.atomic():
+        # Lock the bookings being assigned and the chosen guides' active
+        # bookings, so neither changes between the check below and the write
+        still_open = set(
+            Booking.objects.select_for_update()
+            .filter(pk__in=list(by_id), guide__isnull=True, status='confirmed')
+            .values_list('pk', flat=True)
+        )
+        list(
+            Booking.objects.select_for_update()
+            .filter(guide_id__in=guide_ids, status__in=ACTIVE_STATUSES)
+            .values_list('pk', flat=True)
+        )
+        available = set(Guide.objects.filter(pk__in=guide_ids, is_available=True).values_list('pk', flat=True))
+        since = min(assignment.booking.tour_date.start_date for assignment in by_id.values())
+        # Read from the table, not the cache, so a day marked off since the plan is seen
+        calendars = unavailable_days(guide_ids, fresh=True)
+        index = ConflictIndex.build(guide_ids, since=since)
+        changed, rejected = [], []
+        for assignment in by_id.values():
+            booking, guide_id = assignment.booking, assignment.guide.pk
+            tour_date = booking.tour_date
+            if booking.pk not in still_open:
+                rejected.append((assignment, 'The booking was assigned or changed since the preview'))
+            elif guide_id not in available:
+                rejected.append((assignment, 'The guide is no longer available'))
+            elif calendars[guide_id].any_in(tour_date.start_date, tour_date.end_date):
+                rejected.append((assignment, 'The guide is off on one of these days'))
+            elif index.conflicts(guide_id, tour_date.start_date, tour_date.end_date):
+                rejected.append((assignment, 'The guide has an overlapping booking'))
+            else:
+                index.add(guide_id, tour_date.start_date, tour_date.end_date, booking.pk)
+                booking.guide = assignment.guide
+                changed.append(booking)
+        Booking.objects.bulk_update(changed, ['guide'])
+        # bulk_update skips the post_save handlers that refresh guide profiles and stats
+        stats.count_bookings(added=Counter((booking.guide_id, booking.status) for booking in changed))
+        for guide_id in {booking.guide_id for booking in changed}:
+            catalog_cache.bump(f'guide:{guide_id}')
+    return len(changed), rejected
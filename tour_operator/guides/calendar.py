@@ -0,0 +1,191 @@
+"""
+Per-guide day calendars stored as bitsets.
+
+A DayBitmap holds a set of days as the bits of one Python integer, bit i
+standing for the day `origin + i` (proleptic ordinals, see
+date.toordinal). Asking whether any day of a range is set, or which ones
+are, is a shift and a mask however long the range, so a check over years
+of dates costs microseconds.
+
+unavailable_days() returns the days each guide marked unavailable in
+GuideAvailability. Bitmaps are cached per guide in the shared cache; the
+signals in guides.signals rebuild a guide's bitmap after its availability
+changes, and guides missing from the cache are loaded together with one
+query. Code about to assign a guide passes fresh=True to read the table
+itself, inside its transaction, rather than trust a cached bitmap.
+
+set_availability() writes a rule, a date range and a mask of weekdays,
+for one guide as a single upsert:
+
+    set_availability(guide_id, date(2025, 10, 1), date(2025, 12, 31), False, weekdays=WEEKENDS)
+
+marks every Saturday and Sunday until December unavailable. Weekday bit i
+stands for date.weekday() == i (Monday is 0).
+"""
+from datetime import date
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from .models import GuideAvailability
+
+CACHE_PREFIX = 'guide-calendar:'
+CACHE_TIMEOUT = 60 * 60 * 24
+
+WEEKDAY_CHOICES = [(0, 'Mon'), (1, 'Tue'), (2, 'Wed'), (3, 'Thu'), (4, 'Fri'), (5, 'Sat'), (6, 'Sun')]
+EVERY_DAY = 0b1111111
+WEEKDAYS = 0b0011111
+WEEKENDS = 0b1100000
+# Longest range one rule may cover
+MAX_RULE_DAYS = 366 * 2
+
+
+class DayBitmap:
+    """An immutable set of dates packed into an integer"""
+    __slots__ = ('origin', 'bits')
+
+    def __init__(self, origin=0, bits=0):
+        self.origin = origin
+        self.bits = bits
+
+    @classmethod
+    def from_dates(cls, dates):
+        ordinals = [day.toordinal() for day in dates]
+        if not ordinals:
+            return cls()
+        origin = min(ordinals)
+        bits = 0
+        for ordinal in ordinals:
+            bits |= 1 << (ordinal - origin)
+        return cls(origin, bits)
+
+    def _window(self, start, end):
+        """The bits for start..end (inclusive), shifted down to bit 0"""
+        first, last = start.toordinal(), end.toordinal()
+        if last < first or not self.bits:
+            return 0, first
+        low = max(first - self.origin, 0)
+        high = last - self.origin
+        if high < 0:
+            return 0, first
+        return (self.bits >> low) & ((1 << (high - low + 1)) - 1), self.origin + low
+
+    def __contains__(self, day):
+        offset = day.toordinal() - self.origin
+        return offset >= 0 and bool(self.bits >> offset & 1)
+
+    def __bool__(self):
+        return bool(self.bits)
+
+    def any_in(self, start, end):
+        return bool(self._window(start, end)[0])
+
+    def days_in(self, start, end):
+        """The set days between start and end, in order"""
+        window, base = self._window(start, end)
+        days = []
+        while window:
+            lowest = window & -window
+            days.append(date.fromordinal(base + lowest.bit_length() - 1))
+            window ^= lowest
+        return days
+
+    def __eq__(self, other):
+        return isinstance(other, DayBitmap) and (self.origin, self.bits) == (other.origin, other.bits)
+
+    def __repr__(self):
+        return f'DayBitmap({self.bits.bit_count()} days from {date.fromordinal(self.origin) if self.bits else None})'
+
+
+def _cache_key(guide_id):
+    return f'{CACHE_PREFIX}{guide_id}'
+
+
+def _load(guide_ids):
+    days = {guide_id: [] for guide_id in guide_ids}
+    rows = GuideAvailability.objects.filter(guide_id__in=guide_ids, is_available=False).values_list('guide_id', 'date')
+    for guide_id, day in rows:
+        days[guide_id].append(day)
+    return {guide_id: DayBitmap.from_dates(dates) for guide_id, dates in days.items()}
+
+
+def unavailable_days(guide_ids, fresh=False):
+    """
+    {guide_id: DayBitmap} of the days each guide is marked unavailable;
+    with `fresh` they are read from the database and the cache refreshed
+    """
+    guide_ids = list(guide_ids)
+    if fresh:
+        loaded = _load(guide_ids)
+        _store(loaded)
+        return loaded
+    cached = cache.get_many([_cache_key(guide_id) for guide_id in guide_ids])
+    bitmaps, missing = {}, []
+    for guide_id in guide_ids:
+        entry = cached.get(_cache_key(guide_id))
+        if entry is None:
+            missing.append(guide_id)
+        else:
+            bitmaps[guide_id] = DayBitmap(*entry)
+    if missing:
+        loaded = _load(missing)
+        _store(loaded)
+        bitmaps.update(loaded)
+    return bitmaps
+
+
+def _store(bitmaps):
+    cache.set_many({_cache_key(guide_id): (bitmap.origin, bitmap.bits) for guide_id, bitmap in bitmaps.items()}, CACHE_TIMEOUT)
+
+
+def rebuild(guide_id):
+    """Reload one guide's bitmap from the database into the cache"""
+    return unavailable_days([guide_id], fresh=True)[guide_id]
+
+
+def rule_days(start, end, weekdays=EVERY_DAY):
+    """The days from start to end (inclusive) whose weekday is in the `weekdays` mask"""
+    days = (date.fromordinal(ordinal) for ordinal in range(start.toordinal(), end.toordinal() + 1))
+    return [day for day in days if weekdays >> day.weekday() & 1]
+
+
+def parse_rule(params):
+    """
+    (start, end, weekdays) from the `date`, optional `date_to` and repeated
+    `weekdays` (0-6) parameters of an availability form; raises ValueError
+    with a message for the user when they do not make a rule
+    """
+    start = parse_date(params.get('date') or '')
+    if start is None:
+        raise ValueError('Please choose a valid date.')
+    end = parse_date(params.get('date_to') or '') or start
+    if end < start:
+        raise ValueError('The end date must not be before the start date.')
+    if (end - start).days >= MAX_RULE_DAYS:
+        raise ValueError(f'Please choose a range of at most {MAX_RULE_DAYS} days.')
+    weekdays = 0
+    for value in params.getlist('weekdays'):
+        if value.isdigit() and int(value) < 7:
+            weekdays |= 1 << int(value)
+    weekdays = weekdays or EVERY_DAY
+    if not rule_days(start, end, weekdays):
+        raise ValueError('None of the selected weekdays falls in that range.')
+    return start, end, weekdays
+
+
+def set_availability(guide_id, start, end, is_available, weekdays=EVERY_DAY):
+    """
+    Mark the days of a rule available or not for one guide, inserting or
+    updating their GuideAvailability rows in one statement; returns the days
+    """
+    days = rule_days(start, end, weekdays)
+    GuideAvailability.objects.bulk_create(
+        [GuideAvailability(guide_id=guide_id, date=day, is_available=is_available) for day in days],
+        update_conflicts=True,
+        unique_fields=['guide', 'date'],
+        update_fields=['is_available'],
+    )
+    # bulk_create skips the post_save handler that refreshes the cached bitmap
+    transaction.on_commit(lambda: rebuild(guide_id))
+    return days
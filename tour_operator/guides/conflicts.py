@@ -0,0 +1,127 @@
+"""
+Booking conflict detection for guides.
+
+ConflictIndex loads the confirmed and pending bookings of a set of guides
+with one query and keeps, per guide, their tour date ranges sorted by
+start date together with the running maximum of the end dates. A range
+[start, end] clashes with a guide's bookings when some booking starts on
+or before `end` and, among those, the latest end falls on or after
+`start`: one bisect and one lookup, however many bookings the guide has.
+
+feasible_guides() combines it with the guides' unavailable days (see
+guides.calendar) to list the guides who can take a tour date.
+"""
+from bisect import bisect_right
+from datetime import date
+
+from bookings.models import Booking
+from .calendar import DayBitmap, unavailable_days
+from .models import Guide
+
+ACTIVE_STATUSES = ('confirmed', 'pending')
+
+
+class GuideBookings:
+    """One guide's booked ranges as sorted start ordinals and running max ends"""
+    __slots__ = ('starts', 'max_ends', 'ranges')
+
+    def __init__(self, ranges):
+        self.ranges = sorted(ranges)
+        self.starts = [start for start, end, booking_id in self.ranges]
+        self.max_ends = []
+        latest = None
+        for start, end, booking_id in self.ranges:
+            latest = end if latest is None or end > latest else latest
+            self.max_ends.append(latest)
+
+    def overlaps(self, start, end):
+        """True if any booking shares a day with start..end (ordinals, inclusive)"""
+        count = bisect_right(self.starts, end)
+        return count > 0 and self.max_ends[count - 1] >= start
+
+    def overlapping(self, start, end):
+        """(start, end, booking_id) of every booking sharing a day with start..end"""
+        count = bisect_right(self.starts, end)
+        return [item for item in self.ranges[:count] if item[1] >= start]
+
+    def add(self, start, end, booking_id):
+        """Insert a range, recomputing the running max from its position on"""
+        position = bisect_right(self.ranges, (start, end, booking_id))
+        self.ranges.insert(position, (start, end, booking_id))
+        self.starts.insert(position, start)
+        self.max_ends.insert(position, end)
+        latest = self.max_ends[position - 1] if position else None
+        for index in range(position, len(self.ranges)):
+            range_end = self.ranges[index][1]
+            latest = range_end if latest is None or range_end > latest else latest
+            self.max_ends[index] = latest
+
+
+class ConflictIndex:
+    EMPTY = GuideBookings([])
+
+    def __init__(self, ranges_by_guide):
+        self.guides = {guide_id: GuideBookings(ranges) for guide_id, ranges in ranges_by_guide.items()}
+
+    @classmethod
+    def build(cls, guide_ids=None, since=None, exclude_booking_ids=()):
+        """
+        Index the active bookings of `guide_ids` (all guides when None) whose
+        tour date ends on or after `since`.
+        """
+        bookings = Booking.objects.filter(guide__isnull=False, status__in=ACTIVE_STATUSES)
+        if guide_ids is not None:
+            bookings = bookings.filter(guide_id__in=list(guide_ids))
+        if since is not None:
+            bookings = bookings.filter(tour_date__end_date__gte=since)
+        if exclude_booking_ids:
+            bookings = bookings.exclude(pk__in=list(exclude_booking_ids))
+
+        ranges = {}
+        rows = bookings.values_list('guide_id', 'tour_date__start_date', 'tour_date__end_date', 'pk')
+        for guide_id, start, end, booking_id in rows:
+            ranges.setdefault(guide_id, []).append((start.toordinal(), end.toordinal(), booking_id))
+        return cls(ranges)
+
+    def for_guide(self, guide_id):
+        return self.guides.get(guide_id, self.EMPTY)
+
+    def conflicts(self, guide_id, start, end):
+        return self.for_guide(guide_id).overlaps(start.toordinal(), end.toordinal())
+
+    def add(self, guide_id, start, end, booking_id):
+        """Record a booking made after the index was built"""
+        if guide_id not in self.guides:
+            self.guides[guide_id] = GuideBookings([])
+        self.guides[guide_id].add(start.toordinal(), end.toordinal(), booking_id)
+
+    def booked_days(self, guide_id, start, end):
+        """DayBitmap of the days in start..end the guide is on a booked tour"""
+        first, last = start.toordinal(), end.toordinal()
+        days = set()
+        for booked_start, booked_end, booking_id in self.for_guide(guide_id).overlapping(first, last):
+            for ordinal in range(max(booked_start, first), min(booked_end, last) + 1):
+                days.add(date.fromordinal(ordinal))
+        return DayBitmap.from_dates(days)
+
+
+def feasible_guides(tour_date, exclude_booking_ids=(), guides=None, fresh=False):
+    """
+    Available guides free for the whole of `tour_date`: not marked
+    unavailable on any of its days and not on another active booking that
+    overlaps it. Bookings in `exclude_booking_ids` (usually the one being
+    assigned) do not count as conflicts. Pass `fresh` before assigning, so
+    unavailable days are read from the database rather than the cache.
+    """
+    if guides is None:
+        guides = Guide.objects.filter(is_available=True).select_related('user').order_by('-rating', 'pk')
+    guides = list(guides)
+    guide_ids = [guide.pk for guide in guides]
+    calendars = unavailable_days(guide_ids, fresh=fresh)
+    index = ConflictIndex.build(guide_ids, since=tour_date.start_date, exclude_booking_ids=exclude_booking_ids)
+    return [
+        guide for guide in guides
+        if not calendars[guide.pk].any_in(tour_date.start_date, tour_date.end_date)
+        and not index.conflicts(guide.pk, tour_date.start_date, tour_date.end_date)
+    ]
+
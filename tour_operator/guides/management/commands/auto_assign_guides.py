@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from guides.assignment import apply_plan, plan_assignments
+
+
+class Command(BaseCommand):
+    help = (
+        'Propose guides for every confirmed booking without one whose tour starts in a date '
+        'window. Prints the plan; pass --commit to save it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', type=date.fromisoformat, help='First start date (default today)')
+        parser.add_argument('--to', dest='date_to', type=date.fromisoformat, help='Last start date (default 30 days on)')
+        parser.add_argument('--commit', action='store_true', help='Save the assignments')
+        parser.add_argument('--limit', type=int, default=20, help='Assignments to list (0 for all)')
+
+    def handle(self, *args, **options):
+        date_from = options['date_from'] or date.today()
+        date_to = options['date_to'] or date_from + timedelta(days=30)
+        if date_to < date_from:
+            raise CommandError('--to must not be before --from')
+
+        plan = plan_assignments(date_from, date_to)
+        shown = plan.assignments if not options['limit'] else plan.assignments[:options['limit']]
+        for assignment in shown:
+            booking = assignment.booking
+            self.stdout.write(
+                f'  booking {booking.pk} ({booking.tour_date.start_date}, {booking.tour_date.tour_package.name})'
+                f' -> {assignment.guide} [{assignment.percent}%]'
+            )
+        if len(shown) < len(plan.assignments):
+            self.stdout.write(f'  ... and {len(plan.assignments) - len(shown)} more')
+        for booking, reason in plan.unassigned:
+            self.stdout.write(self.style.WARNING(f'  booking {booking.pk} ({booking.tour_date.start_date}): {reason}'))
+
+        message = (
+            f'Planned {len(plan.assignments)} of {len(plan.assignments) + len(plan.unassigned)} bookings '
+            f'from {date_from} to {date_to} in {plan.elapsed:.2f}s'
+        )
+        if options['commit']:
+            saved, rejected = apply_plan(plan)
+            for assignment, reason in rejected:
+                self.stdout.write(self.style.WARNING(f'  booking {assignment.booking.pk} not saved: {reason}'))
+            message += f'; saved {saved}'
+        self.stdout.write(self.style.SUCCESS(message))
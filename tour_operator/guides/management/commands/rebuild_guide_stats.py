@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from guides.stats import rebuild
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute every guide\'s GuideStats row and rating from their feedback and bookings. '
+        'Run after bulk imports or anything else that bypassed the model signals.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('guide_ids', nargs='*', type=int, help='Only these guides (default all)')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        rows = rebuild(options['guide_ids'] or None)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt stats for {len(rows)} guides in {elapsed:.2f}s'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['created_at', 'id'], name='guide_created_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0002_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=models.Index(fields=['updated_at'], name='guide_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:35
+
+import re
+
+from django.db import migrations, models
+from django.utils.text import slugify
+
+SEPARATORS = re.compile(r'[,;/|\n]+')
+
+
+def split_tags(text, max_length):
+    """{slug: name} of the entries of a comma-separated list (a copy of guides.tags.split_tags)"""
+    tags = {}
+    for entry in SEPARATORS.split(text or ''):
+        name = ' '.join(entry.split())[:max_length].rstrip()
+        slug = slugify(name)[:max_length].strip('-')
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def split_existing_tags(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    guides = list(Guide.objects.values_list('pk', 'languages', 'specializations'))
+    # The slug and name lengths of each tag model below
+    for model_name, relation, column, position, max_length in (
+        ('Language', 'language_tags', 'language', 1, 100),
+        ('Specialization', 'specialization_tags', 'specialization', 2, 150),
+    ):
+        model = apps.get_model('guides', model_name)
+        per_guide = {row[0]: split_tags(row[position], max_length) for row in guides}
+        names = {}
+        for tags in per_guide.values():
+            for slug, name in tags.items():
+                names.setdefault(slug, name)
+        model.objects.bulk_create([model(slug=slug, name=name) for slug, name in names.items()], batch_size=500)
+        ids = dict(model.objects.values_list('slug', 'pk'))
+        through = getattr(Guide, relation).through
+        through.objects.bulk_create([
+            through(**{'guide_id': guide_id, f'{column}_id': ids[slug]})
+            for guide_id, tags in per_guide.items() for slug in tags
+        ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0003_guide_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Language',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Specialization',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=150)),
+                ('slug', models.SlugField(max_length=150, unique=True)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.AddField(
+            model_name='guide',
+            name='language_tags',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='guides', to='guides.language'),
+        ),
+        migrations.AddField(
+            model_name='guide',
+            name='specialization_tags',
+            field=models.ManyToManyField(blank=True, editable=False, related_name='guides', to='guides.specialization'),
+        ),
+        migrations.RunPython(split_existing_tags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,80 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:39
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Count
+import django.db.models.deletion
+
+STATUSES = ('pending', 'confirmed', 'cancelled', 'completed')
+
+
+def build_stats(apps, schema_editor):
+    Guide = apps.get_model('guides', 'Guide')
+    GuideStats = apps.get_model('guides', 'GuideStats')
+    GuideFeedback = apps.get_model('feedback', 'GuideFeedback')
+    Booking = apps.get_model('bookings', 'Booking')
+
+    rows = {guide_id: GuideStats(guide_id=guide_id) for guide_id in Guide.objects.values_list('pk', flat=True)}
+    feedback = GuideFeedback.objects.values_list('guide_id', 'knowledge_rating', 'communication_rating', 'professionalism_rating')
+    for guide_id, knowledge, communication, professionalism in feedback.iterator():
+        row = rows[guide_id]
+        row.feedback_count += 1
+        row.knowledge_sum += knowledge
+        row.communication_sum += communication
+        row.professionalism_sum += professionalism
+        score = (knowledge + communication + professionalism + 1) // 3
+        setattr(row, f'rated_{score}', getattr(row, f'rated_{score}') + 1)
+    bookings = Booking.objects.exclude(guide=None).order_by().values_list('guide_id', 'status').annotate(count=Count('id'))
+    for guide_id, status, count in bookings:
+        if status in STATUSES:
+            setattr(rows[guide_id], f'bookings_{status}', count)
+    GuideStats.objects.bulk_create(rows.values(), batch_size=500)
+
+    # The hand-entered ratings give way to the feedback average (0 without feedback)
+    guides = list(Guide.objects.only('pk', 'rating'))
+    for guide in guides:
+        row = rows[guide.pk]
+        total = row.knowledge_sum + row.communication_sum + row.professionalism_sum
+        guide.rating = round(Decimal(total) / (3 * row.feedback_count), 2) if row.feedback_count else Decimal('0')
+    Guide.objects.bulk_update(guides, ['rating'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0004_guide_tags'),
+        ('bookings', '0004_customtourrequest_parsed_fields'),
+        ('feedback', '0002_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GuideStats',
+            fields=[
+                ('guide', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='guides.guide')),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('knowledge_sum', models.PositiveIntegerField(default=0)),
+                ('communication_sum', models.PositiveIntegerField(default=0)),
+                ('professionalism_sum', models.PositiveIntegerField(default=0)),
+                ('rated_1', models.PositiveIntegerField(default=0)),
+                ('rated_2', models.PositiveIntegerField(default=0)),
+                ('rated_3', models.PositiveIntegerField(default=0)),
+                ('rated_4', models.PositiveIntegerField(default=0)),
+                ('rated_5', models.PositiveIntegerField(default=0)),
+                ('bookings_pending', models.PositiveIntegerField(default=0)),
+                ('bookings_confirmed', models.PositiveIntegerField(default=0)),
+                ('bookings_cancelled', models.PositiveIntegerField(default=0)),
+                ('bookings_completed', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'guide stats',
+            },
+        ),
+        migrations.AlterField(
+            model_name='guide',
+            name='rating',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=3),
+        ),
+        migrations.RunPython(build_stats, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,55 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+class Language(models.Model):
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
+class Specialization(models.Model):
+    name = models.CharField(max_length=150)
+    slug = models.SlugField(max_length=150, unique=True)
+
+    class Meta:
+        ordering = ['name']
+
+    def __str__(self):
+        return self.name
+
 class Guide(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     phone = models.CharField(max_length=15)
     experience_years = models.IntegerField()
     languages = models.CharField(max_length=200, help_text="Comma-separated languages")
     specializations = models.CharField(max_length=300, help_text="Areas of expertise")
+    # One row per entry of the two fields above, kept in sync by guides.signals (see guides.tags)
+    language_tags = models.ManyToManyField(Language, blank=True, related_name='guides', editable=False)
+    specialization_tags = models.ManyToManyField(Specialization, blank=True, related_name='guides', editable=False)
     bio = models.TextField()
     is_available = models.BooleanField(default=True)
-    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00)
+    # Mean of the GuideFeedback ratings, maintained by guides.stats
+    rating = models.DecimalField(max_digits=3, decimal_places=2, default=0.00, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='guide_created_idx'),
+            models.Index(fields=['updated_at'], name='guide_updated_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # rating is maintained by guides.stats; a stale copy in memory must not overwrite it
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields if not field.primary_key and field.name != 'rating'
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.user.first_name} {self.user.last_name}"
@@ -25,3 +64,65 @@ class GuideAvailability(models.Model):
 
     def __str__(self):
         return f"{self.guide} - {self.date} ({'Available' if self.is_available else 'Unavailable'})"
+
+class GuideStats(models.Model):
+    """
+    Running totals behind a guide's rating and dashboards, kept up to date
+    by guides.stats as feedback and bookings change. Rebuild with
+    `manage.py rebuild_guide_stats`.
+    """
+    guide = models.OneToOneField(Guide, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    feedback_count = models.PositiveIntegerField(default=0)
+    knowledge_sum = models.PositiveIntegerField(default=0)
+    communication_sum = models.PositiveIntegerField(default=0)
+    professionalism_sum = models.PositiveIntegerField(default=0)
+    # Feedback by overall score (the rounded mean of the three ratings)
+    rated_1 = models.PositiveIntegerField(default=0)
+    rated_2 = models.PositiveIntegerField(default=0)
+    rated_3 = models.PositiveIntegerField(default=0)
+    rated_4 = models.PositiveIntegerField(default=0)
+    rated_5 = models.PositiveIntegerField(default=0)
+    bookings_pending = models.PositiveIntegerField(default=0)
+    bookings_confirmed = models.PositiveIntegerField(default=0)
+    bookings_cancelled = models.PositiveIntegerField(default=0)
+    bookings_completed = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name_plural = 'guide stats'
+
+    def __str__(self):
+        return f"Stats for {self.guide_id}"
+
+    def _average(self, total):
+        return round(total / self.feedback_count, 1) if self.feedback_count else None
+
+    @property
+    def avg_knowledge(self):
+        return self._average(self.knowledge_sum)
+
+    @property
+    def avg_communication(self):
+        return self._average(self.communication_sum)
+
+    @property
+    def avg_professionalism(self):
+        return self._average(self.professionalism_sum)
+
+    @property
+    def rating(self):
+        if not self.feedback_count:
+            return 0
+        return round((self.knowledge_sum + self.communication_sum + self.professionalism_sum) / (3 * self.feedback_count), 2)
+
+    @property
+    def rating_counts(self):
+        """[{'rating': 5, 'count': n}, ...] from best to worst"""
+        return [{'rating': stars, 'count': getattr(self, f'rated_{stars}')} for stars in range(5, 0, -1)]
+
+    @property
+    def positive_feedback(self):
+        return self.rated_4 + self.rated_5
+
+    @property
+    def total_bookings(self):
+        return self.bookings_pending + self.bookings_confirmed + self.bookings_cancelled + self.bookings_completed
@@ -0,0 +1,66 @@
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from tour_operator import catalog_cache, counters
+from . import calendar, tags
+from .models import Guide, GuideAvailability, GuideStats
+
+
+@receiver(post_save, sender=Guide)
+@receiver(post_delete, sender=Guide)
+def guide_changed(sender, instance, **kwargs):
+    catalog_cache.bump('guides', f'guide:{instance.pk}')
+
+
+@receiver(post_save, sender=Guide)
+def guide_counted(sender, instance, created, **kwargs):
+    counters.saved(instance, created)
+
+
+@receiver(post_delete, sender=Guide)
+def guide_uncounted(sender, instance, **kwargs):
+    counters.deleted(instance)
+
+
+@receiver(post_save, sender=GuideAvailability)
+@receiver(post_delete, sender=GuideAvailability)
+def availability_changed(sender, instance, **kwargs):
+    guide_id = instance.guide_id
+    transaction.on_commit(lambda: calendar.rebuild(guide_id))
+
+
+@receiver(post_save, sender=Guide)
+def guide_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    if created:
+        GuideStats.objects.get_or_create(guide=instance)
+    fields = [field for field in tags.FIELDS if update_fields is None or field in update_fields]
+    if fields:
+        tags.sync_tags(instance, fields)
+
+
+def _links_changed(field):
+    def handler(sender, instance, action, reverse, pk_set, **kwargs):
+        if action == 'pre_clear' and reverse:
+            # The cleared guides are gone by post_clear
+            instance._cleared_guide_ids = list(instance.guides.values_list('pk', flat=True))
+            return
+        if action not in ('post_add', 'post_remove', 'post_clear'):
+            return
+        if not reverse:
+            changed = tags.refresh_text(field, [instance.pk])
+            if instance.pk in changed:
+                setattr(instance, field, changed[instance.pk])
+        else:
+            guide_ids = pk_set if action != 'post_clear' else getattr(instance, '_cleared_guide_ids', ())
+            if guide_ids:
+                tags.refresh_text(field, list(guide_ids))
+    return handler
+
+
+for _field, (_model, _relation, _column) in tags.FIELDS.items():
+    m2m_changed.connect(
+        _links_changed(_field), sender=getattr(Guide, _relation).through, weak=False,
+        dispatch_uid=f'guides.{_relation}_changed',
+    )
@@ -0,0 +1,185 @@
+"""
+Incrementally maintained guide statistics.
+
+Each guide has one GuideStats row of running totals: the sum of every
+GuideFeedback rating dimension, the feedback count overall and per overall
+score, and the number of bookings in each status. The signals in
+bookings.signals and feedback.signals turn each saved or deleted row into
+deltas applied with one UPDATE ... SET total = total + n per guide, so
+concurrent writers never lose an increment, and Guide.rating is rewritten
+from the new sums in the same transaction. Pages read averages,
+totals and ratings off the row instead of aggregating.
+
+Writes that skip the signals (QuerySet.update, bulk_update, bulk_create)
+report their changes with count_bookings(). `manage.py rebuild_guide_stats`
+recomputes everything from the feedback and booking tables.
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, F, FloatField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Cast, Coalesce, Round
+from django.utils import timezone
+
+from bookings.models import Booking
+from feedback.models import GuideFeedback
+from tour_operator import catalog_cache
+from .models import Guide, GuideStats
+
+RATINGS = ('knowledge', 'communication', 'professionalism')
+STATUSES = tuple(status for status, label in Booking.STATUS_CHOICES)
+RATING_FIELDS = {'feedback_count'} | {f'{name}_sum' for name in RATINGS}
+
+
+def stars(total):
+    """Overall score for the sum of the three ratings, as GuideFeedback.rating"""
+    return (total + 1) // 3
+
+
+def previous(instance, created):
+    """
+    The values of `instance.COUNTED_FIELDS` as last counted (None for a new
+    row); fields that were never loaded are taken as unchanged
+    """
+    if created:
+        return None
+    counted = getattr(instance, '_counted', {})
+    return {name: counted[name] if name in counted else getattr(instance, name) for name in instance.COUNTED_FIELDS}
+
+
+def current(instance):
+    return {name: getattr(instance, name) for name in instance.COUNTED_FIELDS}
+
+
+def _refresh_ratings(guide_ids):
+    """Set Guide.rating from the stats sums in the database"""
+    score = GuideStats.objects.filter(guide=OuterRef('pk'), feedback_count__gt=0).annotate(
+        score=Round(
+            Cast(F('knowledge_sum') + F('communication_sum') + F('professionalism_sum'), FloatField())
+            / (F('feedback_count') * len(RATINGS)),
+            2,
+        )
+    ).values('score')
+    Guide.objects.filter(pk__in=list(guide_ids)).update(
+        rating=Cast(Coalesce(Subquery(score, output_field=FloatField()), Value(0.0)), DecimalField(max_digits=3, decimal_places=2)),
+        updated_at=timezone.now(),
+    )
+    # The guide list is ordered by rating
+    catalog_cache.bump('guides', *(f'guide:{guide_id}' for guide_id in guide_ids))
+
+
+def _apply(deltas):
+    """Add {guide_id: {field: n}} to the stats rows"""
+    rated = []
+    for guide_id, changes in deltas.items():
+        changes = {name: count for name, count in changes.items() if count}
+        if not changes:
+            continue
+        # A guide being deleted may already have lost its row; nothing to keep then
+        updated = GuideStats.objects.filter(guide_id=guide_id).update(
+            **{name: F(name) + count for name, count in changes.items()}
+        )
+        if updated and RATING_FIELDS & changes.keys():
+            rated.append(guide_id)
+    if rated:
+        _refresh_ratings(rated)
+
+
+def _count_feedback(deltas, values, sign):
+    if not values or not values['guide_id']:
+        return
+    changes = deltas[values['guide_id']]
+    changes['feedback_count'] += sign
+    total = 0
+    for name in RATINGS:
+        changes[f'{name}_sum'] += sign * values[f'{name}_rating']
+        total += values[f'{name}_rating']
+    changes[f'rated_{stars(total)}'] += sign
+
+
+def _count_booking(deltas, values, sign):
+    if values and values['guide_id'] and values['status'] in STATUSES:
+        deltas[values['guide_id']][f"bookings_{values['status']}"] += sign
+
+
+def feedback_changed(before, after):
+    """Move a GuideFeedback's counts from `before` to `after` (either None)"""
+    deltas = defaultdict(Counter)
+    _count_feedback(deltas, before, -1)
+    _count_feedback(deltas, after, 1)
+    _apply(deltas)
+
+
+def booking_saved(booking, created):
+    before, after = previous(booking, created), current(booking)
+    if before != after:
+        deltas = defaultdict(Counter)
+        _count_booking(deltas, before, -1)
+        _count_booking(deltas, after, 1)
+        _apply(deltas)
+    booking._counted = after
+
+
+def booking_deleted(booking):
+    deltas = defaultdict(Counter)
+    _count_booking(deltas, previous(booking, False), -1)
+    _apply(deltas)
+
+
+def booking_counts(bookings):
+    """Counter of (guide_id, status) -> bookings, for bookings that have a guide"""
+    rows = bookings.exclude(guide=None).order_by().values('guide_id', 'status').annotate(count=Count('id'))
+    return Counter({(row['guide_id'], row['status']): row['count'] for row in rows})
+
+
+def count_bookings(removed=(), added=()):
+    """
+    Apply booking changes made without signals: `removed` and `added` map
+    (guide_id, status) to the number of bookings leaving or entering it
+    """
+    deltas = defaultdict(Counter)
+    for sign, counts in ((-1, removed), (1, added)):
+        for (guide_id, status), count in dict(counts).items():
+            _count_booking(deltas, {'guide_id': guide_id, 'status': status}, sign * count)
+    _apply(deltas)
+
+
+def rebuild(guide_ids=None):
+    """Recompute the stats of `guide_ids` (every guide when None); returns the new rows"""
+    guides = Guide.objects.all() if guide_ids is None else Guide.objects.filter(pk__in=list(guide_ids))
+    with transaction.atomic():
+        # Deleting first takes the write lock, so no increment lands between the recount and the insert
+        GuideStats.objects.filter(guide__in=guides).delete()
+        rows = {guide_id: GuideStats(guide_id=guide_id) for guide_id in guides.values_list('pk', flat=True)}
+
+        ratings = {f'{name}_sum': Sum(f'{name}_rating') for name in RATINGS}
+        buckets = {
+            f'rated_{score}': Count('id', filter=Q(total__gte=3 * score - 1, total__lte=3 * score + 1))
+            for score in range(1, 6)
+        }
+        feedback = (
+            GuideFeedback.objects.filter(guide__in=guides)
+            .alias(total=F('knowledge_rating') + F('communication_rating') + F('professionalism_rating'))
+            .order_by().values('guide_id')
+            .annotate(feedback_count=Count('id'), **ratings, **buckets)
+        )
+        for row in feedback:
+            guide_id = row.pop('guide_id')
+            for name, value in row.items():
+                setattr(rows[guide_id], name, value)
+
+        for (guide_id, status), count in booking_counts(Booking.objects.filter(guide__in=guides)).items():
+            if status in STATUSES:
+                setattr(rows[guide_id], f'bookings_{status}', count)
+
+        GuideStats.objects.bulk_create(rows.values(), batch_size=500)
+        _refresh_ratings(list(rows))
+    return list(rows.values())
+
+
+def for_guide(guide):
+    """The guide's stats row, rebuilt if it is missing"""
+    try:
+        return guide.stats
+    except GuideStats.DoesNotExist:
+        return rebuild([guide.pk])[0]
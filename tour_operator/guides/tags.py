@@ -0,0 +1,129 @@
+"""
+Normalized guide languages and specializations.
+
+Guide.languages and Guide.specializations stay the comma-separated text
+that the forms edit and the templates show. Each entry is also a Language
+or Specialization row keyed by its slug and linked to the guide, so
+"speaks French and leads wildlife safaris" is a lookup on the indexed
+link tables rather than an icontains scan over every guide:
+
+    split_tags('English, french; Hindi')  -> {'english': 'English', 'french': 'french', 'hindi': 'Hindi'}
+    with_tags(Guide.objects.all(), languages=['french'], specializations=['wildlife-safari'])
+
+The signals in guides.signals keep the two in step. Saving a guide
+re-links its tags from the text; changing the links directly rewrites
+the text.
+"""
+import re
+
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.text import slugify
+
+from tour_operator import catalog_cache
+
+from .models import Guide, Language, Specialization
+
+SEPARATORS = re.compile(r'[,;/|\n]+')
+
+# text field -> (tag model, many-to-many field, link table column)
+FIELDS = {
+    'languages': (Language, 'language_tags', 'language'),
+    'specializations': (Specialization, 'specialization_tags', 'specialization'),
+}
+
+
+def split_tags(text, max_length=None):
+    """
+    {slug: name} of the entries of a comma-separated list, in order, each
+    cut to `max_length` characters when given
+    """
+    tags = {}
+    for entry in SEPARATORS.split(text or ''):
+        name = ' '.join(entry.split())[:max_length].rstrip()
+        slug = slugify(name)[:max_length].strip('-')
+        if slug and slug not in tags:
+            tags[slug] = name
+    return tags
+
+
+def _max_length(model):
+    """The longest name and slug a tag model stores"""
+    return min(model._meta.get_field('name').max_length, model._meta.get_field('slug').max_length)
+
+
+def sync_tags(guide, fields=FIELDS):
+    """Link `guide` to a tag for every entry of its text fields, creating missing tags"""
+    for field in fields:
+        model, relation, column = FIELDS[field]
+        wanted = split_tags(getattr(guide, field), _max_length(model))
+        found = {tag.slug: tag for tag in model.objects.filter(slug__in=wanted)}
+        missing = [model(slug=slug, name=name) for slug, name in wanted.items() if slug not in found]
+        if missing:
+            model.objects.bulk_create(missing, ignore_conflicts=True)
+            found = {tag.slug: tag for tag in model.objects.filter(slug__in=wanted)}
+        getattr(guide, relation).set(found.values())
+
+
+def tag_text(current, tags, max_length=None):
+    """
+    `current` rewritten to list exactly `tags` ({slug: name}): entries still
+    linked keep their place and spelling, new ones go at the end
+    """
+    kept = {slug: name for slug, name in split_tags(current, max_length).items() if slug in tags}
+    kept.update((slug, name) for slug, name in tags.items() if slug not in kept)
+    return ', '.join(kept.values())
+
+
+def refresh_text(field, guide_ids):
+    """
+    Rewrite `field` ('languages' or 'specializations') of the given guides
+    where it no longer lists their linked tags; returns {guide_id: text}
+    for the guides changed
+    """
+    model, relation, column = FIELDS[field]
+    linked = {guide_id: {} for guide_id in guide_ids}
+    links = getattr(Guide, relation).through.objects.filter(guide_id__in=list(linked))
+    for guide_id, slug, name in links.values_list('guide_id', f'{column}__slug', f'{column}__name'):
+        linked[guide_id][slug] = name
+
+    changed = {}
+    for guide_id, text in Guide.objects.filter(pk__in=list(linked)).values_list('pk', field):
+        if set(split_tags(text, _max_length(model))) != set(linked[guide_id]):
+            changed[guide_id] = tag_text(text, linked[guide_id], _max_length(model))
+            # update() skips the post_save handler, which would re-link from the text
+            Guide.objects.filter(pk=guide_id).update(**{field: changed[guide_id]}, updated_at=timezone.now())
+            catalog_cache.bump('guides', f'guide:{guide_id}')
+    return changed
+
+
+def _having_all(queryset, relation, column, values):
+    slugs = {slugify(value) for value in values} - {''}
+    if not slugs:
+        return queryset
+    links = getattr(Guide, relation).through.objects
+    matching = (
+        links.filter(**{f'{column}__slug__in': slugs})
+        .values('guide_id')
+        .annotate(found=Count(column))
+        .filter(found=len(slugs))
+        .values('guide_id')
+    )
+    return queryset.filter(pk__in=matching)
+
+
+def with_tags(queryset, languages=(), specializations=()):
+    """Guides of `queryset` tagged with every one of the given language and specialization slugs"""
+    queryset = _having_all(queryset, 'language_tags', 'language', languages)
+    return _having_all(queryset, 'specialization_tags', 'specialization', specializations)
+
+
+def tag_params(params):
+    """
+    (languages, specializations) slugs from repeated or comma-separated
+    ?language= and ?specialization= parameters
+    """
+    def values(name):
+        slugs = (slugify(value) for raw in params.getlist(name) for value in raw.split(','))
+        return list(dict.fromkeys(slug for slug in slugs if slug))
+    return values('language'), values('specialization')
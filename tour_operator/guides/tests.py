@@ -1,3 +1,318 @@
-from django.test import TestCase
+import random
+import re
+from datetime import date, timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from bookings.models import Booking, Customer
+from feedback.models import GuideFeedback
+from tours.models import TourDate, TourPackage
+from . import calendar, stats
+from .assignment import apply_plan, plan_assignments, posted_plan
+from .calendar import WEEKENDS, DayBitmap, set_availability, unavailable_days
+from .conflicts import ConflictIndex, GuideBookings, feasible_guides
+from .models import Guide, GuideAvailability, GuideStats, Language, Specialization
+from .tags import split_tags, with_tags
+
+
+def create_guide(username, languages='English', specializations='Hiking', **fields):
+    user = User.objects.create_user(username, first_name=username.title(), last_name='Guide')
+    return Guide.objects.create(
+        user=user, phone='0', experience_years=5, languages=languages, specializations=specializations, bio='',
+        **fields
+    )
+
+
+def create_booking(start, days=2, status='confirmed', guide=None, special_requests=''):
+    package = TourPackage.objects.create(
+        name='Hiking tour', description='', duration=days, price=100, max_participants=10, difficulty='easy',
+        location='Hills', included_services='', excluded_services='', itinerary='',
+    )
+    tour_date = TourDate.objects.create(
+        tour_package=package, start_date=start, end_date=start + timedelta(days=days - 1), available_spots=10,
+    )
+    user = User.objects.create_user(f'customer-{package.pk}')
+    return Booking.objects.create(
+        customer=Customer.objects.create(user=user), tour_date=tour_date, participants=1, total_price=100,
+        status=status, guide=guide, special_requests=special_requests,
+    )
+
+
+class DayBitmapTests(SimpleTestCase):
+    def test_ranges(self):
+        bitmap = DayBitmap.from_dates([date(2025, 3, 2), date(2025, 3, 5), date(2025, 4, 1)])
+        self.assertIn(date(2025, 3, 5), bitmap)
+        self.assertNotIn(date(2025, 3, 4), bitmap)
+        self.assertTrue(bitmap.any_in(date(2025, 3, 3), date(2025, 3, 5)))
+        self.assertFalse(bitmap.any_in(date(2025, 3, 6), date(2025, 3, 31)))
+        self.assertFalse(bitmap.any_in(date(2025, 1, 1), date(2025, 3, 1)))
+        self.assertEqual(bitmap.days_in(date(2025, 3, 1), date(2025, 3, 31)), [date(2025, 3, 2), date(2025, 3, 5)])
+
+    def test_empty(self):
+        bitmap = DayBitmap.from_dates([])
+        self.assertFalse(bitmap)
+        self.assertFalse(bitmap.any_in(date(2025, 1, 1), date(2026, 1, 1)))
+        self.assertEqual(bitmap.days_in(date(2025, 1, 1), date(2025, 1, 31)), [])
+
+
+class CalendarTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.guide = create_guide('anna')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_rule_marks_weekends(self):
+        # 2025-03-01 is a Saturday
+        with self.captureOnCommitCallbacks(execute=True):
+            days = set_availability(self.guide.pk, date(2025, 3, 1), date(2025, 3, 14), False, weekdays=WEEKENDS)
+        self.assertEqual(days, [date(2025, 3, 1), date(2025, 3, 2), date(2025, 3, 8), date(2025, 3, 9)])
+        bitmap = unavailable_days([self.guide.pk])[self.guide.pk]
+        self.assertEqual(bitmap.days_in(date(2025, 3, 1), date(2025, 3, 31)), days)
+        self.assertFalse(bitmap.any_in(date(2025, 3, 3), date(2025, 3, 7)))
+
+    def test_saving_a_day_rebuilds_the_cached_bitmap(self):
+        self.assertFalse(unavailable_days([self.guide.pk])[self.guide.pk])
+        with self.captureOnCommitCallbacks(execute=True):
+            GuideAvailability.objects.create(guide=self.guide, date=date(2025, 5, 1), is_available=False)
+        self.assertIn(date(2025, 5, 1), unavailable_days([self.guide.pk])[self.guide.pk])
+
+    def test_fresh_reads_the_table_past_a_stale_cache(self):
+        calendar.rebuild(self.guide.pk)
+        # Another process marked the day off; this cache has not heard of it
+        GuideAvailability.objects.bulk_create([GuideAvailability(guide=self.guide, date=date(2025, 5, 1), is_available=False)])
+        self.assertNotIn(date(2025, 5, 1), unavailable_days([self.guide.pk])[self.guide.pk])
+        self.assertIn(date(2025, 5, 1), unavailable_days([self.guide.pk], fresh=True)[self.guide.pk])
+        # ...and the cache now has it too
+        self.assertIn(date(2025, 5, 1), unavailable_days([self.guide.pk])[self.guide.pk])
+
+    def test_apply_plan_checks_days_off_against_the_table(self):
+        start = date.today() + timedelta(days=20)
+        booking = create_booking(start)
+        plan = plan_assignments(start, start)
+        self.assertEqual([assignment.guide for assignment in plan.assignments], [self.guide])
+        # Marked off after the plan was made, behind the cache's back
+        GuideAvailability.objects.bulk_create([GuideAvailability(guide=self.guide, date=start, is_available=False)])
+        saved, [(assignment, reason)] = apply_plan(plan)
+        self.assertEqual((saved, assignment.booking), (0, booking))
+        self.assertIn('off', reason)
+        self.assertIsNone(Booking.objects.get(pk=booking.pk).guide_id)
+
+
+class GuideBookingsTests(SimpleTestCase):
+    def test_long_booking_behind_a_short_one(self):
+        bookings = GuideBookings([(1, 10, 1), (3, 4, 2)])
+        # Only the running maximum end shows that the first booking covers day 6
+        self.assertTrue(bookings.overlaps(6, 7))
+        self.assertEqual(bookings.overlapping(6, 7), [(1, 10, 1)])
+        self.assertFalse(bookings.overlaps(11, 12))
+        bookings.add(0, 12, 3)
+        self.assertEqual(bookings.overlapping(11, 12), [(0, 12, 3)])
+
+    def test_matches_a_scan_of_every_range(self):
+        rng = random.Random(7)
+        ranges = []
+        bookings = GuideBookings([])
+        for booking_id in range(200):
+            start = rng.randint(0, 365)
+            ranges.append((start, start + rng.randint(0, 20), booking_id))
+            bookings.add(*ranges[-1])
+            first = rng.randint(0, 380)
+            last = first + rng.randint(0, 10)
+            expected = sorted(item for item in ranges if item[0] <= last and item[1] >= first)
+            self.assertEqual(bookings.overlapping(first, last), expected)
+            self.assertEqual(bookings.overlaps(first, last), bool(expected))
+
+
+class ConflictIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = create_guide('anna')
+        cls.ben = create_guide('ben')
+        cls.start = date.today() + timedelta(days=20)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_only_active_bookings_conflict(self):
+        booking = create_booking(self.start, days=3, guide=self.anna)
+        create_booking(self.start, guide=self.ben, status='cancelled')
+        index = ConflictIndex.build()
+        self.assertTrue(index.conflicts(self.anna.pk, self.start + timedelta(days=2), self.start + timedelta(days=5)))
+        self.assertFalse(index.conflicts(self.anna.pk, self.start + timedelta(days=3), self.start + timedelta(days=5)))
+        self.assertFalse(index.conflicts(self.ben.pk, self.start, self.start))
+        self.assertFalse(ConflictIndex.build(exclude_booking_ids=[booking.pk]).conflicts(self.anna.pk, self.start, self.start))
+
+    def test_feasible_guides(self):
+        booking = create_booking(self.start, guide=self.anna)
+        other = create_booking(self.start + timedelta(days=1))
+        self.assertEqual(feasible_guides(other.tour_date), [self.ben])
+        # The booking being reassigned does not block its own guide
+        self.assertEqual(feasible_guides(booking.tour_date, exclude_booking_ids=[booking.pk]), [self.anna, self.ben])
+        GuideAvailability.objects.bulk_create([GuideAvailability(guide=self.ben, date=self.start + timedelta(days=1), is_available=False)])
+        self.assertEqual(feasible_guides(other.tour_date, fresh=True), [])
+
+class AssignmentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = create_guide('anna', languages='English', specializations='Hiking')
+        cls.ben = create_guide('ben', languages='English, Hindi', specializations='Cooking')
+        cls.start = date.today() + timedelta(days=20)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_plan_respects_languages_and_overlaps(self):
+        hindi = create_booking(self.start, special_requests='A Hindi speaking guide please')
+        hiking = create_booking(self.start)
+        clash = create_booking(self.start + timedelta(days=1))
+        plan = plan_assignments(self.start, self.start + timedelta(days=1))
+        chosen = {assignment.booking: assignment.guide for assignment in plan.assignments}
+        # Only Ben speaks Hindi, which leaves Anna for the hiking tour
+        self.assertEqual(chosen, {hindi: self.ben, hiking: self.anna})
+        self.assertEqual([booking for booking, reason in plan.unassigned], [clash])
+        # Planning writes nothing
+        self.assertFalse(Booking.objects.exclude(guide=None).exists())
+
+    def test_apply_rejects_assignments_that_went_stale(self):
+        first, second = create_booking(self.start), create_booking(self.start + timedelta(days=10))
+        plan = posted_plan(self.start, self.start, [(first.pk, self.anna.pk), (second.pk, self.anna.pk)])
+        Booking.objects.filter(pk=first.pk).update(status='cancelled')
+        saved, rejected = apply_plan(plan)
+        self.assertEqual(saved, 1)
+        self.assertEqual([(assignment.booking, reason) for assignment, reason in rejected], [
+            (first, 'The booking was assigned or changed since the preview'),
+        ])
+        self.assertEqual(Booking.objects.get(pk=second.pk).guide, self.anna)
+        self.assertEqual(GuideStats.objects.get(guide=self.anna).bookings_confirmed, 1)
+
+    def test_admin_commits_the_previewed_plan(self):
+        first, second = create_booking(self.start), create_booking(self.start + timedelta(days=10))
+        self.client.force_login(User.objects.create_user('admin'))
+        path = '/tour-admin/bookings/auto-assign/'
+        window = {'date_from': self.start.isoformat(), 'date_to': (self.start + timedelta(days=10)).isoformat()}
+        preview = self.client.get(path, window)
+        posted = re.findall(r'name="assignment" value="([\d:]+)"', preview.content.decode())
+        planned = {assignment.booking: assignment.guide for assignment in preview.context['plan'].assignments}
+        self.assertEqual(len(posted), 2)
+        # The guide planned for the first booking takes an overlapping tour meanwhile
+        create_booking(self.start, guide=planned[first])
+
+        response = self.client.post(path, {**window, 'assignment': posted}, follow=True)
+        self.assertEqual(Booking.objects.get(pk=second.pk).guide, planned[second])
+        # ...so that booking is reported, not quietly given the other guide
+        self.assertIsNone(Booking.objects.get(pk=first.pk).guide)
+        self.assertIn(
+            f'Booking #{first.pk} was not given {planned[first]}: the guide has an overlapping booking.',
+            [str(message) for message in response.context['messages']],
+        )
+
+
+class TagTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = create_guide('anna', languages='English, French', specializations='Wildlife safari; Hiking')
+        cls.ben = create_guide('ben', languages='english / Hindi', specializations='Hiking')
+
+    def test_split_tags(self):
+        self.assertEqual(
+            split_tags(' English, french;  Hindi , english'),
+            {'english': 'English', 'french': 'french', 'hindi': 'Hindi'},
+        )
+
+    def test_long_entries_fit_their_columns(self):
+        tags = split_tags('x' * 150 + ' trail', max_length=100)
+        [(slug, name)] = tags.items()
+        self.assertEqual((len(slug), len(name)), (100, 100))
+        guide = create_guide('cara', languages='A' * 199, specializations='b ' * 149)
+        self.assertEqual((guide.language_tags.count(), guide.specialization_tags.count()), (1, 1))
+        for tag in [*guide.language_tags.all(), *guide.specialization_tags.all()]:
+            limit = type(tag)._meta.get_field('slug').max_length
+            self.assertLessEqual(len(tag.slug), limit)
+            self.assertLessEqual(len(tag.name), limit)
+
+    def test_saving_a_guide_links_its_tags(self):
+        self.assertEqual(set(Language.objects.values_list('slug', flat=True)), {'english', 'french', 'hindi'})
+        self.assertEqual(set(self.ben.language_tags.values_list('slug', flat=True)), {'english', 'hindi'})
+        self.ben.languages = 'Hindi'
+        self.ben.save()
+        self.assertEqual(list(self.ben.language_tags.values_list('slug', flat=True)), ['hindi'])
+
+    def test_changing_links_rewrites_the_text(self):
+        self.anna.specialization_tags.remove(Specialization.objects.get(slug='hiking'))
+        self.assertEqual(Guide.objects.get(pk=self.anna.pk).specializations, 'Wildlife safari')
+
+    def test_filter_needs_every_tag(self):
+        guides = Guide.objects.order_by('pk')
+        self.assertEqual(list(with_tags(guides, languages=['english'])), [self.anna, self.ben])
+        self.assertEqual(list(with_tags(guides, languages=['english', 'french'])), [self.anna])
+        self.assertEqual(list(with_tags(guides, languages=['English'], specializations=['hiking'])), [self.anna, self.ben])
+        self.assertEqual(list(with_tags(guides, specializations=['wildlife-safari', 'diving'])), [])
+
+
+class GuideStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = create_guide('anna')
+        cls.ben = create_guide('ben')
+
+    def stats(self, guide):
+        return GuideStats.objects.get(guide=guide)
+
+    def feedback(self, booking, *ratings):
+        knowledge, communication, professionalism = ratings
+        return GuideFeedback.objects.create(
+            guide=booking.guide, booking=booking, knowledge_rating=knowledge, communication_rating=communication,
+            professionalism_rating=professionalism, comments='',
+        )
+
+    def test_bookings_move_between_guides_and_statuses(self):
+        booking = create_booking(date.today() + timedelta(days=10), status='pending', guide=self.anna)
+        self.assertEqual(self.stats(self.anna).bookings_pending, 1)
+        # A row loaded with only some fields still counts what it was loaded as
+        booking = Booking.objects.only('id', 'guide', 'status').get(pk=booking.pk)
+        booking.guide, booking.status = self.ben, 'confirmed'
+        booking.save()
+        self.assertEqual(self.stats(self.anna).total_bookings, 0)
+        self.assertEqual(self.stats(self.ben).bookings_confirmed, 1)
+        # Saving again without changes counts nothing twice
+        booking.save()
+        self.assertEqual(self.stats(self.ben).total_bookings, 1)
+        booking.delete()
+        self.assertEqual(self.stats(self.ben).total_bookings, 0)
+
+    def test_feedback_sums_and_rating(self):
+        booking = create_booking(date.today() - timedelta(days=10), status='completed', guide=self.anna)
+        feedback = self.feedback(booking, 5, 4, 3)
+        self.feedback(booking, 3, 3, 3)
+        stats_row = self.stats(self.anna)
+        self.assertEqual((stats_row.feedback_count, stats_row.knowledge_sum, stats_row.rated_4, stats_row.rated_3), (2, 8, 1, 1))
+        self.assertEqual(Guide.objects.get(pk=self.anna.pk).rating, Decimal('3.50'))
+
+        feedback = GuideFeedback.objects.get(pk=feedback.pk)
+        feedback.knowledge_rating = 1
+        feedback.save()
+        stats_row = self.stats(self.anna)
+        self.assertEqual((stats_row.knowledge_sum, stats_row.rated_4, stats_row.rated_3), (4, 0, 2))
+
+        feedback.delete()
+        self.assertEqual(self.stats(self.anna).feedback_count, 1)
+        self.assertEqual(Guide.objects.get(pk=self.anna.pk).rating, Decimal('3.00'))
+
+    def test_rebuild_matches_the_running_totals(self):
+        booking = create_booking(date.today() - timedelta(days=10), status='completed', guide=self.anna)
+        self.feedback(booking, 5, 5, 4)
+        create_booking(date.today() + timedelta(days=10), guide=self.anna)
+        fields = [field.name for field in GuideStats._meta.fields if field.name != 'guide']
+        running = GuideStats.objects.filter(guide=self.anna).values(*fields).get()
+        # Writes that skip the signals leave the totals behind until a rebuild
+        Booking.objects.filter(guide=self.anna).update(status='cancelled')
+        stats.rebuild([self.anna.pk])
+        rebuilt = GuideStats.objects.filter(guide=self.anna).values(*fields).get()
+        self.assertEqual(rebuilt['bookings_cancelled'], 2)
+        running.update(bookings_completed=0, bookings_confirmed=0, bookings_cancelled=2)
+        self.assertEqual(rebuilt, running)
@@ -1,57 +1,70 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.http import JsonResponse
 from django.contrib.auth import authenticate, login, logout
-from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.decorators.csrf import csrf_protect
-from .models import Guide, GuideAvailability
+from .models import Guide, Language, Specialization
+from . import calendar
+from . import stats as guide_stats
+from .tags import tag_params, with_tags
+from .conflicts import ConflictIndex
 from bookings.models import Booking
-from feedback.models import GuideFeedback
+from feedback import rollups as feedback_rollups
+from feedback.models import GuideFeedback, GuideFeedbackRollup
 from tours.models import TourDate, TourPackage
 from datetime import date, timedelta
-from django.db.models import Avg, Count, Q
+from django.utils import timezone
+from django.db.models import Count, Q
+from tour_operator.pagination import paginate
+from tour_operator.roles import guide_required
+from tour_operator.catalog_cache import cache_public_page, catalog_version
 
+@cache_public_page('guides')
 def guide_list(request):
-    """Display all available guides"""
-    guides = Guide.objects.filter(is_available=True).order_by('-rating')
-    return render(request, 'guides/guide_list.html', {'guides': guides})
+    """Display all available guides, optionally only those with every chosen language and specialization"""
+    languages, specializations = tag_params(request.GET)
+    guides = with_tags(
+        Guide.objects.filter(is_available=True).select_related('user').order_by('-rating'),
+        languages, specializations
+    )
+    return render(request, 'guides/guide_list.html', {
+        'guides': guides,
+        # Only read when the fragment cache misses
+        'languages': Language.objects.filter(guides__is_available=True).distinct(),
+        'specializations': Specialization.objects.filter(guides__is_available=True).distinct(),
+        'selected_languages': languages,
+        'selected_specializations': specializations,
+        'filter_key': request.GET.urlencode(),
+        'cache_version': catalog_version('guides'),
+    })
 
+@cache_public_page('guide:{guide_id}')
 def guide_profile(request, guide_id):
     """Display detailed guide profile"""
-    guide = get_object_or_404(Guide, id=guide_id, is_available=True)
+    guide = get_object_or_404(Guide.objects.select_related('stats'), id=guide_id, is_available=True)
 
     # Get recent feedback
-    recent_feedback = GuideFeedback.objects.filter(guide=guide).order_by('-created_at')[:5]
+    recent_feedback = GuideFeedback.objects.filter(guide=guide).select_related(
+        'booking__tour_date__tour_package'
+    ).order_by('-created_at')[:5]
 
     # Get recent tours/bookings
     recent_bookings = Booking.objects.filter(
         guide=guide,
         status__in=['completed', 'confirmed']
-    ).order_by('-booking_date')[:5]
+    ).select_related('tour_date__tour_package').order_by('-booking_date')[:5]
 
-    # Calculate average ratings from feedback
-    feedback_count = recent_feedback.count()
-    avg_knowledge = 0
-    avg_communication = 0
-    avg_professionalism = 0
-
-    if feedback_count > 0:
-        knowledge_total = sum([f.knowledge_rating for f in recent_feedback])
-        communication_total = sum([f.communication_rating for f in recent_feedback])
-        professionalism_total = sum([f.professionalism_rating for f in recent_feedback])
-
-        avg_knowledge = round(knowledge_total / feedback_count, 1)
-        avg_communication = round(communication_total / feedback_count, 1)
-        avg_professionalism = round(professionalism_total / feedback_count, 1)
+    # Average ratings over all feedback, kept up to date in GuideStats
+    summary = guide_stats.for_guide(guide)
 
     context = {
         'guide': guide,
         'recent_feedback': recent_feedback,
         'recent_bookings': recent_bookings,
-        'feedback_count': feedback_count,
-        'avg_knowledge': avg_knowledge,
-        'avg_communication': avg_communication,
-        'avg_professionalism': avg_professionalism,
+        'feedback_count': summary.feedback_count,
+        'avg_knowledge': summary.avg_knowledge or 0,
+        'avg_communication': summary.avg_communication or 0,
+        'avg_professionalism': summary.avg_professionalism or 0,
     }
 
     return render(request, 'guides/guide_profile.html', context)
@@ -59,7 +72,7 @@ def guide_profile(request, guide_id):
 def guide_availability_check(request, guide_id):
     """Check guide availability for specific dates via AJAX"""
     if request.method == 'GET':
-        guide = get_object_or_404(Guide, id=guide_id)
+        guide = get_object_or_404(Guide.objects.select_related('user'), id=guide_id)
         start_date = request.GET.get('start_date')
         end_date = request.GET.get('end_date')
 
@@ -68,25 +81,10 @@ def guide_availability_check(request, guide_id):
                 start_date = date.fromisoformat(start_date)
                 end_date = date.fromisoformat(end_date)
 
-                # Check if guide is available for all dates in range
-                is_available = True
-                unavailable_dates = []
-
-                current_date = start_date
-                while current_date <= end_date:
-                    try:
-                        availability = GuideAvailability.objects.get(
-                            guide=guide,
-                            date=current_date
-                        )
-                        if not availability.is_available:
-                            is_available = False
-                            unavailable_dates.append(current_date.isoformat())
-                    except GuideAvailability.DoesNotExist:
-                        # If no record exists, assume available
-                        pass
-
-                    current_date += timedelta(days=1)
+                # One bitmap lookup covers the whole range
+                unavailable = calendar.unavailable_days([guide.id])[guide.id]
+                unavailable_dates = [day.isoformat() for day in unavailable.days_in(start_date, end_date)]
+                is_available = not unavailable_dates
 
                 return JsonResponse({
                     'available': is_available,
@@ -127,54 +125,40 @@ def guide_login(request):
     }
     return render(request, 'guides/guide_login.html', context)
 
-def is_guide(user):
-    """Check if user is a guide"""
-    if not user.is_authenticated:
-        return False
-    try:
-        Guide.objects.get(user=user)
-        return True
-    except Guide.DoesNotExist:
-        return False
-
-@login_required
+@guide_required
 def guide_dashboard(request):
     """Guide dashboard showing overview of tours, bookings, and feedback"""
-    if not is_guide(request.user):
-        messages.error(request, 'Access denied. Guide privileges required.')
-        return redirect('guide_login')
-
-    guide = Guide.objects.get(user=request.user)
+    guide = request.guide
 
-    # Get statistics
-    total_bookings = Booking.objects.filter(guide=guide).count()
+    # Get statistics; totals come precomputed from GuideStats, "upcoming" depends on today
+    summary = guide_stats.for_guide(guide)
+    total_bookings = summary.total_bookings
     upcoming_bookings = Booking.objects.filter(
         guide=guide,
         tour_date__start_date__gte=date.today(),
         status__in=['confirmed', 'pending']
     ).count()
-    completed_tours = Booking.objects.filter(
-        guide=guide,
-        status='completed'
-    ).count()
+    completed_tours = summary.bookings_completed
 
     # Get feedback stats
-    feedback_stats = GuideFeedback.objects.filter(guide=guide).aggregate(
-        avg_knowledge=Avg('knowledge_rating'),
-        avg_communication=Avg('communication_rating'),
-        avg_professionalism=Avg('professionalism_rating'),
-        total_feedback=Count('id')
-    )
+    feedback_stats = {
+        'avg_knowledge': summary.avg_knowledge,
+        'avg_communication': summary.avg_communication,
+        'avg_professionalism': summary.avg_professionalism,
+        'total_feedback': summary.feedback_count,
+    }
 
     # Get recent bookings
-    recent_bookings = Booking.objects.filter(guide=guide).order_by('-booking_date')[:5]
+    recent_bookings = Booking.objects.filter(guide=guide).select_related(
+        'tour_date__tour_package'
+    ).order_by('-booking_date')[:5]
 
     # Get upcoming tours
     upcoming_tours = Booking.objects.filter(
         guide=guide,
         tour_date__start_date__gte=date.today(),
         status__in=['confirmed', 'pending']
-    ).order_by('tour_date__start_date')[:5]
+    ).select_related('tour_date__tour_package').order_by('tour_date__start_date')[:5]
 
     context = {
         'guide': guide,
@@ -188,20 +172,19 @@ def guide_dashboard(request):
 
     return render(request, 'guides/guide_dashboard.html', context)
 
-@login_required
+@guide_required
 def guide_bookings(request):
     """View all guide's bookings with filtering options"""
-    if not is_guide(request.user):
-        messages.error(request, 'Access denied.')
-        return redirect('guide_login')
-
-    guide = Guide.objects.get(user=request.user)
+    guide = request.guide
 
     # Get filter parameters
     status_filter = request.GET.get('status')
     date_filter = request.GET.get('date')
 
-    bookings = Booking.objects.filter(guide=guide).order_by('-tour_date__start_date')
+    bookings = Booking.objects.filter(guide=guide).select_related(
+        'customer__user',
+        'tour_date__tour_package'
+    )
 
     if status_filter:
         bookings = bookings.filter(status=status_filter)
@@ -211,6 +194,8 @@ def guide_bookings(request):
     elif date_filter == 'past':
         bookings = bookings.filter(tour_date__end_date__lt=date.today())
 
+    bookings = paginate(request, bookings, ['-tour_date__start_date', '-id'])
+
     context = {
         'guide': guide,
         'bookings': bookings,
@@ -220,73 +205,54 @@ def guide_bookings(request):
 
     return render(request, 'guides/guide_bookings.html', context)
 
-@login_required
+@guide_required
 @csrf_protect
 def guide_schedule(request):
     """Guide availability management"""
-    if not is_guide(request.user):
-        messages.error(request, 'Access denied.')
-        return redirect('guide_login')
-
-    guide = Guide.objects.get(user=request.user)
+    guide = request.guide
 
     if request.method == 'POST':
-        availability_date = request.POST.get('date')
         is_available = request.POST.get('is_available') == 'on'
+        try:
+            start, end, weekdays = calendar.parse_rule(request.POST)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return redirect('guide_schedule')
 
-        availability, created = GuideAvailability.objects.get_or_create(
-            guide=guide,
-            date=availability_date,
-            defaults={'is_available': is_available}
-        )
-
-        if not created:
-            availability.is_available = is_available
-            availability.save()
+        days = calendar.set_availability(guide.id, start, end, is_available, weekdays)
 
         action = "set as available" if is_available else "set as unavailable"
-        messages.success(request, f'Date {availability_date} {action}.')
+        if start == end:
+            messages.success(request, f'Date {start} {action}.')
+        else:
+            messages.success(request, f'{len(days)} days from {start} to {end} {action}.')
         return redirect('guide_schedule')
 
-    # Get availability for next 60 days
+    # Get availability for next 60 days; days without a record are available
     availability_dates = []
     today = date.today()
+    last_day = today + timedelta(days=59)
+    unavailable = calendar.unavailable_days([guide.id])[guide.id]
+    booked = ConflictIndex.build([guide.id], since=today).booked_days(guide.id, today, last_day)
     for i in range(60):
         check_date = today + timedelta(days=i)
-        try:
-            availability = GuideAvailability.objects.get(guide=guide, date=check_date)
-            is_available = availability.is_available
-        except GuideAvailability.DoesNotExist:
-            is_available = True  # Default to available
-
-        # Check if there are bookings on this date
-        has_booking = Booking.objects.filter(
-            guide=guide,
-            tour_date__start_date__lte=check_date,
-            tour_date__end_date__gte=check_date,
-            status__in=['confirmed', 'pending']
-        ).exists()
-
         availability_dates.append({
             'date': check_date,
-            'is_available': is_available,
-            'has_booking': has_booking
+            'is_available': check_date not in unavailable,
+            'has_booking': check_date in booked
         })
 
     return render(request, 'guides/guide_schedule.html', {
         'guide': guide,
         'availability_dates': availability_dates,
-        'today': today
+        'today': today,
+        'weekday_choices': calendar.WEEKDAY_CHOICES,
     })
 
-@login_required
+@guide_required
 def guide_feedback(request):
     """View feedback received from customers"""
-    if not is_guide(request.user):
-        messages.error(request, 'Access denied.')
-        return redirect('guide_login')
-
-    guide = Guide.objects.get(user=request.user)
+    guide = request.guide
 
     feedback_list = GuideFeedback.objects.filter(guide=guide).order_by('-created_at').select_related(
         'booking__customer__user',
@@ -294,51 +260,46 @@ def guide_feedback(request):
     )
 
     # Calculate statistics
-    stats = GuideFeedback.objects.filter(guide=guide).aggregate(
-        avg_knowledge=Avg('knowledge_rating'),
-        avg_communication=Avg('communication_rating'),
-        avg_professionalism=Avg('professionalism_rating'),
-        total_count=Count('id')
-    )
+    summary = guide_stats.for_guide(guide)
+    stats = {
+        'avg_knowledge': summary.avg_knowledge,
+        'avg_communication': summary.avg_communication,
+        'avg_professionalism': summary.avg_professionalism,
+        'total_count': summary.feedback_count,
+    }
+    recent_feedback = GuideFeedback.objects.filter(
+        guide=guide, created_at__gte=timezone.now() - timedelta(days=30)
+    ).count()
 
-    # Get monthly feedback trends (last 6 months)
+    # Monthly feedback trend over the last 6 calendar months, from the rollups
+    months = feedback_rollups.months(6)
     monthly_stats = []
-    for i in range(6):
-        month_date = date.today().replace(day=1) - timedelta(days=30 * i)
-        month_feedback = GuideFeedback.objects.filter(
-            guide=guide,
-            created_at__year=month_date.year,
-            created_at__month=month_date.month
-        )
-
-        month_avg = month_feedback.aggregate(
-            avg_overall=Avg('knowledge_rating')  # Can be expanded to include all ratings
-        )['avg_overall'] or 0
-
+    for row in feedback_rollups.trend(GuideFeedbackRollup, 'month', months[0], months[-1], guide=guide):
+        total = row['knowledge_sum'] + row['communication_sum'] + row['professionalism_sum']
         monthly_stats.append({
-            'month': month_date.strftime('%B %Y'),
-            'count': month_feedback.count(),
-            'avg_rating': round(month_avg, 1)
+            'month': row['bucket'].strftime('%B %Y'),
+            'count': row['feedback_count'],
+            'avg_rating': round(total / (3 * row['feedback_count']), 1) if row['feedback_count'] else 0,
         })
 
     context = {
         'guide': guide,
         'feedback_list': feedback_list,
         'stats': stats,
-        'monthly_stats': monthly_stats[::-1],  # Reverse to show oldest to newest
+        'total_feedback': summary.feedback_count,
+        'recent_feedback': recent_feedback,
+        'positive_feedback': summary.positive_feedback,
+        'rating_counts': summary.rating_counts,
+        'monthly_stats': monthly_stats,
     }
 
     return render(request, 'guides/guide_feedback.html', context)
 
-@login_required
+@guide_required
 @csrf_protect
 def guide_profile_edit(request):
     """Edit guide profile information"""
-    if not is_guide(request.user):
-        messages.error(request, 'Access denied.')
-        return redirect('guide_login')
-
-    guide = Guide.objects.get(user=request.user)
+    guide = request.guide
 
     if request.method == 'POST':
         # Update user information
@@ -22,6 +22,7 @@ django.setup()
 
 from django.contrib.auth.models import User
 from tours.models import TourPackage, TourDate, TourImage
+from guides import calendar as guide_calendar
 from guides.models import Guide, GuideAvailability
 from bookings.models import Customer, Booking, CustomTourRequest
 from feedback.models import TourFeedback, GuideFeedback
@@ -132,18 +133,11 @@ def create_users():
         is_available=True
     )
 
-    # Set guide availability for next 60 days
+    # Set guide availability for next 60 days: weekdays available, weekends off
     today = date.today()
-    for i in range(60):
-        availability_date = today + timedelta(days=i)
-        # Make guide unavailable on some random days (weekends)
-        is_available = availability_date.weekday() < 5  # Monday=0, Sunday=6
-
-        GuideAvailability.objects.create(
-            guide=guide,
-            date=availability_date,
-            is_available=is_available
-        )
+    last_day = today + timedelta(days=59)
+    guide_calendar.set_availability(guide.id, today, last_day, True, weekdays=guide_calendar.WEEKDAYS)
+    guide_calendar.set_availability(guide.id, today, last_day, False, weekdays=guide_calendar.WEEKENDS)
 
     print(f"✅ Created customer: {customer_user.username} (password: customer123)")
     print(f"✅ Created guide: {guide_user.username} (password: guide123)")
@@ -0,0 +1,9 @@
+from django.contrib import admin
+from .models import OutboxMessage
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'recipient', 'status', 'attempts', 'next_attempt_at', 'created_at', 'sent_at']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['recipient', 'subject']
+    readonly_fields = ['claim', 'claimed_until', 'attempts', 'last_error', 'created_at', 'sent_at']
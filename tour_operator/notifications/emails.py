@@ -0,0 +1,43 @@
+"""
+The emails the site sends, queued through notifications.outbox.
+
+Each function renders its message straight away, so the worker sends what
+was true when the change was made, and must be called inside the
+transaction that makes the change.
+"""
+from django.template.loader import render_to_string
+
+from .outbox import enqueue
+
+
+def _queue(kind, recipient, subject, context):
+    return enqueue(kind, recipient, subject, render_to_string(f'notifications/{kind}.txt', context).strip())
+
+
+def booking_created(booking):
+    user = booking.customer.user
+    return _queue('booking_created', user.email, f'Booking #{booking.pk} received', {
+        'booking': booking, 'user': user,
+    })
+
+
+def booking_updated(booking):
+    user = booking.customer.user
+    return _queue('booking_updated', user.email, f'Booking #{booking.pk} is now {booking.get_status_display().lower()}', {
+        'booking': booking, 'user': user,
+    })
+
+
+def feedback_received(tour_feedback, guide_feedback=None):
+    """Thank the customer and, when they reviewed their guide, tell the guide"""
+    booking = tour_feedback.booking
+    user = booking.customer.user
+    queued = [_queue('feedback_received', user.email, 'Thank you for your feedback', {
+        'booking': booking, 'user': user, 'feedback': tour_feedback,
+    })]
+    if guide_feedback is not None:
+        guide_user = guide_feedback.guide.user
+        queued.append(_queue('guide_review_received', guide_user.email, 'You have a new review', {
+            'booking': booking, 'user': guide_user, 'feedback': guide_feedback,
+        }))
+    return [message for message in queued if message is not None]
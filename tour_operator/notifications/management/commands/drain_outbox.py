@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from notifications.outbox import drain
+
+
+class Command(BaseCommand):
+    help = (
+        'Deliver queued notification emails in batches, retrying failures with backoff. '
+        'Runs once by default; --loop keeps polling, for use as a long-running worker.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100, help='Messages claimed per batch')
+        parser.add_argument('--concurrency', type=int, default=None, help='Parallel email connections (default OUTBOX_CONCURRENCY)')
+        parser.add_argument('--loop', action='store_true', help='Keep polling for new messages')
+        parser.add_argument('--interval', type=float, default=5, help='Seconds between polls with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            sent, retrying, failed = drain(options['batch_size'], options['concurrency'])
+            if sent or retrying or failed or not options['loop']:
+                style = self.style.ERROR if failed else self.style.SUCCESS
+                self.stdout.write(style(f'Sent {sent}, will retry {retrying}, gave up on {failed}'))
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,153 @@
+"""
+Transactional outbox for customer and guide email.
+
+Views call enqueue() inside the transaction that saves the booking or
+feedback; it only inserts an OutboxMessage row. The drain_outbox command
+delivers them with drain():
+
+  * a batch of due messages is claimed with one UPDATE that stamps a fresh
+    token and a lease (claimed_until), so several workers can run side by
+    side and a crashed worker's messages are picked up once the lease ends
+  * the batch is split over OUTBOX_CONCURRENCY threads, each sending its
+    share over one connection to the configured EMAIL_BACKEND
+  * sent messages are marked in one UPDATE; failures are retried with
+    exponential backoff and jitter until OUTBOX_MAX_ATTEMPTS, then marked
+    failed and left for the admin to inspect
+"""
+import logging
+import random
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import mail
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+LEASE = timedelta(minutes=5)
+MAX_BACKOFF = timedelta(hours=6)
+
+
+def enqueue(kind, recipient, subject, body):
+    """Queue an email; returns the OutboxMessage, or None without a recipient"""
+    if not recipient:
+        return None
+    return OutboxMessage.objects.create(kind=kind, recipient=recipient, subject=subject, body=body)
+
+
+def backoff(attempts):
+    """Delay before the next try after `attempts` failures"""
+    base = timedelta(seconds=getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 30))
+    delay = min(base * 2 ** (attempts - 1), MAX_BACKOFF)
+    # Jitter keeps messages that failed together from retrying together
+    return delay * random.uniform(1, 1.25)
+
+
+def _due(now):
+    return OutboxMessage.objects.filter(
+        Q(claimed_until__isnull=True) | Q(claimed_until__lt=now),
+        status='pending',
+        next_attempt_at__lte=now,
+    )
+
+
+def claim_batch(batch_size, now=None):
+    """Claim up to `batch_size` due messages; returns them"""
+    now = now or timezone.now()
+    token = uuid.uuid4()
+    due_ids = _due(now).order_by('next_attempt_at', 'pk').values('pk')[:batch_size]
+    claimed = _due(now).filter(pk__in=due_ids).update(claim=token, claimed_until=now + LEASE)
+    if not claimed:
+        return []
+    return list(OutboxMessage.objects.filter(claim=token).order_by('pk'))
+
+
+def _send_share(messages):
+    """Send messages over one backend connection; returns {pk: error or None}"""
+    results = {}
+    try:
+        connection = mail.get_connection(fail_silently=False)
+        connection.open()
+    except Exception as exc:
+        return {message.pk: f'{type(exc).__name__}: {exc}' for message in messages}
+    try:
+        for message in messages:
+            try:
+                mail.EmailMessage(
+                    subject=message.subject,
+                    body=message.body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[message.recipient],
+                    connection=connection,
+                ).send()
+                results[message.pk] = None
+            except Exception as exc:
+                results[message.pk] = f'{type(exc).__name__}: {exc}'
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            logger.warning('Could not close the email connection', exc_info=True)
+    return results
+
+
+def deliver(messages, concurrency=None):
+    """Send claimed messages and record the outcome; returns (sent, retrying, failed)"""
+    if not messages:
+        return 0, 0, 0
+    concurrency = max(1, min(concurrency or getattr(settings, 'OUTBOX_CONCURRENCY', 4), len(messages)))
+    shares = [messages[index::concurrency] for index in range(concurrency)]
+    results = {}
+    if concurrency == 1:
+        results.update(_send_share(messages))
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='outbox') as pool:
+            for share_results in pool.map(_send_share, shares):
+                results.update(share_results)
+
+    now = timezone.now()
+    sent = [pk for pk, error in results.items() if error is None]
+    OutboxMessage.objects.filter(pk__in=sent).update(
+        status='sent', sent_at=now, claim=None, claimed_until=None, last_error=''
+    )
+
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+    failed = []
+    for message in messages:
+        error = results.get(message.pk)
+        if error is None:
+            continue
+        message.attempts += 1
+        message.last_error = error
+        message.claim = message.claimed_until = None
+        if message.attempts >= max_attempts:
+            message.status = 'failed'
+            logger.error('Giving up on outbox message %s to %s: %s', message.pk, message.recipient, error)
+        else:
+            message.next_attempt_at = now + backoff(message.attempts)
+        failed.append(message)
+    OutboxMessage.objects.bulk_update(
+        failed, ['attempts', 'last_error', 'claim', 'claimed_until', 'status', 'next_attempt_at']
+    )
+
+    given_up = sum(1 for message in failed if message.status == 'failed')
+    return len(sent), len(failed) - given_up, given_up
+
+
+def drain(batch_size=100, concurrency=None, max_batches=None):
+    """Deliver due messages batch by batch until none are left; returns (sent, retrying, failed)"""
+    totals = [0, 0, 0]
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        messages = claim_batch(batch_size)
+        if not messages:
+            break
+        for index, count in enumerate(deliver(messages, concurrency)):
+            totals[index] += count
+        batches += 1
+    return tuple(totals)
@@ -0,0 +1,74 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from bookings.models import Booking
+from tours.models import TourDate, TourPackage
+from .models import OutboxMessage
+from .outbox import LEASE, claim_batch, drain, enqueue
+
+
+class OutboxTests(TestCase):
+    def queue(self, count):
+        return [enqueue('test', f'customer{index}@example.com', 'Hello', 'Body') for index in range(count)]
+
+    def test_booking_queues_its_email_with_the_booking(self):
+        user = User.objects.create_user('customer', email='customer@example.com')
+        package = TourPackage.objects.create(
+            name='Alpine trek', description='', duration=2, price=100, max_participants=10, difficulty='easy',
+            location='Alps', included_services='', excluded_services='', itinerary='',
+        )
+        start = date.today() + timedelta(days=30)
+        tour_date = TourDate.objects.create(
+            tour_package=package, start_date=start, end_date=start + timedelta(days=1), available_spots=2,
+        )
+        self.client.force_login(user)
+        path = f'/bookings/book/{tour_date.pk}/'
+        self.client.post(path, {'participants': 2, 'special_requests': ''})
+        # Sold out now: no booking, so no email either
+        self.client.post(path, {'participants': 1, 'special_requests': ''})
+        booking = Booking.objects.get()
+        self.assertEqual(
+            list(OutboxMessage.objects.values_list('kind', 'recipient', 'subject')),
+            [('booking_created', 'customer@example.com', f'Booking #{booking.pk} received')],
+        )
+        self.assertEqual(mail.outbox, [])
+
+    def test_drain_sends_and_marks_messages(self):
+        self.queue(3)
+        enqueue('test', '', 'Nobody', 'Body')
+        self.assertEqual(drain(concurrency=2), (3, 0, 0))
+        self.assertEqual(sorted(message.to[0] for message in mail.outbox), [
+            'customer0@example.com', 'customer1@example.com', 'customer2@example.com',
+        ])
+        self.assertFalse(OutboxMessage.objects.exclude(status='sent').exists())
+        self.assertEqual(drain(), (0, 0, 0))
+
+    def test_claimed_messages_wait_for_the_lease(self):
+        self.queue(2)
+        self.assertEqual(len(claim_batch(10)), 2)
+        # Another worker finds nothing until the first worker's lease runs out
+        self.assertEqual(claim_batch(10), [])
+        self.assertEqual(len(claim_batch(10, now=timezone.now() + LEASE + timedelta(seconds=1))), 2)
+
+    @override_settings(OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_give_up(self):
+        [message] = self.queue(1)
+        with mock.patch('django.core.mail.EmailMessage.send', side_effect=OSError('connection refused')):
+            self.assertEqual(drain(), (0, 1, 0))
+            message.refresh_from_db()
+            self.assertEqual((message.status, message.attempts), ('pending', 1))
+            self.assertGreater(message.next_attempt_at, timezone.now())
+            self.assertIn('connection refused', message.last_error)
+            # Not due yet
+            self.assertEqual(drain(), (0, 0, 0))
+
+            OutboxMessage.objects.filter(pk=message.pk).update(next_attempt_at=timezone.now())
+            with self.assertLogs('notifications.outbox', 'ERROR'):
+                self.assertEqual(drain(), (0, 0, 1))
+        message.refresh_from_db()
+        self.assertEqual((message.status, message.attempts), ('failed', 2))
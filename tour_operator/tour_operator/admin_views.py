@@ -3,13 +3,28 @@ from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_date
+from django.utils.http import urlencode
 from tours.models import TourPackage, TourDate, TourImage
+from tours.image_pipeline import schedule_processing
+from bookings.matching import match_requests
+from bookings.reservations import SeatsUnavailable, transition_bookings
 from bookings.models import Booking, Customer, CustomTourRequest
-from guides.models import Guide, GuideAvailability
-from feedback.models import TourFeedback, GuideFeedback
+from guides.models import Guide, GuideStats, Language, Specialization
+from guides import calendar as guide_calendar
+from guides.assignment import apply_plan, plan_assignments, posted_plan
+from guides.conflicts import feasible_guides
+from guides.tags import tag_params, with_tags
+from feedback import rollups as feedback_rollups
+from feedback.models import TourFeedback, TourFeedbackRollup, GuideFeedback
 from django.contrib.auth.models import User
+from django.db import transaction
+from notifications import emails
 from datetime import datetime, date, timedelta
-from django.db.models import Avg, Count, Q
+from . import counters as site_counters
+from .pagination import paginate
+from .exports import BOOKING_FILTERS, filter_bookings, filter_tour_feedback, streaming_export
 
 # Hardcoded admin credentials
 ADMIN_USERNAME = 'admin'
@@ -52,29 +67,22 @@ def admin_dashboard(request):
         messages.error(request, 'Access denied. Admin privileges required.')
         return redirect('admin_login')
 
-    # Dashboard statistics
-    total_tours = TourPackage.objects.count()
-    active_tours = TourPackage.objects.filter(is_active=True).count()
-    total_bookings = Booking.objects.count()
-    pending_bookings = Booking.objects.filter(status='pending').count()
-    total_customers = Customer.objects.count()
-    custom_requests = CustomTourRequest.objects.filter(is_processed=False).count()
-    total_guides = Guide.objects.count()
-    available_guides = Guide.objects.filter(is_available=True).count()
-    total_feedback = TourFeedback.objects.count()
-    avg_rating = TourFeedback.objects.aggregate(avg_rating=Avg('overall_rating'))['avg_rating'] or 0
+    # Dashboard statistics, from the cached counters (tour_operator.counters)
+    counts = site_counters.get_counters()
+    feedback = counts['feedback']
 
     context = {
-        'total_tours': total_tours,
-        'active_tours': active_tours,
-        'total_bookings': total_bookings,
-        'pending_bookings': pending_bookings,
-        'total_customers': total_customers,
-        'custom_requests': custom_requests,
-        'total_guides': total_guides,
-        'available_guides': available_guides,
-        'total_feedback': total_feedback,
-        'avg_rating': round(avg_rating, 1),
+        'total_tours': counts['tours']['total'],
+        'active_tours': counts['tours']['active'],
+        'total_bookings': counts['bookings']['total'],
+        'pending_bookings': counts['bookings']['pending'],
+        'total_customers': counts['customers']['total'],
+        'custom_requests': counts['custom_requests']['unprocessed'],
+        'total_guides': counts['guides']['total'],
+        'available_guides': counts['guides']['available'],
+        'total_feedback': feedback['total'],
+        'avg_rating': round(feedback['overall_sum'] / feedback['total'], 1) if feedback['total'] else 0,
+        'approximate': counts['approximate'],
     }
 
     return render(request, 'admin/admin_dashboard.html', context)
@@ -85,9 +93,23 @@ def admin_tour_list(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    tours = TourPackage.objects.all().order_by('-created_at')
+    tours = paginate(request, TourPackage.objects.all(), ['-created_at', '-id'])
     return render(request, 'admin/tour_list.html', {'tours': tours})
 
+def _submitted_images(image_urls, image_captions, primary_image_index):
+    """Gallery entries from the tour form, skipping empty URL fields"""
+    entries = []
+    for i, url in enumerate(image_urls):
+        if url.strip():
+            caption = image_captions[i] if i < len(image_captions) else ''
+            entries.append({
+                'image_url': url.strip(),
+                'caption': caption.strip(),
+                'display_order': i,
+                'is_primary': str(i) == primary_image_index,
+            })
+    return entries
+
 @login_required
 def admin_create_tour(request):
     if not is_admin(request.user):
@@ -115,17 +137,8 @@ def admin_create_tour(request):
         image_captions = request.POST.getlist('image_captions')
         primary_image_index = request.POST.get('primary_image')
 
-        for i, url in enumerate(image_urls):
-            if url.strip():  # Only create if URL is not empty
-                caption = image_captions[i] if i < len(image_captions) else ''
-                is_primary = str(i) == primary_image_index
-                TourImage.objects.create(
-                    tour_package=tour,
-                    image_url=url.strip(),
-                    caption=caption.strip(),
-                    is_primary=is_primary,
-                    display_order=i
-                )
+        new_images = tour.sync_images(_submitted_images(image_urls, image_captions, primary_image_index))
+        schedule_processing(image.id for image in new_images)
 
         messages.success(request, f'Tour "{tour.name}" created successfully with {len([url for url in image_urls if url.strip()])} images!')
         return redirect('admin_tour_list')
@@ -154,25 +167,14 @@ def admin_edit_tour(request, tour_id):
         tour.is_active = request.POST.get('is_active') == 'on'
         tour.save()
 
-        # Handle image updates - first remove all existing images
-        tour.images.all().delete()
-
-        # Then add new images
+        # Reconcile the gallery with the submitted images; unchanged images
+        # keep their ids and generated variants
         image_urls = request.POST.getlist('image_urls')
         image_captions = request.POST.getlist('image_captions')
         primary_image_index = request.POST.get('primary_image')
 
-        for i, url in enumerate(image_urls):
-            if url.strip():  # Only create if URL is not empty
-                caption = image_captions[i] if i < len(image_captions) else ''
-                is_primary = str(i) == primary_image_index
-                TourImage.objects.create(
-                    tour_package=tour,
-                    image_url=url.strip(),
-                    caption=caption.strip(),
-                    is_primary=is_primary,
-                    display_order=i
-                )
+        new_images = tour.sync_images(_submitted_images(image_urls, image_captions, primary_image_index))
+        schedule_processing(image.id for image in new_images)
 
         messages.success(request, f'Tour "{tour.name}" updated successfully with {len([url for url in image_urls if url.strip()])} images!')
         return redirect('admin_tour_list')
@@ -211,8 +213,20 @@ def admin_bookings(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    bookings = Booking.objects.all().order_by('-booking_date').select_related('customer', 'tour_date', 'guide')
-    return render(request, 'admin/bookings.html', {'bookings': bookings})
+    bookings = paginate(
+        request,
+        filter_bookings(
+            Booking.objects.select_related('customer__user', 'tour_date__tour_package', 'guide__user'),
+            request.GET
+        ),
+        ['-booking_date', '-id']
+    )
+    return render(request, 'admin/bookings.html', {
+        'bookings': bookings,
+        'status_choices': Booking.STATUS_CHOICES,
+        'available_tours': TourPackage.objects.only('id', 'name').order_by('name'),
+        'filters': {key: request.GET[key] for key in BOOKING_FILTERS if request.GET.get(key)},
+    })
 
 @login_required
 def admin_booking_detail(request, booking_id):
@@ -223,23 +237,124 @@ def admin_booking_detail(request, booking_id):
     booking = get_object_or_404(Booking, id=booking_id)
 
     if request.method == 'POST':
-        # Update booking status
-        booking.status = request.POST.get('status')
-        booking.payment_status = request.POST.get('payment_status') == 'on'
-        booking.save()
+        # Update booking status; cancelling returns the seats to the tour date
+        try:
+            with transaction.atomic():
+                changed = transition_bookings(
+                    Booking.objects.filter(pk=booking.pk),
+                    status=request.POST.get('status'),
+                    payment_status=request.POST.get('payment_status') == 'on'
+                )
+                if changed['status'] or changed['payment']:
+                    booking.refresh_from_db(fields=['status', 'payment_status'])
+                    emails.booking_updated(booking)
+        except SeatsUnavailable as e:
+            messages.error(request, f'Cannot reinstate this booking: only {e.available_spots} spots are left.')
+            return redirect('admin_booking_detail', booking_id=booking.id)
 
         messages.success(request, 'Booking updated successfully!')
         return redirect('admin_bookings')
 
     return render(request, 'admin/booking_detail.html', {'booking': booking})
 
+@login_required
+def admin_bulk_bookings(request):
+    if not is_admin(request.user):
+        messages.error(request, 'Access denied.')
+        return redirect('admin_login')
+
+    back = reverse('admin_bookings')
+    if request.method != 'POST':
+        return redirect(back)
+
+    # Either the ticked bookings or everything matching the page filters
+    if request.POST.get('scope') == 'filtered':
+        bookings = filter_bookings(Booking.objects.all(), request.POST)
+        filters = {key: request.POST[key] for key in BOOKING_FILTERS if request.POST.get(key)}
+        if filters:
+            back += '?' + urlencode(filters)
+    else:
+        ids = [value for value in request.POST.getlist('booking_ids') if value.isdigit()]
+        bookings = Booking.objects.filter(pk__in=ids)
+        if not ids:
+            messages.error(request, 'Select at least one booking.')
+            return redirect(back)
+
+    new_status = request.POST.get('new_status')
+    if new_status not in dict(Booking.STATUS_CHOICES):
+        new_status = None
+    new_payment = {'paid': True, 'unpaid': False}.get(request.POST.get('new_payment'))
+    if new_status is None and new_payment is None:
+        messages.error(request, 'Choose a status or payment change to apply.')
+        return redirect(back)
+
+    try:
+        result = transition_bookings(bookings, status=new_status, payment_status=new_payment)
+    except SeatsUnavailable as e:
+        messages.error(request, f'Nothing was changed: a tour date only has {e.available_spots} spots left for the reinstated bookings.')
+        return redirect(back)
+
+    summary = f"{result['status']} status and {result['payment']} payment changes applied."
+    if result['seats'] > 0:
+        summary += f" {result['seats']} seats returned to their tour dates."
+    elif result['seats'] < 0:
+        summary += f" {-result['seats']} seats taken for reinstated bookings."
+    messages.success(request, summary)
+    return redirect(back)
+
+@login_required
+def admin_auto_assign(request):
+    if not is_admin(request.user):
+        messages.error(request, 'Access denied.')
+        return redirect('admin_login')
+
+    params = request.POST if request.method == 'POST' else request.GET
+    try:
+        date_from = parse_date(params.get('date_from') or '') or date.today()
+        date_to = parse_date(params.get('date_to') or '') or date_from + timedelta(days=30)
+    except ValueError:
+        messages.error(request, 'Enter valid dates.')
+        return redirect('admin_auto_assign')
+    if date_to < date_from:
+        date_from, date_to = date_to, date_from
+
+    if request.method == 'POST':
+        # Commit the assignments that were previewed, each "booking:guide"
+        pairs = []
+        for value in request.POST.getlist('assignment'):
+            booking_id, _, guide_id = value.partition(':')
+            if booking_id.isdigit() and guide_id.isdigit():
+                pairs.append((int(booking_id), int(guide_id)))
+        saved, rejected = apply_plan(posted_plan(date_from, date_to, pairs))
+        messages.success(request, f'{saved} guides assigned for tours starting {date_from} to {date_to}.')
+        for assignment, reason in rejected:
+            messages.error(request, f'Booking #{assignment.booking.pk} was not given {assignment.guide}: {reason.lower()}.')
+        return redirect(reverse('admin_auto_assign') + '?' + urlencode({
+            'date_from': date_from.isoformat(), 'date_to': date_to.isoformat()
+        }))
+
+    plan = plan_assignments(date_from, date_to)
+    return render(request, 'admin/auto_assign.html', {
+        'plan': plan,
+        'date_from': date_from,
+        'date_to': date_to,
+    })
+
 @login_required
 def admin_custom_requests(request):
     if not is_admin(request.user):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    custom_requests = CustomTourRequest.objects.all().order_by('-created_at').select_related('customer')
+    custom_requests = paginate(
+        request,
+        CustomTourRequest.objects.select_related('customer__user'),
+        ['-created_at', '-id']
+    )
+    # The whole page is ranked against the catalog in one pass
+    matches = match_requests(custom_requests)
+    for custom_request in custom_requests:
+        custom_request.matches = matches[custom_request.pk]
     return render(request, 'admin/custom_requests.html', {'custom_requests': custom_requests})
 
 @login_required
@@ -267,7 +382,7 @@ def admin_guides(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    guides = Guide.objects.all().order_by('-created_at').select_related('user')
+    guides = paginate(request, Guide.objects.select_related('user'), ['-created_at', '-id'])
     return render(request, 'admin/guides.html', {'guides': guides})
 
 @login_required
@@ -305,7 +420,6 @@ def admin_create_guide(request):
             specializations=request.POST.get('specializations'),
             bio=request.POST.get('bio'),
             is_available=request.POST.get('is_available') == 'on',
-            rating=float(request.POST.get('rating', 0))
         )
 
         messages.success(request, f'Guide "{first_name} {last_name}" created successfully!')
@@ -335,7 +449,6 @@ def admin_edit_guide(request, guide_id):
         guide.specializations = request.POST.get('specializations')
         guide.bio = request.POST.get('bio')
         guide.is_available = request.POST.get('is_available') == 'on'
-        guide.rating = float(request.POST.get('rating', 0))
         guide.save()
 
         messages.success(request, f'Guide "{guide.user.first_name} {guide.user.last_name}" updated successfully!')
@@ -366,41 +479,33 @@ def admin_guide_availability(request, guide_id):
     guide = get_object_or_404(Guide, id=guide_id)
 
     if request.method == 'POST':
-        availability_date = request.POST.get('date')
         is_available = request.POST.get('is_available') == 'on'
+        try:
+            start, end, weekdays = guide_calendar.parse_rule(request.POST)
+        except ValueError as error:
+            messages.error(request, str(error))
+            return redirect('admin_guide_availability', guide_id=guide.id)
 
-        availability, created = GuideAvailability.objects.get_or_create(
-            guide=guide,
-            date=availability_date,
-            defaults={'is_available': is_available}
-        )
-
-        if not created:
-            availability.is_available = is_available
-            availability.save()
+        days = guide_calendar.set_availability(guide.id, start, end, is_available, weekdays)
 
-        messages.success(request, f'Availability updated for {availability_date}')
+        if start == end:
+            messages.success(request, f'Availability updated for {start}')
+        else:
+            messages.success(request, f'Availability updated for {len(days)} days from {start} to {end}')
         return redirect('admin_guide_availability', guide_id=guide.id)
 
-    # Get availability for next 30 days
-    availability_dates = []
+    # Get availability for next 30 days; days without a record are available
     today = date.today()
-    for i in range(30):
-        check_date = today + timedelta(days=i)
-        try:
-            availability = GuideAvailability.objects.get(guide=guide, date=check_date)
-            is_available = availability.is_available
-        except GuideAvailability.DoesNotExist:
-            is_available = True  # Default to available
-
-        availability_dates.append({
-            'date': check_date,
-            'is_available': is_available
-        })
+    unavailable = guide_calendar.unavailable_days([guide.id])[guide.id]
+    availability_dates = [
+        {'date': check_date, 'is_available': check_date not in unavailable}
+        for check_date in (today + timedelta(days=i) for i in range(30))
+    ]
 
     return render(request, 'admin/guide_availability.html', {
         'guide': guide,
-        'availability_dates': availability_dates
+        'availability_dates': availability_dates,
+        'weekday_choices': guide_calendar.WEEKDAY_CHOICES,
     })
 
 @login_required
@@ -409,13 +514,24 @@ def admin_assign_guide(request, booking_id):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    booking = get_object_or_404(Booking, id=booking_id)
-    available_guides = Guide.objects.filter(is_available=True)
+    booking = get_object_or_404(Booking.objects.select_related('tour_date__tour_package', 'guide__user'), id=booking_id)
+    # Only guides free for every day of the tour are offered, narrowed by any tag filters
+    languages, specializations = tag_params(request.GET)
+    guides = with_tags(
+        Guide.objects.filter(is_available=True).select_related('user').order_by('-rating', 'pk'),
+        languages, specializations
+    )
+    available_guides = feasible_guides(
+        booking.tour_date, exclude_booking_ids=[booking.id], guides=guides, fresh=request.method == 'POST'
+    )
 
     if request.method == 'POST':
         guide_id = request.POST.get('guide_id')
         if guide_id:
-            guide = get_object_or_404(Guide, id=guide_id)
+            guide = next((guide for guide in available_guides if str(guide.id) == guide_id), None)
+            if guide is None:
+                messages.error(request, 'That guide is unavailable or already booked on these dates.')
+                return redirect('admin_assign_guide', booking_id=booking.id)
             booking.guide = guide
             booking.save()
             messages.success(request, f'Guide {guide.user.first_name} {guide.user.last_name} assigned to booking #{booking.id}')
@@ -428,7 +544,11 @@ def admin_assign_guide(request, booking_id):
 
     return render(request, 'admin/assign_guide.html', {
         'booking': booking,
-        'available_guides': available_guides
+        'available_guides': available_guides,
+        'languages': Language.objects.all(),
+        'specializations': Specialization.objects.all(),
+        'selected_languages': languages,
+        'selected_specializations': specializations,
     })
 
 # Feedback Management Views
@@ -438,7 +558,7 @@ def admin_feedback(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    tour_feedbacks = TourFeedback.objects.all().order_by('-created_at').select_related(
+    tour_feedbacks = TourFeedback.objects.select_related(
         'booking__customer__user',
         'booking__tour_date__tour_package'
     )
@@ -447,24 +567,30 @@ def admin_feedback(request):
     rating_filter = request.GET.get('rating')
     tour_filter = request.GET.get('tour')
 
-    if rating_filter:
-        tour_feedbacks = tour_feedbacks.filter(overall_rating=rating_filter)
+    tour_feedbacks = filter_tour_feedback(tour_feedbacks, request.GET)
 
-    if tour_filter:
-        tour_feedbacks = tour_feedbacks.filter(booking__tour_date__tour_package__id=tour_filter)
+    tour_feedbacks = paginate(request, tour_feedbacks, ['-created_at', '-id'])
 
     # Get available tours for filter
     available_tours = TourPackage.objects.all().order_by('name')
 
-    # Calculate statistics
-    stats = TourFeedback.objects.aggregate(
-        avg_overall=Avg('overall_rating'),
-        avg_guide=Avg('guide_rating'),
-        avg_accommodation=Avg('accommodation_rating'),
-        avg_value=Avg('value_for_money_rating'),
-        total_count=Count('id'),
-        recommend_count=Count('id', filter=Q(would_recommend=True))
-    )
+    # Calculate statistics from the monthly rollups rather than every feedback row
+    totals = feedback_rollups.totals(TourFeedbackRollup)
+    stats = {
+        'avg_overall': feedback_rollups.average(totals, 'overall_sum'),
+        'avg_guide': feedback_rollups.average(totals, 'guide_sum'),
+        'avg_accommodation': feedback_rollups.average(totals, 'accommodation_sum'),
+        'avg_value': feedback_rollups.average(totals, 'value_sum'),
+        'total_count': totals['feedback_count'],
+        'recommend_count': totals['recommend_count'],
+    }
+    months = feedback_rollups.months(12)
+    monthly_stats = [{
+        'month': row['bucket'],
+        'count': row['feedback_count'],
+        'avg_overall': feedback_rollups.average(row, 'overall_sum'),
+        'recommend_count': row['recommend_count'],
+    } for row in feedback_rollups.trend(TourFeedbackRollup, 'month', months[0], months[-1])]
 
     recommend_percentage = 0
     if stats['total_count'] > 0:
@@ -475,6 +601,7 @@ def admin_feedback(request):
         'available_tours': available_tours,
         'stats': stats,
         'recommend_percentage': recommend_percentage,
+        'monthly_stats': monthly_stats,
         'current_rating_filter': rating_filter,
         'current_tour_filter': tour_filter,
     }
@@ -507,29 +634,37 @@ def admin_guide_feedback(request):
         messages.error(request, 'Access denied.')
         return redirect('admin_login')
 
-    guide_feedbacks = GuideFeedback.objects.all().order_by('-created_at').select_related(
-        'guide__user',
-        'booking__customer__user',
-        'booking__tour_date__tour_package'
+    guide_feedbacks = paginate(
+        request,
+        GuideFeedback.objects.select_related(
+            'guide__user',
+            'booking__customer__user',
+            'booking__tour_date__tour_package'
+        ),
+        ['-created_at', '-id']
     )
 
-    # Calculate guide performance statistics
-    guide_stats = {}
-    for guide in Guide.objects.all():
-        guide_feedback_qs = GuideFeedback.objects.filter(guide=guide)
-        if guide_feedback_qs.exists():
-            avg_knowledge = guide_feedback_qs.aggregate(avg=Avg('knowledge_rating'))['avg']
-            avg_communication = guide_feedback_qs.aggregate(avg=Avg('communication_rating'))['avg']
-            avg_professionalism = guide_feedback_qs.aggregate(avg=Avg('professionalism_rating'))['avg']
-
-            guide_stats[guide.id] = {
-                'avg_knowledge': round(avg_knowledge, 1) if avg_knowledge else 0,
-                'avg_communication': round(avg_communication, 1) if avg_communication else 0,
-                'avg_professionalism': round(avg_professionalism, 1) if avg_professionalism else 0,
-                'total_feedback': guide_feedback_qs.count()
-            }
+    # Guide performance leaderboard, read from the precomputed GuideStats rows
+    leaderboard = GuideStats.objects.filter(feedback_count__gt=0).select_related('guide__user').order_by(
+        '-guide__rating', '-feedback_count', 'guide_id'
+    )
+    guide_stats = [{
+        'guide': row.guide,
+        'avg_knowledge': row.avg_knowledge,
+        'avg_communication': row.avg_communication,
+        'avg_professionalism': row.avg_professionalism,
+        'total_feedback': row.feedback_count,
+    } for row in leaderboard]
 
     return render(request, 'admin/guide_feedback.html', {
         'guide_feedbacks': guide_feedbacks,
         'guide_stats': guide_stats
-    })
\ No newline at end of file
+    })
+
+@login_required
+def admin_export(request, kind):
+    if not is_admin(request.user):
+        messages.error(request, 'Access denied.')
+        return redirect('admin_login')
+
+    return streaming_export(kind, request.GET, request.GET.get('format', 'csv'))
@@ -0,0 +1,249 @@
+"""
+Read-only JSON catalog API, mounted under /api/v1/.
+
+    GET /api/v1/tours/                     active tour packages (cursor paginated)
+    GET /api/v1/tours/<id>/                one package with its dates and images
+    GET /api/v1/tours/<id>/dates/          the package's dates
+    GET /api/v1/tours/<id>/images/         the package's gallery
+    GET /api/v1/guides/                    available guides (cursor paginated), ?language= &specialization=
+    GET /api/v1/guides/<id>/               one guide summary
+
+Every endpoint answers conditional GETs. Before building the body, one small
+query fetches the validators (the newest updated_at, plus a row count for
+lists) and turns them into a strong ETag and Last-Modified; a matching
+If-None-Match / If-Modified-Since gets a 304 straight away. Tour dates and
+images touch their package's updated_at (see tours.signals), so a package
+timestamp covers the whole resource.
+
+Rows are read with .values() and dumped with compact separators, skipping
+model instantiation. `?fields=name,price` narrows the objects to the listed
+fields; `id` is always included.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+
+from django.db.models import Count, F, Max
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+from guides.models import Guide
+from guides.tags import tag_params, with_tags
+from tours.models import TourPackage, TourDate, TourImage
+from .pagination import PAGE_SIZE, paginate
+
+API_VERSION = 'v1'
+
+PACKAGE_FIELDS = {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'duration': 'duration',
+    'price': 'price',
+    'max_participants': 'max_participants',
+    'difficulty': 'difficulty',
+    'location': 'location',
+    'included_services': 'included_services',
+    'excluded_services': 'excluded_services',
+    'itinerary': 'itinerary',
+    'primary_image_url': 'primary_image_url',
+    'updated_at': 'updated_at',
+}
+PACKAGE_LIST_FIELDS = [
+    'id', 'name', 'duration', 'price', 'difficulty', 'location', 'primary_image_url', 'updated_at',
+]
+
+DATE_FIELDS = {
+    'id': 'id',
+    'start_date': 'start_date',
+    'end_date': 'end_date',
+    'available_spots': 'available_spots',
+    'is_available': 'is_available',
+}
+
+IMAGE_FIELDS = {
+    'id': 'id',
+    'image_url': 'image_url',
+    'caption': 'caption',
+    'is_primary': 'is_primary',
+    'display_order': 'display_order',
+}
+
+GUIDE_FIELDS = {
+    'id': 'id',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'experience_years': 'experience_years',
+    'languages': 'languages',
+    'specializations': 'specializations',
+    'bio': 'bio',
+    'rating': 'rating',
+    'updated_at': 'updated_at',
+}
+GUIDE_LIST_FIELDS = [
+    'id', 'first_name', 'last_name', 'experience_years', 'languages', 'specializations', 'rating',
+]
+
+
+def _json(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'separators': (',', ':')})
+
+
+def _select_fields(request, available, default=None):
+    """Field names requested with ?fields=, restricted to `available`"""
+    requested = request.GET.get('fields')
+    if not requested:
+        return list(default or available)
+    fields = [name for name in requested.split(',') if name in available]
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return fields
+
+
+def _values(queryset, fields, available):
+    """queryset.values() returning `fields`, aliasing lookups that cross relations"""
+    plain = [name for name in fields if available[name] == name]
+    aliased = {name: F(available[name]) for name in fields if available[name] != name}
+    return queryset.values(*plain, **aliased)
+
+
+def _page_payload(request, page):
+    def link(querystring):
+        return f'{request.path}?{querystring}' if querystring else None
+    return {
+        'results': list(page),
+        'next': link(page.next_querystring),
+        'previous': link(page.previous_querystring),
+    }
+
+
+def conditional(validators):
+    """
+    Serve a view with conditional GET support.
+
+    `validators(request, **kwargs)` returns (last_modified, token), where
+    token captures anything else that changes the body (such as a row count),
+    or None when the resource does not exist.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        @require_safe
+        def wrapper(request, *args, **kwargs):
+            found = validators(request, **kwargs)
+            if found is None:
+                return _json({'detail': 'Not found.'}, status=404)
+            last_modified, token = found
+
+            etag = quote_etag(hashlib.sha1(
+                f'{API_VERSION}|{request.get_full_path()}|{last_modified}|{token}'.encode()
+            ).hexdigest())
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_func(request, *args, **kwargs)
+
+            response['ETag'] = etag
+            if timestamp is not None:
+                response['Last-Modified'] = http_date(timestamp)
+            # Clients may keep the body but must revalidate before reuse
+            patch_cache_control(response, public=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
+
+
+def _collection_validators(queryset):
+    state = queryset.aggregate(last_modified=Max('updated_at'), count=Count('id'))
+    return state['last_modified'], state['count']
+
+
+def _package_list_validators(request):
+    # Counting every package, not just active ones, catches deletions and
+    # deactivations that leave the newest timestamp unchanged
+    return _collection_validators(TourPackage.objects.all())
+
+
+def _package_validators(request, tour_id):
+    updated_at = (
+        TourPackage.objects.filter(pk=tour_id, is_active=True)
+        .values_list('updated_at', flat=True).first()
+    )
+    return None if updated_at is None else (updated_at, '')
+
+
+def _guide_list_validators(request):
+    return _collection_validators(Guide.objects.all())
+
+
+def _guide_validators(request, guide_id):
+    updated_at = (
+        Guide.objects.filter(pk=guide_id, is_available=True)
+        .values_list('updated_at', flat=True).first()
+    )
+    return None if updated_at is None else (updated_at, '')
+
+
+def _package_dates(tour_id, fields):
+    return list(_values(
+        TourDate.objects.filter(tour_package_id=tour_id).order_by('start_date', 'id'), fields, DATE_FIELDS
+    ))
+
+
+def _package_images(tour_id, fields):
+    return list(_values(
+        TourImage.objects.filter(tour_package_id=tour_id).order_by('display_order', 'created_at'),
+        fields, IMAGE_FIELDS
+    ))
+
+
+@conditional(_package_list_validators)
+def package_list(request):
+    """Active tour packages, oldest first"""
+    fields = _select_fields(request, PACKAGE_FIELDS, PACKAGE_LIST_FIELDS)
+    queryset = _values(TourPackage.objects.filter(is_active=True), fields, PACKAGE_FIELDS)
+    page = paginate(request, queryset, ['id'], per_page=PAGE_SIZE)
+    return _json(_page_payload(request, page))
+
+
+@conditional(_package_validators)
+def package_detail(request, tour_id):
+    """One active tour package with its dates and images"""
+    fields = _select_fields(request, PACKAGE_FIELDS)
+    package = _values(TourPackage.objects.filter(pk=tour_id), fields, PACKAGE_FIELDS).get()
+    package['dates'] = _package_dates(tour_id, list(DATE_FIELDS))
+    package['images'] = _package_images(tour_id, list(IMAGE_FIELDS))
+    return _json(package)
+
+
+@conditional(_package_validators)
+def package_dates(request, tour_id):
+    """All dates of an active tour package"""
+    return _json({'results': _package_dates(tour_id, _select_fields(request, DATE_FIELDS))})
+
+
+@conditional(_package_validators)
+def package_images(request, tour_id):
+    """The gallery of an active tour package"""
+    return _json({'results': _package_images(tour_id, _select_fields(request, IMAGE_FIELDS))})
+
+
+@conditional(_guide_list_validators)
+def guide_list(request):
+    """Available guides, oldest first, optionally only those with every given language and specialization slug"""
+    fields = _select_fields(request, GUIDE_FIELDS, GUIDE_LIST_FIELDS)
+    languages, specializations = tag_params(request.GET)
+    guides = with_tags(Guide.objects.filter(is_available=True), languages, specializations)
+    queryset = _values(guides, fields, GUIDE_FIELDS)
+    page = paginate(request, queryset, ['id'], per_page=PAGE_SIZE)
+    return _json(_page_payload(request, page))
+
+
+@conditional(_guide_validators)
+def guide_detail(request, guide_id):
+    """Summary of one available guide"""
+    fields = _select_fields(request, GUIDE_FIELDS)
+    guide = _values(Guide.objects.filter(pk=guide_id), fields, GUIDE_FIELDS).get()
+    return _json(guide)
@@ -0,0 +1,108 @@
+"""
+Version-keyed caching for the public catalog.
+
+Every cached page or template fragment is keyed by the current version of the
+scopes it was built from:
+
+    'tours'          any tour package, date or image
+    'tour:<id>'      one tour package and its dates/images
+    'guides'         any guide
+    'guide:<id>'     one guide, its feedback and its bookings
+    'feedback'       any tour feedback
+
+The signal handlers in each app call bump() when a row in one of those scopes
+changes, which moves every dependent key to a new version; stale entries are
+never read again and simply age out. Versions start from a nanosecond clock
+value rather than 1, so losing a version key (eviction, restart) can never
+bring an old cached page back to life.
+
+Only cache.get_many/add/incr/set are used, so any Django cache backend works
+as long as every worker process shares it: a local-memory cache would only
+see the bumps made by its own process and keep serving stale pages from the
+others. settings.CACHES defaults to the database cache for that reason.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.contrib.messages import get_messages
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+
+PAGE_TIMEOUT = 60 * 15
+VERSION_PREFIX = 'catalog:version:'
+PAGE_PREFIX = 'catalog:page:'
+
+
+def _version_key(scope):
+    return VERSION_PREFIX + scope
+
+
+def get_versions(*scopes):
+    """Return {scope: version} for the given scopes, initialising missing ones"""
+    keys = {scope: _version_key(scope) for scope in scopes}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for scope, key in keys.items():
+        if key not in found:
+            cache.add(key, time.time_ns(), None)
+            found[key] = cache.get(key)
+        versions[scope] = found[key]
+    return versions
+
+
+def catalog_version(*scopes):
+    """Single token combining the versions of `scopes`, for use as a cache key part"""
+    versions = get_versions(*scopes)
+    return '-'.join(str(versions[scope]) for scope in scopes)
+
+
+def bump(*scopes):
+    """Invalidate everything cached under `scopes` once the current transaction commits"""
+    def do_bump():
+        for scope in scopes:
+            key = _version_key(scope)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.add(key, time.time_ns(), None)
+    transaction.on_commit(do_bump)
+
+
+def _is_cacheable(request):
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    if request.user.is_authenticated:
+        return False
+    # Pages carrying a one-off flash message must not be stored
+    return len(get_messages(request)) == 0
+
+
+def cache_public_page(*scopes, timeout=PAGE_TIMEOUT):
+    """
+    Cache the full response of a catalog view for anonymous visitors.
+
+    Scopes may reference view keyword arguments, e.g. 'tour:{tour_id}'.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapper(request, *args, **kwargs):
+            if not _is_cacheable(request):
+                return view_func(request, *args, **kwargs)
+
+            version = catalog_version(*(scope.format(**kwargs) for scope in scopes))
+            digest = hashlib.md5(request.get_full_path().encode()).hexdigest()
+            key = f'{PAGE_PREFIX}{view_func.__name__}:{digest}:{version}'
+
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return HttpResponse(content, content_type=content_type)
+
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming:
+                cache.set(key, (response.content, response['Content-Type']), timeout)
+            return response
+        return wrapper
+    return decorator
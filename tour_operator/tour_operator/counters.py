@@ -0,0 +1,209 @@
+"""
+Cached site-wide counters for the admin dashboard.
+
+Each group of counters is one conditional aggregate over one table:
+
+    tours            every package, and the active ones
+    bookings         every booking, and the pending ones
+    customers        every customer
+    custom_requests  every request, and the unprocessed ones
+    guides           every guide, and the available ones
+    feedback         tour feedback and the sum of its overall ratings,
+                     read off the monthly rollups (feedback.rollups)
+
+Every counter sits in the cache under its own key for COUNTER_TIMEOUT.
+get_counters() reads them all with one get_many and recounts only the
+groups that are missing. The signal handlers in each app call saved() and
+deleted(): a created or deleted row adds or takes one with cache.incr, and
+an edit that may move a row between counters forgets its group so the next
+read recounts it. Bulk writes that skip the signals call forget(). The
+short timeout bounds any drift.
+
+Past APPROXIMATE_ABOVE rows an exact count means a full scan, so totals
+come from the planner's statistics instead (pg_class.reltuples on
+PostgreSQL, sqlite_stat1 after ANALYZE on SQLite). On PostgreSQL the
+filtered counters come from the EXPLAIN row estimate. Such groups are
+reported as approximate.
+"""
+import json
+
+from django.core.cache import cache
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Count, Q
+
+from bookings.models import Booking, Customer, CustomTourRequest
+from feedback import rollups as feedback_rollups
+from feedback.models import TourFeedback, TourFeedbackRollup
+from guides.models import Guide
+from tours.models import TourPackage
+
+COUNTER_TIMEOUT = 60 * 5
+CACHE_PREFIX = 'counters:'
+APPROXIMATE_ABOVE = 1_000_000
+
+# group -> (model, {counter: (field, value) a row needs to count, or None for every row})
+GROUPS = {
+    'tours': (TourPackage, {'total': None, 'active': ('is_active', True)}),
+    'bookings': (Booking, {'total': None, 'pending': ('status', 'pending')}),
+    'customers': (Customer, {'total': None}),
+    'custom_requests': (CustomTourRequest, {'total': None, 'unprocessed': ('is_processed', False)}),
+    'guides': (Guide, {'total': None, 'available': ('is_available', True)}),
+    'feedback': (TourFeedback, {'total': None}),
+}
+# group -> {counter: field summed over every row}
+SUMS = {
+    'feedback': {'overall_sum': 'overall_rating'},
+}
+MODEL_GROUPS = {model: group for group, (model, counters) in GROUPS.items()}
+
+
+def _key(group, counter):
+    return f'{CACHE_PREFIX}{group}.{counter}'
+
+
+def _counters(group):
+    return [*GROUPS[group][1], *SUMS.get(group, ())]
+
+
+def _keys(group):
+    return [_key(group, counter) for counter in _counters(group)] + [_key(group, 'approximate')]
+
+
+def estimates(models):
+    """{model: the planner's row count for its table} for the models that have one"""
+    tables = {model._meta.db_table: model for model in models}
+    if not tables:
+        return {}
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT relname, reltuples::bigint FROM pg_class WHERE oid = ANY(%s::regclass[])', [list(tables)]
+                )
+                rows = cursor.fetchall()
+            elif connection.vendor == 'sqlite':
+                # One row per index, each starting with the table's row count
+                placeholders = ', '.join(['%s'] * len(tables))
+                cursor.execute(f'SELECT tbl, stat FROM sqlite_stat1 WHERE tbl IN ({placeholders})', list(tables))
+                rows = [(table, int(stat.split()[0])) for table, stat in cursor.fetchall()]
+            else:
+                return {}
+    except DatabaseError:
+        # sqlite_stat1 only exists once ANALYZE has run
+        return {}
+    counts = {}
+    for table, count in rows:
+        # PostgreSQL reports -1 for a table never analyzed
+        if count is not None and count >= 0:
+            counts[tables[table]] = max(count, counts.get(tables[table], 0))
+    return counts
+
+
+def _estimate_matching(queryset):
+    """The EXPLAIN row estimate for a queryset on PostgreSQL, else its exact count"""
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def _recount(group, approximate=None):
+    """
+    {counter: value} for one group, and whether the values are estimates;
+    `approximate` is the planner's row count for the group's table, if any
+    """
+    model, counters = GROUPS[group]
+    if group == 'feedback':
+        totals = feedback_rollups.totals(TourFeedbackRollup)
+        return {'total': totals['feedback_count'], 'overall_sum': totals['overall_sum']}, False
+
+    if approximate is not None and approximate >= APPROXIMATE_ABOVE:
+        values = {
+            counter: approximate if match is None else _estimate_matching(model.objects.filter(**{match[0]: match[1]}))
+            for counter, match in counters.items()
+        }
+        return values, True
+
+    values = model.objects.aggregate(**{
+        counter: Count('pk') if match is None else Count('pk', filter=Q(**{match[0]: match[1]}))
+        for counter, match in counters.items()
+    })
+    return values, False
+
+
+def get_counters():
+    """
+    {group: {counter: value}} for every group, plus 'approximate': the set
+    of groups whose values are estimates
+    """
+    keys = [key for group in GROUPS for key in _keys(group)]
+    found = cache.get_many(keys)
+    missing = [
+        group for group in GROUPS
+        if not all(_key(group, counter) in found for counter in _counters(group))
+    ]
+    # Feedback is read off the rollups, never the feedback table
+    sizes = estimates(GROUPS[group][0] for group in missing if group != 'feedback')
+    result = {'approximate': set()}
+    fresh = {}
+    for group in GROUPS:
+        if group in missing:
+            values, approximate = _recount(group, sizes.get(GROUPS[group][0]))
+            fresh.update({_key(group, counter): value for counter, value in values.items()})
+            fresh[_key(group, 'approximate')] = approximate
+        else:
+            values = {counter: found[_key(group, counter)] for counter in _counters(group)}
+            approximate = found.get(_key(group, 'approximate'), False)
+        result[group] = values
+        if approximate:
+            result['approximate'].add(group)
+    if fresh:
+        cache.set_many(fresh, COUNTER_TIMEOUT)
+    return result
+
+
+def forget(*groups):
+    """Recount `groups` on the next read, once the current transaction commits"""
+    keys = [key for group in groups for key in _keys(group)]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def _changes(group, instance, sign):
+    model, counters = GROUPS[group]
+    changes = {
+        counter: sign for counter, match in counters.items()
+        if match is None or getattr(instance, match[0]) == match[1]
+    }
+    for counter, field in SUMS.get(group, {}).items():
+        changes[counter] = sign * getattr(instance, field)
+    return changes
+
+
+def _add(group, changes):
+    def apply():
+        for counter, count in changes.items():
+            try:
+                cache.incr(_key(group, counter), count)
+            except ValueError:
+                # Not cached; the next read recounts the group
+                pass
+    transaction.on_commit(apply)
+
+
+def saved(instance, created):
+    group = MODEL_GROUPS[type(instance)]
+    if created:
+        _add(group, _changes(group, instance, 1))
+    elif group in SUMS or any(match is not None for match in GROUPS[group][1].values()):
+        # The row may have moved between counters; it was not snapshotted, so recount
+        forget(group)
+
+
+def deleted(instance):
+    group = MODEL_GROUPS[type(instance)]
+    _add(group, _changes(group, instance, -1))
@@ -0,0 +1,244 @@
+"""
+Streaming CSV / NDJSON exports for the custom admin, served by
+admin_views.admin_export under /tour-admin/export/.
+
+    GET /tour-admin/export/bookings/          ?status= &tour= &date_from= &date_to=
+    GET /tour-admin/export/feedback/          ?rating= &tour= &date_from= &date_to=
+    GET /tour-admin/export/guide-feedback/    ?guide= &tour= &date_from= &date_to=
+    GET /tour-admin/export/guides/            ?available= &language= &specialization=
+    GET /tour-admin/export/custom-requests/   ?processed= &date_from= &date_to=
+
+`?format=ndjson` switches from CSV to one JSON object per line. The filters
+are the ones the admin list pages apply (filter_bookings and
+filter_tour_feedback are shared with them), so an export contains exactly
+the rows the page shows.
+
+Rows are projected with values_list() and read with .iterator(chunk_size=...),
+which uses a server-side cursor on PostgreSQL and chunked fetches elsewhere,
+and each row is encoded as soon as it arrives. Memory use does not grow with
+the export and the header row goes out before the first chunk is fetched.
+"""
+import csv
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from bookings.models import Booking, CustomTourRequest
+from feedback.models import GuideFeedback, TourFeedback
+from guides.models import Guide
+from guides.tags import tag_params, with_tags
+
+CHUNK_SIZE = 2000
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+# Text starting with one of these runs as a formula when the CSV is opened in a spreadsheet
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+BOOKING_FILTERS = ('status', 'tour', 'date_from', 'date_to')
+
+
+def _int_param(params, name):
+    value = params.get(name, '')
+    return int(value) if value.isdigit() else None
+
+
+def _date_param(params, name):
+    try:
+        return parse_date(params.get(name) or '')
+    except ValueError:
+        return None
+
+
+def _date_range(queryset, params, lookup):
+    date_from = _date_param(params, 'date_from')
+    date_to = _date_param(params, 'date_to')
+    if date_from:
+        queryset = queryset.filter(**{f'{lookup}__gte': date_from})
+    if date_to:
+        queryset = queryset.filter(**{f'{lookup}__lte': date_to})
+    return queryset
+
+
+def _flag(queryset, params, name, field):
+    value = params.get(name)
+    if value:
+        queryset = queryset.filter(**{field: value.lower() in TRUE_VALUES})
+    return queryset
+
+
+def filter_bookings(queryset, params):
+    """Apply the status, tour and departure date filters of the bookings page"""
+    status = params.get('status')
+    if status in dict(Booking.STATUS_CHOICES):
+        queryset = queryset.filter(status=status)
+    tour_id = _int_param(params, 'tour')
+    if tour_id:
+        queryset = queryset.filter(tour_date__tour_package_id=tour_id)
+    return _date_range(queryset, params, 'tour_date__start_date')
+
+
+def filter_tour_feedback(queryset, params):
+    """Apply the rating, tour and submission date filters of the feedback page"""
+    rating = _int_param(params, 'rating')
+    if rating:
+        queryset = queryset.filter(overall_rating=rating)
+    tour_id = _int_param(params, 'tour')
+    if tour_id:
+        queryset = queryset.filter(booking__tour_date__tour_package_id=tour_id)
+    return _date_range(queryset, params, 'created_at__date')
+
+
+def filter_guide_feedback(queryset, params):
+    guide_id = _int_param(params, 'guide')
+    if guide_id:
+        queryset = queryset.filter(guide_id=guide_id)
+    tour_id = _int_param(params, 'tour')
+    if tour_id:
+        queryset = queryset.filter(booking__tour_date__tour_package_id=tour_id)
+    return _date_range(queryset, params, 'created_at__date')
+
+
+def filter_guides(queryset, params):
+    languages, specializations = tag_params(params)
+    return with_tags(_flag(queryset, params, 'available', 'is_available'), languages, specializations)
+
+
+def filter_custom_requests(queryset, params):
+    queryset = _flag(queryset, params, 'processed', 'is_processed')
+    return _date_range(queryset, params, 'created_at__date')
+
+
+# kind -> (model, filter, [(column, lookup), ...])
+EXPORTS = {
+    'bookings': (Booking, filter_bookings, [
+        ('id', 'id'),
+        ('booking_date', 'booking_date'),
+        ('status', 'status'),
+        ('payment_status', 'payment_status'),
+        ('customer_username', 'customer__user__username'),
+        ('customer_email', 'customer__user__email'),
+        ('tour_id', 'tour_date__tour_package_id'),
+        ('tour', 'tour_date__tour_package__name'),
+        ('start_date', 'tour_date__start_date'),
+        ('end_date', 'tour_date__end_date'),
+        ('participants', 'participants'),
+        ('total_price', 'total_price'),
+        ('guide_username', 'guide__user__username'),
+        ('special_requests', 'special_requests'),
+    ]),
+    'feedback': (TourFeedback, filter_tour_feedback, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('booking_id', 'booking_id'),
+        ('customer_username', 'booking__customer__user__username'),
+        ('tour_id', 'booking__tour_date__tour_package_id'),
+        ('tour', 'booking__tour_date__tour_package__name'),
+        ('start_date', 'booking__tour_date__start_date'),
+        ('overall_rating', 'overall_rating'),
+        ('guide_rating', 'guide_rating'),
+        ('accommodation_rating', 'accommodation_rating'),
+        ('value_for_money_rating', 'value_for_money_rating'),
+        ('would_recommend', 'would_recommend'),
+        ('comments', 'comments'),
+        ('suggestions', 'suggestions'),
+    ]),
+    'guide-feedback': (GuideFeedback, filter_guide_feedback, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('booking_id', 'booking_id'),
+        ('guide_id', 'guide_id'),
+        ('guide_username', 'guide__user__username'),
+        ('customer_username', 'booking__customer__user__username'),
+        ('tour_id', 'booking__tour_date__tour_package_id'),
+        ('tour', 'booking__tour_date__tour_package__name'),
+        ('knowledge_rating', 'knowledge_rating'),
+        ('communication_rating', 'communication_rating'),
+        ('professionalism_rating', 'professionalism_rating'),
+        ('comments', 'comments'),
+    ]),
+    'guides': (Guide, filter_guides, [
+        ('id', 'id'),
+        ('username', 'user__username'),
+        ('first_name', 'user__first_name'),
+        ('last_name', 'user__last_name'),
+        ('email', 'user__email'),
+        ('phone', 'phone'),
+        ('experience_years', 'experience_years'),
+        ('languages', 'languages'),
+        ('specializations', 'specializations'),
+        ('is_available', 'is_available'),
+        ('rating', 'rating'),
+        ('created_at', 'created_at'),
+    ]),
+    'custom-requests': (CustomTourRequest, filter_custom_requests, [
+        ('id', 'id'),
+        ('created_at', 'created_at'),
+        ('customer_username', 'customer__user__username'),
+        ('customer_email', 'customer__user__email'),
+        ('destination', 'destination'),
+        ('duration', 'duration'),
+        ('participants', 'participants'),
+        ('budget_range', 'budget_range'),
+        ('preferred_dates', 'preferred_dates'),
+        ('special_requirements', 'special_requirements'),
+        ('is_processed', 'is_processed'),
+    ]),
+}
+
+
+class Echo:
+    """File-like object whose write() hands the line back to the caller"""
+
+    def write(self, value):
+        return value
+
+
+def _csv_cell(value):
+    """Text cells that a spreadsheet would evaluate, quoted with a leading apostrophe"""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_rows(columns, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow([_csv_cell(value) for value in row])
+
+
+def ndjson_rows(columns, rows):
+    encoder = DjangoJSONEncoder(separators=(',', ':'))
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+def export_rows(kind, params):
+    """The column names and a lazy row iterator for one export"""
+    model, apply_filters, spec = EXPORTS[kind]
+    columns = [column for column, lookup in spec]
+    queryset = apply_filters(model.objects.all(), params).order_by('id')
+    rows = queryset.values_list(*[lookup for column, lookup in spec]).iterator(chunk_size=CHUNK_SIZE)
+    return columns, rows
+
+
+def streaming_export(kind, params, export_format='csv'):
+    """A StreamingHttpResponse for one export; raises Http404 for unknown kinds"""
+    if kind not in EXPORTS:
+        raise Http404('Unknown export')
+    if export_format not in FORMATS:
+        export_format = 'csv'
+
+    columns, rows = export_rows(kind, params)
+    encode = csv_rows if export_format == 'csv' else ndjson_rows
+    response = StreamingHttpResponse(encode(columns, rows), content_type=FORMATS[export_format])
+    filename = f'{kind}-{timezone.localdate():%Y%m%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    # Let proxies pass chunks through instead of buffering the whole export
+    response['X-Accel-Buffering'] = 'no'
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,156 @@
+"""
+Keyset (cursor) pagination shared by the list views.
+
+Pages are addressed by an opaque, signed cursor holding the ordering values of
+the last (or first) row shown, so fetching any page is a single indexed range
+query of per_page + 1 rows regardless of how deep the user has paged.
+
+    page = paginate(request, Booking.objects.filter(...), ['-booking_date', '-id'])
+
+The ordering must end with a unique field (normally id) so every row has a
+distinct position. Filters already applied to the queryset keep working
+because the cursor only adds a range condition on top of them.
+"""
+import datetime
+from decimal import Decimal
+
+from django.core import signing
+from django.db.models import Q
+
+PAGE_SIZE = 25
+CURSOR_SALT = 'tour_operator.pagination'
+
+
+def _serialize(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def encode_cursor(values):
+    """Pack ordering values into an opaque URL-safe token"""
+    return signing.dumps([_serialize(value) for value in values], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token):
+    """Unpack a cursor token, returning None if it is missing or tampered with"""
+    if not token:
+        return None
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        return None
+    return values if isinstance(values, list) else None
+
+
+def _field_value(obj, path):
+    # Rows from .values() querysets are dicts keyed by the lookup path
+    if isinstance(obj, dict):
+        return obj[path]
+    for attr in path.split('__'):
+        obj = getattr(obj, attr)
+    return obj
+
+
+def keyset_filter(ordering, values, backwards=False):
+    """
+    Q object selecting the rows strictly after `values` in `ordering`, or
+    strictly before them when `backwards` is set.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        descending = field.startswith('-')
+        name = field.lstrip('-')
+        lookup = 'lt' if descending != backwards else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _reverse(ordering):
+    return [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+
+
+class CursorPage:
+    """One page of rows plus the cursors and query strings for its neighbours"""
+
+    def __init__(self, object_list, params, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.has_next = next_cursor is not None
+        self.has_previous = previous_cursor is not None
+        self.is_first = 'after' not in params and 'before' not in params
+        self._params = params
+
+    def _querystring(self, key, cursor):
+        params = self._params.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        params[key] = cursor
+        return params.urlencode()
+
+    @property
+    def next_querystring(self):
+        return self._querystring('after', self.next_cursor) if self.next_cursor else ''
+
+    @property
+    def previous_querystring(self):
+        return self._querystring('before', self.previous_cursor) if self.previous_cursor else ''
+
+    @property
+    def first_querystring(self):
+        params = self._params.copy()
+        params.pop('after', None)
+        params.pop('before', None)
+        return params.urlencode()
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def _cursor_for(obj, ordering):
+    return encode_cursor([_field_value(obj, field.lstrip('-')) for field in ordering])
+
+
+def paginate(request, queryset, ordering, per_page=PAGE_SIZE):
+    """Return the CursorPage of `queryset` selected by the request's after/before cursor"""
+    ordering = list(ordering)
+    after = decode_cursor(request.GET.get('after'))
+    before = None if after else decode_cursor(request.GET.get('before'))
+
+    rows = []
+    if before and len(before) == len(ordering):
+        rows = list(
+            queryset.filter(keyset_filter(ordering, before, backwards=True))
+            .order_by(*_reverse(ordering))[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        has_next = True
+    # Nothing comes before the cursor (it was already the first row): show the first page
+    if not rows:
+        if after and len(after) == len(ordering):
+            queryset = queryset.filter(keyset_filter(ordering, after))
+        else:
+            after = None
+        rows = list(queryset.order_by(*ordering)[:per_page + 1])
+        has_next = len(rows) > per_page
+        has_previous = after is not None
+        rows = rows[:per_page]
+
+    return CursorPage(
+        rows,
+        request.GET,
+        next_cursor=_cursor_for(rows[-1], ordering) if rows and has_next else None,
+        previous_cursor=_cursor_for(rows[0], ordering) if rows and has_previous else None,
+    )
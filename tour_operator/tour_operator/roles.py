@@ -0,0 +1,84 @@
+"""
+The signed-in user's guide and customer profiles, resolved once per request.
+
+RoleMiddleware gives every request lazy `request.guide` and
+`request.customer` attributes, in the manner of `request.user`: the
+user's Guide or Customer, or a falsy stand-in for None when they have no
+such profile. Nothing is queried until one is read, and each is read from
+the database at most once per request.
+
+The lookup is deliberately not cached across requests: the profiles decide
+what a user may do, and a cached answer would keep a removed guide's access
+alive in every worker process that had seen it.
+
+guide_required guards the guide pages and hands each view the real Guide
+as request.guide.
+"""
+from functools import wraps
+
+from django.contrib import messages
+from django.contrib.auth.decorators import login_required
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+
+from bookings.models import Customer
+from guides.models import Guide
+
+# request attribute -> profile model
+PROFILES = {'guide': Guide, 'customer': Customer}
+# Loaded with the profile, since the pages behind guide_required read it
+RELATED = {'guide': ('stats',)}
+
+
+def get_profile(request, name):
+    """The request user's `name` ('guide' or 'customer') profile or None, loaded once per request"""
+    resolved = request.__dict__.setdefault('_profiles', {})
+    if name in resolved:
+        return resolved[name]
+    profile = None
+    user = request.user
+    if user.is_authenticated:
+        profile = PROFILES[name].objects.select_related(*RELATED.get(name, ())).filter(user=user).first()
+        if profile is not None:
+            # The user is already loaded; spare the profile a query for it
+            profile.user = user
+    resolved[name] = profile
+    return profile
+
+
+def get_customer(request, create=False):
+    """The request user's Customer, created first when `create` is set and they have none"""
+    customer = get_profile(request, 'customer')
+    if customer is None and create:
+        customer, created = Customer.objects.get_or_create(user=request.user)
+        request._profiles['customer'] = request.customer = customer
+    return customer
+
+
+class RoleMiddleware:
+    """Adds lazy request.guide and request.customer; must come after AuthenticationMiddleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.guide = SimpleLazyObject(lambda: get_profile(request, 'guide'))
+        request.customer = SimpleLazyObject(lambda: get_profile(request, 'customer'))
+        return self.get_response(request)
+
+
+def guide_required(view):
+    """
+    Let only signed-in guides through, sending anyone else to the guide
+    login; the view finds the Guide itself (not the lazy wrapper) in
+    request.guide
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        guide = get_profile(request, 'guide')
+        if guide is None:
+            messages.error(request, 'Access denied.')
+            return redirect('guide_login')
+        request.guide = guide
+        return view(request, *args, **kwargs)
+    return login_required(wrapper)
@@ -0,0 +1,229 @@
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core import signing
+from django.core.cache import cache
+from django.test import RequestFactory, SimpleTestCase, TestCase
+
+from guides.models import Guide
+from tours.models import TourDate, TourPackage
+from . import counters, roles
+from .exports import csv_rows
+from .pagination import CURSOR_SALT, decode_cursor, encode_cursor, paginate
+
+ORDERING = ['price', 'id']
+
+
+class CursorTests(TestCase):
+    def test_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(['100.00', 7])), ['100.00', 7])
+
+    def test_tampered_cursors_are_ignored(self):
+        token = encode_cursor(['100.00', 7])
+        self.assertIsNone(decode_cursor(token[:-1] + ('A' if token[-1] != 'A' else 'B')))
+        self.assertIsNone(decode_cursor(signing.dumps(['100.00', 7], salt='another salt')))
+        self.assertIsNone(decode_cursor(signing.dumps({'id': 7}, salt=CURSOR_SALT)))
+        self.assertIsNone(decode_cursor('not a cursor'))
+        self.assertIsNone(decode_cursor(''))
+
+
+class PaginateTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        # Seven packages over three prices, so pages split runs of equal sort keys
+        for index, price in enumerate([200, 100, 100, 300, 100, 200, 100]):
+            TourPackage.objects.create(
+                name=f'Tour {index}', description='', duration=1, price=price, max_participants=10,
+                difficulty='easy', location='Test', included_services='', excluded_services='', itinerary='',
+            )
+        cls.ordered = list(TourPackage.objects.order_by(*ORDERING).values_list('pk', flat=True))
+
+    def page(self, **params):
+        request = RequestFactory().get('/', params)
+        return paginate(request, TourPackage.objects.all(), ORDERING, per_page=3)
+
+    def ids(self, page):
+        return [package.pk for package in page]
+
+    def test_pages_forward_through_ties(self):
+        seen = []
+        page = self.page()
+        self.assertFalse(page.has_previous)
+        while True:
+            seen.extend(self.ids(page))
+            if not page.has_next:
+                break
+            page = self.page(after=page.next_cursor)
+            self.assertTrue(page.has_previous)
+        self.assertEqual(seen, self.ordered)
+
+    def test_pages_backward_through_ties(self):
+        third = self.page(after=self.page(after=self.page().next_cursor).next_cursor)
+        self.assertEqual(self.ids(third), self.ordered[6:])
+
+        second = self.page(before=third.previous_cursor)
+        self.assertEqual(self.ids(second), self.ordered[3:6])
+        self.assertTrue(second.has_next)
+        self.assertTrue(second.has_previous)
+
+        first = self.page(before=second.previous_cursor)
+        self.assertEqual(self.ids(first), self.ordered[:3])
+        self.assertFalse(first.has_previous)
+        self.assertEqual(self.ids(self.page(after=first.next_cursor)), self.ordered[3:6])
+
+    def test_paging_back_past_the_first_page_shows_the_first_page(self):
+        first_row = TourPackage.objects.get(pk=self.ordered[0])
+        page = self.page(before=encode_cursor([first_row.price, first_row.pk]))
+        self.assertEqual(self.ids(page), self.ordered[:3])
+        self.assertFalse(page.has_previous)
+        self.assertTrue(page.has_next)
+
+    def test_tampered_cursor_shows_the_first_page(self):
+        cursor = self.page().next_cursor
+        page = self.page(after=cursor[:-2] + 'xx')
+        self.assertEqual(self.ids(page), self.ordered[:3])
+        self.assertFalse(page.has_previous)
+
+    def test_cursor_for_another_ordering_is_ignored(self):
+        page = self.page(after=encode_cursor([self.ordered[3]]))
+        self.assertEqual(self.ids(page), self.ordered[:3])
+
+
+class RoleTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('anna')
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def make_guide(self):
+        return Guide.objects.create(
+            user=self.user, phone='0', experience_years=1, languages='English', specializations='Hiking', bio='',
+        )
+
+    def test_a_new_guide_gets_in_on_the_next_request(self):
+        self.assertRedirects(self.client.get('/guides/dashboard/'), '/guides/login/', fetch_redirect_response=False)
+        self.make_guide()
+        self.assertEqual(self.client.get('/guides/dashboard/').status_code, 200)
+
+    def test_a_removed_guide_is_shut_out_at_once(self):
+        self.make_guide()
+        self.assertEqual(self.client.get('/guides/dashboard/').status_code, 200)
+        Guide.objects.filter(user=self.user).delete()
+        self.assertRedirects(self.client.get('/guides/dashboard/'), '/guides/login/', fetch_redirect_response=False)
+
+    def test_profiles_are_read_once_per_request(self):
+        guide = self.make_guide()
+        request = RequestFactory().get('/')
+        request.user = self.user
+        with self.assertNumQueries(1):
+            self.assertEqual(roles.get_profile(request, 'guide'), guide)
+            self.assertEqual(roles.get_profile(request, 'guide'), guide)
+        with self.assertNumQueries(1):
+            self.assertIsNone(roles.get_profile(request, 'customer'))
+            self.assertIsNone(roles.get_profile(request, 'customer'))
+
+
+class CsvExportTests(SimpleTestCase):
+    def test_formulas_are_neutralised(self):
+        rows = [(1, '=HYPERLINK("http://example.com")', '+1', '-2+3', '@SUM(A1)', 'fine', -5)]
+        lines = list(csv_rows(['id', 'a', 'b', 'c', 'd', 'e', 'f'], rows))
+        self.assertEqual(lines[1], '1,"\'=HYPERLINK(""http://example.com"")",\'+1,\'-2+3,\'@SUM(A1),fine,-5\r\n')
+
+
+class ConditionalApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.package = TourPackage.objects.create(
+            name='Alpine trek', description='', duration=2, price=100, max_participants=10, difficulty='easy',
+            location='Alps', included_services='', excluded_services='', itinerary='',
+        )
+
+    def test_unchanged_resources_are_not_modified(self):
+        for path in ['/api/v1/tours/', f'/api/v1/tours/{self.package.pk}/']:
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+            self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+
+    def test_adding_a_date_changes_the_package(self):
+        path = f'/api/v1/tours/{self.package.pk}/'
+        etag = self.client.get(path)['ETag']
+        start = date.today() + timedelta(days=30)
+        TourDate.objects.create(tour_package=self.package, start_date=start, end_date=start, available_spots=5)
+        response = self.client.get(path, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual([row['available_spots'] for row in response.json()['dates']], [5])
+
+    def test_deleting_a_package_changes_the_list(self):
+        etag = self.client.get('/api/v1/tours/')['ETag']
+        older = TourPackage.objects.create(
+            name='Lake cruise', description='', duration=1, price=50, max_participants=10, difficulty='easy',
+            location='Lakes', included_services='', excluded_services='', itinerary='',
+        )
+        etag_with_both = self.client.get('/api/v1/tours/')['ETag']
+        self.assertNotEqual(etag_with_both, etag)
+        # Removing a package that is not the newest leaves Max(updated_at) alone; the count still changes
+        TourPackage.objects.filter(pk=older.pk).update(updated_at=self.package.updated_at - timedelta(days=1))
+        etag_with_both = self.client.get('/api/v1/tours/')['ETag']
+        older.delete()
+        self.assertEqual(self.client.get('/api/v1/tours/', HTTP_IF_NONE_MATCH=etag_with_both).status_code, 200)
+
+    def test_fields_narrow_the_body(self):
+        response = self.client.get('/api/v1/tours/', {'fields': 'name,nonsense'})
+        self.assertEqual(response.json()['results'], [{'id': self.package.pk, 'name': 'Alpine trek'}])
+        self.assertEqual(self.client.get('/api/v1/tours/0/').status_code, 404)
+
+
+class CounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create_package(self, name, **fields):
+        return TourPackage.objects.create(
+            name=name, description='', duration=1, price=100, max_participants=10, difficulty='easy',
+            location='Test', included_services='', excluded_services='', itinerary='', **fields
+        )
+
+    def test_counters_follow_saves_and_deletes(self):
+        self.assertEqual(counters.get_counters()['tours'], {'total': 0, 'active': 0})
+        # A bulk write skips the signals, so the cached counters do not see it...
+        TourPackage.objects.bulk_create([TourPackage(
+            name='Bulk', description='', duration=1, price=100, max_participants=10, difficulty='easy',
+            location='Test', included_services='', excluded_services='', itinerary='',
+        )])
+        self.assertEqual(counters.get_counters()['tours'], {'total': 0, 'active': 0})
+        # ...while a save adds one to them rather than recounting
+        with self.captureOnCommitCallbacks(execute=True):
+            package = self.create_package('Alpine trek')
+        self.assertEqual(counters.get_counters()['tours'], {'total': 1, 'active': 1})
+
+        # An edit that may move the row between counters recounts the group
+        with self.captureOnCommitCallbacks(execute=True):
+            package.is_active = False
+            package.save()
+        self.assertEqual(counters.get_counters()['tours'], {'total': 2, 'active': 1})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            package.delete()
+        self.assertEqual(counters.get_counters()['tours'], {'total': 1, 'active': 1})
+
+    def test_increments_wait_for_the_commit(self):
+        counters.get_counters()
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self.create_package('Alpine trek')
+        self.assertTrue(callbacks)
+        # Until the transaction commits the cached counters stay as they were
+        self.assertEqual(counters.get_counters()['tours']['total'], 0)
+
+    def test_large_tables_are_estimated(self):
+        self.create_package('Alpine trek')
+        with mock.patch.object(counters, 'estimates', return_value={TourPackage: 2_000_000}):
+            result = counters.get_counters()
+        self.assertEqual(result['tours']['total'], 2_000_000)
+        self.assertEqual(result['approximate'], {'tours'})
+        # The estimate is cached along with its flag
+        self.assertEqual(counters.get_counters()['approximate'], {'tours'})
@@ -0,0 +1,19 @@
+"""
+Remembering what the signal-maintained totals last counted for a row.
+
+GuideStats (guides.stats) and the feedback rollups (feedback.rollups)
+update their totals from the change between a row's old and new values. Models mix in CountedFields and
+list the fields those totals depend on in COUNTED_FIELDS. A loaded row
+keeps its values in `_counted`, and the post_save handlers reset that after
+counting, so a later save counts only what changed since.
+"""
+
+
+class CountedFields:
+    COUNTED_FIELDS = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._counted = {name: value for name, value in zip(field_names, values) if name in cls.COUNTED_FIELDS}
+        return instance
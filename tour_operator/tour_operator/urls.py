@@ -14,17 +14,21 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 from tours.views import home
 from .auth_views import signup
+from . import api
 from .admin_views import (
     admin_login, admin_dashboard, admin_tour_list, admin_create_tour,
     admin_edit_tour, admin_tour_dates, admin_bookings, admin_booking_detail,
     admin_custom_requests, admin_process_custom_request, admin_logout,
     admin_guides, admin_create_guide, admin_edit_guide, admin_guide_detail,
     admin_guide_availability, admin_assign_guide, admin_feedback,
-    admin_feedback_detail, admin_guide_feedback
+    admin_feedback_detail, admin_guide_feedback, admin_export, admin_bulk_bookings,
+    admin_auto_assign
 )
 
 urlpatterns = [
@@ -37,6 +41,14 @@ urlpatterns = [
     path('accounts/signup/', signup, name='signup'),
     path('accounts/', include('django.contrib.auth.urls')),
 
+    # Read-only catalog API
+    path('api/v1/tours/', api.package_list, name='api_package_list'),
+    path('api/v1/tours/<int:tour_id>/', api.package_detail, name='api_package_detail'),
+    path('api/v1/tours/<int:tour_id>/dates/', api.package_dates, name='api_package_dates'),
+    path('api/v1/tours/<int:tour_id>/images/', api.package_images, name='api_package_images'),
+    path('api/v1/guides/', api.guide_list, name='api_guide_list'),
+    path('api/v1/guides/<int:guide_id>/', api.guide_detail, name='api_guide_detail'),
+
     # Custom admin URLs
     path('tour-admin/', admin_login, name='admin_login'),
     path('tour-admin/dashboard/', admin_dashboard, name='admin_dashboard'),
@@ -46,6 +58,8 @@ urlpatterns = [
     path('tour-admin/tours/<int:tour_id>/edit/', admin_edit_tour, name='admin_edit_tour'),
     path('tour-admin/tours/<int:tour_id>/dates/', admin_tour_dates, name='admin_tour_dates'),
     path('tour-admin/bookings/', admin_bookings, name='admin_bookings'),
+    path('tour-admin/bookings/bulk/', admin_bulk_bookings, name='admin_bulk_bookings'),
+    path('tour-admin/bookings/auto-assign/', admin_auto_assign, name='admin_auto_assign'),
     path('tour-admin/bookings/<int:booking_id>/', admin_booking_detail, name='admin_booking_detail'),
     path('tour-admin/custom-requests/', admin_custom_requests, name='admin_custom_requests'),
     path('tour-admin/custom-requests/<int:request_id>/process/', admin_process_custom_request, name='admin_process_custom_request'),
@@ -62,4 +76,10 @@ urlpatterns = [
     path('tour-admin/feedback/', admin_feedback, name='admin_feedback'),
     path('tour-admin/feedback/<int:feedback_id>/', admin_feedback_detail, name='admin_feedback_detail'),
     path('tour-admin/guide-feedback/', admin_guide_feedback, name='admin_guide_feedback'),
+
+    # Streaming CSV / NDJSON exports
+    path('tour-admin/export/<slug:kind>/', admin_export, name='admin_export'),
 ]
+
+# Serve generated media in development; production serves MEDIA_ROOT directly
+urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import TourPackage, TourDate
+from .models import TourPackage, TourDate, TourAvailability
 
 @admin.register(TourPackage)
 class TourPackageAdmin(admin.ModelAdmin):
@@ -10,7 +10,15 @@ class TourPackageAdmin(admin.ModelAdmin):
 
 @admin.register(TourDate)
 class TourDateAdmin(admin.ModelAdmin):
-    list_display = ['tour_package', 'start_date', 'end_date', 'available_spots', 'is_available']
+    list_display = ['tour_package', 'start_date', 'end_date', 'capacity', 'available_spots', 'is_available']
     list_filter = ['is_available', 'start_date']
     search_fields = ['tour_package__name']
-    list_editable = ['available_spots', 'is_available']
+    # available_spots follows capacity through bookings and the reconcile_seats command
+    list_editable = ['capacity', 'is_available']
+
+
+@admin.register(TourAvailability)
+class TourAvailabilityAdmin(admin.ModelAdmin):
+    list_display = ['package', 'next_departure', 'seats_left', 'upcoming_departures', 'is_sold_out', 'updated_at']
+    list_filter = ['is_sold_out']
+    search_fields = ['package__name']
@@ -0,0 +1,82 @@
+"""
+Maintenance of the TourAvailability summary table.
+
+refresh_availability() recomputes one package's row with a single aggregate
+over its dates; the signals in tours.signals call it whenever a TourDate or
+TourPackage is saved or deleted, which covers dates added in the admin and
+seats taken by bookings. rebuild_availability() replaces the whole table
+with one INSERT ... SELECT.
+
+A date counts when it starts today or later and is marked available. Tour
+dates carry no price of their own, so min_price mirrors the package price;
+it lives here so listing queries can sort on one table.
+"""
+from datetime import date
+
+from django.db import connection, transaction
+from django.db.models import Count, Min, Q, Sum
+
+from .models import TourAvailability, TourDate, TourPackage
+
+
+def _upcoming(today):
+    return Q(start_date__gte=today, is_available=True)
+
+
+def refresh_availability(package_id, today=None):
+    """Recompute the availability row of one package"""
+    today = today or date.today()
+    package = TourPackage.objects.filter(pk=package_id).values('price').first()
+    if package is None:
+        return None
+
+    with_seats = Q(available_spots__gt=0)
+    summary = TourDate.objects.filter(_upcoming(today), tour_package_id=package_id).aggregate(
+        next_departure=Min('start_date', filter=with_seats),
+        seats_left=Sum('available_spots', filter=with_seats),
+        upcoming_departures=Count('id'),
+    )
+    seats_left = summary['seats_left'] or 0
+    values = {
+        'next_departure': summary['next_departure'],
+        'seats_left': seats_left,
+        'upcoming_departures': summary['upcoming_departures'],
+        'min_price': package['price'],
+        'is_sold_out': summary['upcoming_departures'] > 0 and seats_left == 0,
+    }
+    # A plain UPDATE first: unlike update_or_create() it takes no read lock
+    # before writing, so concurrent refreshes queue instead of deadlocking
+    if not TourAvailability.objects.filter(package_id=package_id).update(**values):
+        TourAvailability.objects.get_or_create(package_id=package_id, defaults=values)
+
+
+def rebuild_availability(today=None):
+    """Rebuild the summary for every package in one set-based pass; returns the row count"""
+    today = today or date.today()
+    availability = TourAvailability._meta.db_table
+    package = TourPackage._meta.db_table
+    tour_date = TourDate._meta.db_table
+
+    upcoming = 'd.start_date >= %s AND d.is_available'
+    with_seats = f'{upcoming} AND d.available_spots > 0'
+    sql = (
+        f"INSERT INTO {availability} "
+        f"(package_id, next_departure, seats_left, upcoming_departures, min_price, is_sold_out, updated_at) "
+        f"SELECT p.id, "
+        f"MIN(CASE WHEN {with_seats} THEN d.start_date END), "
+        f"COALESCE(SUM(CASE WHEN {with_seats} THEN d.available_spots END), 0), "
+        f"COUNT(CASE WHEN {upcoming} THEN d.id END), "
+        f"p.price, "
+        f"COUNT(CASE WHEN {upcoming} THEN d.id END) > 0 "
+        f"AND COALESCE(SUM(CASE WHEN {with_seats} THEN d.available_spots END), 0) = 0, "
+        f"CURRENT_TIMESTAMP "
+        f"FROM {package} p LEFT JOIN {tour_date} d ON d.tour_package_id = p.id "
+        f"GROUP BY p.id, p.price"
+    )
+    params = [today] * 5
+
+    with transaction.atomic():
+        TourAvailability.objects.all().delete()
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.rowcount
@@ -0,0 +1,178 @@
+"""
+Responsive image pipeline for TourImage.
+
+Each remote image is fetched once, resized to several widths in WebP and
+JPEG plus a tiny LQIP placeholder, and written to default_storage (under
+MEDIA_ROOT, static/media) with names derived from the source content hash:
+
+    tours/3f/3fa9c1...-640.webp
+
+TourImage.variants records the result and TourPackage.primary_image_variants
+mirrors it for the primary image; the tour_images template tags turn it
+into srcset attributes. Images whose URL was already processed reuse the
+stored variants without another download.
+
+Fetching goes through a pluggable fetcher, TOUR_IMAGE_FETCHER (a dotted path,
+HTTPFetcher by default; LocalFileFetcher reads files under
+TOUR_IMAGE_LOCAL_ROOT for tests and offline use). Decoding and encoding run
+in a process pool of TOUR_IMAGE_WORKERS processes. schedule_processing()
+hands the work to a background thread after the transaction commits, so
+admin requests never wait on it; process_images() does the same work inline
+and backs the process_tour_images command.
+"""
+import hashlib
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from urllib.parse import urlparse
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils.module_loading import import_string
+
+from tour_operator import catalog_cache
+from .models import TourImage, TourPackage
+from .thumbnails import render_variants
+
+logger = logging.getLogger(__name__)
+
+MAX_SOURCE_BYTES = 20 * 1024 * 1024
+STORAGE_PREFIX = 'tours'
+
+
+class HTTPFetcher:
+    """Download images over HTTP(S)"""
+    timeout = 20
+
+    def fetch(self, url):
+        request = Request(url, headers={'User-Agent': 'tour-operator-image-pipeline'})
+        with urlopen(request, timeout=self.timeout) as response:
+            data = response.read(MAX_SOURCE_BYTES + 1)
+        if len(data) > MAX_SOURCE_BYTES:
+            raise ValueError(f'{url} is larger than {MAX_SOURCE_BYTES} bytes')
+        return data
+
+
+class LocalFileFetcher:
+    """Read images from a local directory, using the URL path as the file path"""
+
+    def __init__(self, root=None):
+        self.root = Path(root or settings.TOUR_IMAGE_LOCAL_ROOT).resolve()
+
+    def fetch(self, url):
+        path = (self.root / urlparse(url).path.lstrip('/')).resolve()
+        if self.root not in path.parents:
+            raise ValueError(f'{url} resolves outside {self.root}')
+        return path.read_bytes()
+
+
+def get_fetcher():
+    return import_string(getattr(settings, 'TOUR_IMAGE_FETCHER', 'tours.image_pipeline.HTTPFetcher'))()
+
+
+_process_pool = None
+_dispatcher = None
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # Spawned rather than forked: workers must not inherit the parent's
+        # database connections or server threads
+        _process_pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'TOUR_IMAGE_WORKERS', None),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _process_pool
+
+
+def _get_dispatcher():
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='tour-images')
+    return _dispatcher
+
+
+def _store(digest, rendered):
+    """Write rendered files to storage and return the variants mapping"""
+    variants = {
+        'source': digest,
+        'width': rendered['width'],
+        'height': rendered['height'],
+        'lqip': rendered['lqip'],
+    }
+    for image_format, width, content in rendered['files']:
+        name = f'{STORAGE_PREFIX}/{digest[:2]}/{digest}-{width}.{image_format}'
+        # Content-hashed names never change meaning, so existing files are final
+        if not default_storage.exists(name):
+            default_storage.save(name, ContentFile(content))
+        variants.setdefault(image_format, []).append([width, name])
+    return variants
+
+
+def process_images(image_ids):
+    """Generate variants for the given TourImage ids; returns the number updated"""
+    images = list(TourImage.objects.filter(pk__in=image_ids).only('id', 'tour_package_id', 'image_url', 'variants'))
+    by_url = {}
+    for image in images:
+        by_url.setdefault(image.image_url, []).append(image)
+
+    # URLs processed before (for this or another tour) need no download
+    known = {}
+    for url, variants in TourImage.objects.filter(image_url__in=by_url).exclude(variants={}).values_list('image_url', 'variants'):
+        known.setdefault(url, variants)
+
+    fetcher = get_fetcher()
+    pending = {}
+    for url in by_url:
+        if url in known:
+            continue
+        try:
+            data = fetcher.fetch(url)
+        except Exception:
+            logger.warning('Could not fetch tour image %s', url, exc_info=True)
+            continue
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        pending[url] = (digest, _get_process_pool().submit(render_variants, data))
+
+    for url, (digest, future) in pending.items():
+        try:
+            known[url] = _store(digest, future.result())
+        except Exception:
+            logger.warning('Could not process tour image %s', url, exc_info=True)
+
+    updated = []
+    for url, variants in known.items():
+        for image in by_url[url]:
+            if image.variants != variants:
+                image.variants = variants
+                updated.append(image)
+    TourImage.objects.bulk_update(updated, ['variants'], batch_size=500)
+
+    package_ids = {image.tour_package_id for image in updated}
+    for package in TourPackage.objects.filter(pk__in=package_ids):
+        package.refresh_primary_image()
+        catalog_cache.bump('tours', f'tour:{package.pk}')
+    return len(updated)
+
+
+def _process_in_background(image_ids):
+    try:
+        process_images(image_ids)
+    except Exception:
+        logger.exception('Tour image processing failed')
+    finally:
+        # The dispatcher thread's connection is never reused by a request
+        connection.close()
+
+
+def schedule_processing(image_ids):
+    """Process images in the background once the current transaction commits"""
+    image_ids = list(image_ids)
+    if not image_ids:
+        return
+    transaction.on_commit(lambda: _get_dispatcher().submit(_process_in_background, image_ids))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from tours.image_pipeline import process_images
+from tours.models import TourImage
+
+
+class Command(BaseCommand):
+    help = 'Generate responsive variants for tour images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Reprocess every image, not only missing ones')
+
+    def handle(self, *args, **options):
+        images = TourImage.objects.all()
+        if not options['all']:
+            images = images.filter(variants={})
+        image_ids = list(images.values_list('id', flat=True))
+        if options['all']:
+            TourImage.objects.filter(id__in=image_ids).update(variants={})
+        count = process_images(image_ids)
+        self.stdout.write(self.style.SUCCESS(f'Processed {count} of {len(image_ids)} tour images'))
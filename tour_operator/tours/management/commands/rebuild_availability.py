@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from tours.availability import rebuild_availability
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the per-package availability summary from tour dates'
+
+    def handle(self, *args, **options):
+        count = rebuild_availability()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt availability for {count} tour packages'))
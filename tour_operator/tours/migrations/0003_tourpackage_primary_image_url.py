@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 08:54
+
+from django.db import migrations, models
+
+
+def backfill_primary_image_url(apps, schema_editor):
+    TourPackage = apps.get_model('tours', 'TourPackage')
+    TourImage = apps.get_model('tours', 'TourImage')
+
+    # Images ordered so the first one seen per tour is the one to keep
+    primary_urls = {}
+    images = TourImage.objects.order_by('tour_package_id', '-is_primary', 'display_order', 'created_at')
+    for tour_package_id, image_url in images.values_list('tour_package_id', 'image_url'):
+        primary_urls.setdefault(tour_package_id, image_url)
+
+    tours = list(TourPackage.objects.filter(id__in=primary_urls))
+    for tour in tours:
+        tour.primary_image_url = primary_urls[tour.id]
+    TourPackage.objects.bulk_update(tours, ['primary_image_url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0002_tourimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourpackage',
+            name='primary_image_url',
+            field=models.URLField(blank=True, help_text='Denormalized URL of the primary image', max_length=500),
+        ),
+        migrations.RunPython(backfill_primary_image_url, migrations.RunPython.noop),
+    ]
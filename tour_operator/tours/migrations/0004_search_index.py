@@ -0,0 +1,55 @@
+from django.db import migrations
+
+SQLITE_CREATE = """
+CREATE VIRTUAL TABLE tours_tourpackage_fts USING fts5(
+    name, description, location, itinerary, included_services,
+    tokenize = 'unicode61 remove_diacritics 2',
+    prefix = '2 3'
+)
+"""
+
+SQLITE_FILL = """
+INSERT INTO tours_tourpackage_fts (rowid, name, description, location, itinerary, included_services)
+SELECT id, name, description, location, itinerary, included_services FROM tours_tourpackage
+"""
+
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(location, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(included_services, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(itinerary, '')), 'C')"
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(SQLITE_CREATE)
+        schema_editor.execute(SQLITE_FILL)
+    elif vendor == 'postgresql':
+        schema_editor.execute("ALTER TABLE tours_tourpackage ADD COLUMN search_vector tsvector")
+        schema_editor.execute(f"UPDATE tours_tourpackage SET search_vector = {PG_SEARCH_VECTOR}")
+        schema_editor.execute(
+            "CREATE INDEX tours_tourpackage_search_idx ON tours_tourpackage USING GIN (search_vector)"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS tours_tourpackage_fts")
+    elif vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS tours_tourpackage_search_idx")
+        schema_editor.execute("ALTER TABLE tours_tourpackage DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0003_tourpackage_primary_image_url'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
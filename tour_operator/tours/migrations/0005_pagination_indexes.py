@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0004_search_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(fields=['created_at', 'id'], name='tourpackage_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0005_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='tourpackage',
+            index=models.Index(fields=['updated_at'], name='tourpackage_updated_idx'),
+        ),
+    ]
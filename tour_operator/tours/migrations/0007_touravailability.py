@@ -0,0 +1,57 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+from datetime import date
+from django.db.models import Count, Min, Q, Sum
+
+
+def backfill_availability(apps, schema_editor):
+    TourPackage = apps.get_model('tours', 'TourPackage')
+    TourAvailability = apps.get_model('tours', 'TourAvailability')
+
+    upcoming = Q(tour_dates__start_date__gte=date.today(), tour_dates__is_available=True)
+    with_seats = upcoming & Q(tour_dates__available_spots__gt=0)
+    packages = TourPackage.objects.annotate(
+        next_departure=Min('tour_dates__start_date', filter=with_seats),
+        seats_left=Sum('tour_dates__available_spots', filter=with_seats),
+        upcoming_departures=Count('tour_dates', filter=upcoming),
+    )
+    TourAvailability.objects.bulk_create([
+        TourAvailability(
+            package_id=package.id,
+            next_departure=package.next_departure,
+            seats_left=package.seats_left or 0,
+            upcoming_departures=package.upcoming_departures,
+            min_price=package.price,
+            is_sold_out=package.upcoming_departures > 0 and not package.seats_left,
+        )
+        for package in packages
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0006_tourpackage_updated_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourAvailability',
+            fields=[
+                ('package', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='availability', serialize=False, to='tours.tourpackage')),
+                ('next_departure', models.DateField(blank=True, help_text='Earliest upcoming date with seats left', null=True)),
+                ('seats_left', models.IntegerField(default=0, help_text='Seats left across all upcoming dates')),
+                ('upcoming_departures', models.IntegerField(default=0, help_text='Number of upcoming bookable dates')),
+                ('min_price', models.DecimalField(decimal_places=2, default=0, max_digits=10)),
+                ('is_sold_out', models.BooleanField(default=False)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'tour availability',
+                'indexes': [models.Index(fields=['next_departure', 'package'], name='availability_departure_idx'), models.Index(fields=['is_sold_out', 'next_departure'], name='availability_soldout_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_availability, migrations.RunPython.noop),
+    ]
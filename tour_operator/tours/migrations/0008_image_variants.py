@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 09:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0007_touravailability'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Generated responsive variants, see tours.image_pipeline'),
+        ),
+        migrations.AddField(
+            model_name='tourpackage',
+            name='primary_image_variants',
+            field=models.JSONField(blank=True, default=dict, help_text='Denormalized responsive variants of the primary image'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 4.2.30 on 2026-10-18 10:02
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_capacity(apps, schema_editor):
+    """
+    Until now book_tour took seats for every booking and nothing gave them
+    back, so a date's capacity is its free seats plus the participants of
+    all its bookings, cancelled ones included, plus seats held in forms.
+    """
+    TourDate = apps.get_model('tours', 'TourDate')
+    Booking = apps.get_model('bookings', 'Booking')
+    SeatHold = apps.get_model('bookings', 'SeatHold')
+
+    def seats(model, field):
+        per_date = model.objects.filter(tour_date=OuterRef('pk')).values('tour_date').annotate(
+            total=Sum(field)
+        ).values('total')
+        return Coalesce(Subquery(per_date), Value(0))
+
+    TourDate.objects.update(
+        capacity=models.F('available_spots') + seats(Booking, 'participants') + seats(SeatHold, 'seats')
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_seathold'),
+        ('tours', '0008_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tourdate',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_capacity, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tourdate',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Total seats; available_spots is this minus booked and held seats (see bookings.reconcile)'),
+        ),
+    ]
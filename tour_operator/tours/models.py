@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Value, When
 from django.contrib.auth.models import User
+from django.utils import timezone
+from tour_operator import catalog_cache
 
 class TourPackage(models.Model):
     DIFFICULTY_CHOICES = [
@@ -19,41 +22,145 @@ class TourPackage(models.Model):
     excluded_services = models.TextField()
     itinerary = models.TextField()
     is_active = models.BooleanField(default=True)
+    primary_image_url = models.URLField(max_length=500, blank=True, help_text="Denormalized URL of the primary image")
+    primary_image_variants = models.JSONField(default=dict, blank=True, help_text="Denormalized responsive variants of the primary image")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='tourpackage_created_idx'),
+            models.Index(fields=['updated_at'], name='tourpackage_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
     def get_primary_image(self):
         """Get the primary image for this tour"""
-        primary_image = self.images.filter(is_primary=True).first()
-        if primary_image:
-            return primary_image.image_url
-        # If no primary image, return the first image
-        first_image = self.images.first()
-        return first_image.image_url if first_image else None
+        return self.primary_image_url or None
+
+    def refresh_primary_image(self):
+        """Recompute primary_image_url from the gallery"""
+        # Primary image first, otherwise the first image in display order
+        image = self.images.order_by('-is_primary', 'display_order', 'created_at').first()
+        self.primary_image_url = image.image_url if image else ''
+        self.primary_image_variants = image.variants if image else {}
+        TourPackage.objects.filter(pk=self.pk).update(
+            primary_image_url=self.primary_image_url,
+            primary_image_variants=self.primary_image_variants,
+            updated_at=timezone.now(),
+        )
 
     def get_all_images(self):
         """Get all images for this tour ordered by display_order"""
         return self.images.all()
 
+    @transaction.atomic
+    def sync_images(self, entries):
+        """
+        Make the gallery match `entries`, a list of dicts with image_url,
+        caption, display_order and is_primary, in a fixed number of queries.
+
+        Existing rows are matched by URL and keep their ids and generated
+        variants; only new URLs are inserted and only missing ones deleted.
+        Returns the newly created TourImage rows.
+        """
+        existing = {}
+        for image in self.images.all():
+            existing.setdefault(image.image_url, []).append(image)
+
+        to_create, to_update = [], []
+        primary = None
+        for entry in entries:
+            matches = existing.get(entry['image_url'])
+            if matches:
+                image = matches.pop(0)
+                if (image.caption, image.display_order) != (entry['caption'], entry['display_order']):
+                    image.caption = entry['caption']
+                    image.display_order = entry['display_order']
+                    to_update.append(image)
+            else:
+                image = TourImage(
+                    tour_package=self,
+                    image_url=entry['image_url'],
+                    caption=entry['caption'],
+                    display_order=entry['display_order'],
+                )
+                to_create.append(image)
+            if entry['is_primary']:
+                primary = image
+        stale = [image.pk for images in existing.values() for image in images]
+
+        # Only removed images fire their delete signals; the bulk writes
+        # skip TourImage.save(), so the primary image and cache versions
+        # are refreshed once below
+        if stale:
+            TourImage.objects.filter(pk__in=stale).delete()
+        TourImage.objects.bulk_create(to_create)
+        TourImage.objects.bulk_update(to_update, ['caption', 'display_order'], batch_size=500)
+        if primary is not None:
+            self.images.update(is_primary=Case(When(pk=primary.pk, then=Value(True)), default=Value(False)))
+        else:
+            self.images.update(is_primary=False)
+
+        self.refresh_primary_image()
+        catalog_cache.bump('tours', f'tour:{self.pk}')
+        return to_create
+
 class TourDate(models.Model):
     tour_package = models.ForeignKey(TourPackage, on_delete=models.CASCADE, related_name='tour_dates')
     start_date = models.DateField()
     end_date = models.DateField()
     available_spots = models.IntegerField()
+    capacity = models.PositiveIntegerField(
+        blank=True,
+        help_text="Total seats; available_spots is this minus booked and held seats (see bookings.reconcile)"
+    )
     is_available = models.BooleanField(default=True)
 
+    def save(self, *args, **kwargs):
+        # A new date starts with every seat free
+        if self.capacity is None:
+            self.capacity = self.available_spots
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.tour_package.name} - {self.start_date} to {self.end_date}"
 
+class TourAvailability(models.Model):
+    """
+    Per-package availability summary, maintained by tours.availability.
+
+    Only future, bookable dates count. Rows are refreshed whenever a
+    TourDate or TourPackage changes and rebuilt in bulk by the
+    rebuild_availability command (run daily so past departures drop off).
+    """
+    package = models.OneToOneField(TourPackage, on_delete=models.CASCADE, primary_key=True, related_name='availability')
+    next_departure = models.DateField(null=True, blank=True, help_text="Earliest upcoming date with seats left")
+    seats_left = models.IntegerField(default=0, help_text="Seats left across all upcoming dates")
+    upcoming_departures = models.IntegerField(default=0, help_text="Number of upcoming bookable dates")
+    min_price = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    is_sold_out = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = 'tour availability'
+        indexes = [
+            models.Index(fields=['next_departure', 'package'], name='availability_departure_idx'),
+            models.Index(fields=['is_sold_out', 'next_departure'], name='availability_soldout_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.package.name} - {self.seats_left} seats left"
+
 class TourImage(models.Model):
     tour_package = models.ForeignKey(TourPackage, on_delete=models.CASCADE, related_name='images')
     image_url = models.URLField(max_length=500, help_text="URL of the tour image")
     caption = models.CharField(max_length=200, blank=True, help_text="Optional image caption")
     is_primary = models.BooleanField(default=False, help_text="Set as primary/featured image")
     display_order = models.PositiveIntegerField(default=0, help_text="Order in which images are displayed")
+    variants = models.JSONField(default=dict, blank=True, help_text="Generated responsive variants, see tours.image_pipeline")
     created_at = models.DateTimeField(auto_now_add=True)
 
     class Meta:
@@ -67,3 +174,9 @@ class TourImage(models.Model):
         if self.is_primary:
             TourImage.objects.filter(tour_package=self.tour_package, is_primary=True).update(is_primary=False)
         super().save(*args, **kwargs)
+        self.tour_package.refresh_primary_image()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.tour_package.refresh_primary_image()
+        return result
@@ -0,0 +1,251 @@
+"""
+Full-text catalog search over TourPackage.
+
+SQLite databases use an FTS5 table (tours_tourpackage_fts) keyed by the package
+id, PostgreSQL databases use a weighted tsvector column with a GIN index. Both
+are created by migration 0004 and kept current by the signals in tours.signals.
+
+search_packages() returns the ranked page of packages together with facet
+counts for difficulty, price band and duration bucket. The page of ids and a
+small facet cube come back from a single SQL statement; the page of packages
+is then loaded with one in_bulk() query.
+"""
+import re
+
+from django.db import connection
+
+from .models import TourPackage
+
+FTS_TABLE = 'tours_tourpackage_fts'
+AVAILABILITY_TABLE = 'tours_touravailability'
+INDEXED_FIELDS = ['name', 'description', 'location', 'itinerary', 'included_services']
+
+# bm25() column weights, in INDEXED_FIELDS order
+FTS_WEIGHTS = '10.0, 2.0, 5.0, 1.0, 1.0'
+
+PG_SEARCH_VECTOR = (
+    "setweight(to_tsvector('english', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(location, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(included_services, '')), 'C') || "
+    "setweight(to_tsvector('english', coalesce(itinerary, '')), 'C')"
+)
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = [
+    ('under-500', 'Under ₹500', None, 500),
+    ('500-1000', '₹500 - ₹1,000', 500, 1000),
+    ('1000-2000', '₹1,000 - ₹2,000', 1000, 2000),
+    ('2000-plus', '₹2,000+', 2000, None),
+]
+
+DURATION_BUCKETS = [
+    ('1-3', '1-3 days', None, 4),
+    ('4-7', '4-7 days', 4, 8),
+    ('8-14', '8-14 days', 8, 15),
+    ('15-plus', '15+ days', 15, None),
+]
+
+SORT_OPTIONS = [
+    ('relevance', 'Best match'),
+    ('departure', 'Next departure'),
+]
+
+
+def _bucket_case(column, buckets):
+    """SQL CASE expression mapping a numeric column to its bucket key"""
+    whens = []
+    for key, label, lower, upper in buckets:
+        if upper is not None:
+            whens.append(f"WHEN {column} < {upper} THEN '{key}'")
+        else:
+            whens.append(f"ELSE '{key}'")
+    return 'CASE ' + ' '.join(whens) + ' END'
+
+
+def _fts_match_expression(query):
+    """Turn free text into an FTS5 expression: every word, prefix matched"""
+    words = re.findall(r'\w+', query)
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _departure_score():
+    """Score ranking packages by next departure, those without one last"""
+    if connection.vendor == 'sqlite':
+        return 'COALESCE(julianday(a.next_departure), 1e9)'
+    if connection.vendor == 'postgresql':
+        return "CAST(COALESCE(a.next_departure - DATE '1970-01-01', 1000000000) AS DOUBLE PRECISION)"
+    return 'CAST(0 AS DOUBLE PRECISION)'
+
+
+def _hits_sql(query, sort='relevance', available_only=False):
+    """SELECT producing (id, score, difficulty, price_band, duration_bucket) for matching active packages"""
+    columns = (
+        f"p.id AS id, {{score}} AS score, p.difficulty AS difficulty, "
+        f"{_bucket_case('p.price', PRICE_BANDS)} AS price_band, "
+        f"{_bucket_case('p.duration', DURATION_BUCKETS)} AS duration_bucket"
+    )
+    # The availability summary supplies the departure sort and filter
+    join = f'LEFT JOIN {AVAILABILITY_TABLE} a ON a.package_id = p.id'
+    where = 'p.is_active AND a.next_departure IS NOT NULL' if available_only else 'p.is_active'
+    unranked = _departure_score() if sort == 'departure' else 'CAST(0 AS DOUBLE PRECISION)'
+
+    if not query:
+        return f"SELECT {columns.format(score=unranked)} FROM tours_tourpackage p {join} WHERE {where}", []
+
+    if connection.vendor == 'sqlite':
+        match = _fts_match_expression(query)
+        if not match:
+            return _hits_sql('', sort, available_only)
+        score = _departure_score() if sort == 'departure' else f'bm25({FTS_TABLE}, {FTS_WEIGHTS})'
+        return (
+            f"SELECT {columns.format(score=score)} FROM {FTS_TABLE} "
+            f"JOIN tours_tourpackage p ON p.id = {FTS_TABLE}.rowid {join} "
+            f"WHERE {FTS_TABLE} MATCH %s AND {where}"
+        ), [match]
+
+    if connection.vendor == 'postgresql':
+        # Lower scores rank first on every backend, so negate ts_rank
+        score = _departure_score() if sort == 'departure' else 'CAST(-ts_rank(p.search_vector, q.query) AS DOUBLE PRECISION)'
+        return (
+            f"SELECT {columns.format(score=score)} FROM tours_tourpackage p "
+            f"CROSS JOIN websearch_to_tsquery('english', %s) AS q(query) {join} "
+            f"WHERE p.search_vector @@ q.query AND {where}"
+        ), [query]
+
+    # Other backends have no index; fall back to substring matching
+    like = f'%{query}%'
+    conditions = ' OR '.join(f'p.{field} LIKE %s' for field in INDEXED_FIELDS)
+    return (
+        f"SELECT {columns.format(score=unranked)} FROM tours_tourpackage p {join} "
+        f"WHERE {where} AND ({conditions})"
+    ), [like] * len(INDEXED_FIELDS)
+
+
+def search_packages(query='', difficulty=None, price_band=None, duration=None, limit=None, after=None,
+                    sort='relevance', available_only=False):
+    """
+    Search active tour packages.
+
+    Returns a dict with the ranked 'results' (TourPackage instances), the
+    'total' number of matches, 'facets' for difficulty/price/duration and
+    'next_after', the (score, id) key to pass as `after` for the next page.
+    `sort` is 'relevance' or 'departure'; `available_only` keeps packages
+    with an upcoming departure that still has seats.
+    Facet counts are disjunctive: each facet ignores its own filter so the
+    other options stay visible.
+    """
+    query = (query or '').strip()
+    difficulty = difficulty if difficulty in dict(TourPackage.DIFFICULTY_CHOICES) else None
+    price_band = price_band if price_band in dict((b[0], b) for b in PRICE_BANDS) else None
+    duration = duration if duration in dict((b[0], b) for b in DURATION_BUCKETS) else None
+    sort = sort if sort in dict(SORT_OPTIONS) else 'relevance'
+
+    selected = {'difficulty': difficulty, 'price_band': price_band, 'duration_bucket': duration}
+
+    hits_sql, hits_params = _hits_sql(query, sort, available_only)
+
+    page_clauses, page_params = ['1 = 1'], []
+    for column, value in selected.items():
+        if value is not None:
+            page_clauses.append(f'{column} = %s')
+            page_params.append(value)
+    if after is not None:
+        page_clauses.append('(score > %s OR (score = %s AND id > %s))')
+        page_params += [after[0], after[0], after[1]]
+    limit_sql = ''
+    if limit is not None:
+        # Fetch one extra row to learn whether another page exists
+        limit_sql = ' LIMIT %s'
+        page_params.append(limit + 1)
+
+    # The page of ids plus a difficulty x price x duration cube (at most 48
+    # rows) from which the total and every facet count are derived
+    sql = (
+        f"WITH hits AS ({hits_sql}) "
+        f"SELECT * FROM (SELECT 'hit' AS kind, CAST(id AS VARCHAR(20)) AS value, score AS amount "
+        f"FROM hits WHERE {' AND '.join(page_clauses)} ORDER BY score, id{limit_sql}) page "
+        f"UNION ALL "
+        f"SELECT 'cube', difficulty || '|' || price_band || '|' || duration_bucket, "
+        f"CAST(COUNT(*) AS DOUBLE PRECISION) FROM hits GROUP BY difficulty, price_band, duration_bucket"
+    )
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, hits_params + page_params)
+        rows = cursor.fetchall()
+
+    page = []
+    cube = []
+    for kind, value, amount in rows:
+        if kind == 'hit':
+            page.append((amount, int(value)))
+        else:
+            cube.append((dict(zip(selected, value.split('|'))), int(amount)))
+
+    def matches(cell, exclude=None):
+        return all(
+            value is None or cell[column] == value
+            for column, value in selected.items() if column != exclude
+        )
+
+    total = sum(count for cell, count in cube if matches(cell))
+    counts = {column: {} for column in selected}
+    for column in selected:
+        for cell, count in cube:
+            if matches(cell, exclude=column):
+                counts[column][cell[column]] = counts[column].get(cell[column], 0) + count
+
+    next_after = None
+    if limit is not None and len(page) > limit:
+        page = page[:limit]
+        next_after = page[-1]
+
+    packages = TourPackage.objects.select_related('availability').in_bulk([package_id for score, package_id in page])
+    results = [packages[package_id] for score, package_id in page if package_id in packages]
+
+    difficulty_labels = [(key, label) for key, label in TourPackage.DIFFICULTY_CHOICES]
+    facets = {
+        'difficulty': _facet(difficulty_labels, counts['difficulty'], difficulty),
+        'price': _facet([(b[0], b[1]) for b in PRICE_BANDS], counts['price_band'], price_band),
+        'duration': _facet([(b[0], b[1]) for b in DURATION_BUCKETS], counts['duration_bucket'], duration),
+    }
+
+    return {
+        'results': results,
+        'total': total,
+        'facets': facets,
+        'next_after': next_after,
+    }
+
+
+def _facet(options, counts, selected):
+    return [
+        {'value': key, 'label': label, 'count': counts.get(key, 0), 'selected': key == selected}
+        for key, label in options
+    ]
+
+
+def index_package(package):
+    """Add or refresh one package in the search index"""
+    if connection.vendor == 'sqlite':
+        columns = ', '.join(INDEXED_FIELDS)
+        placeholders = ', '.join(['%s'] * (len(INDEXED_FIELDS) + 1))
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [package.pk])
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE} (rowid, {columns}) VALUES ({placeholders})",
+                [package.pk] + [getattr(package, field) or '' for field in INDEXED_FIELDS]
+            )
+    elif connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE tours_tourpackage SET search_vector = {PG_SEARCH_VECTOR} WHERE id = %s",
+                [package.pk]
+            )
+
+
+def remove_package(package_id):
+    """Drop a deleted package from the search index"""
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [package_id])
@@ -0,0 +1,66 @@
+from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.dispatch import receiver
+from django.utils import timezone
+from tour_operator import catalog_cache, counters
+from .models import TourPackage, TourDate, TourImage
+from . import search
+from .availability import refresh_availability
+
+
+@receiver(post_save, sender=TourPackage)
+def index_tour_package(sender, instance, **kwargs):
+    search.index_package(instance)
+
+
+@receiver(post_delete, sender=TourPackage)
+def unindex_tour_package(sender, instance, **kwargs):
+    search.remove_package(instance.pk)
+
+
+@receiver(post_save, sender=TourPackage)
+@receiver(post_delete, sender=TourPackage)
+def tour_package_changed(sender, instance, **kwargs):
+    catalog_cache.bump('tours', f'tour:{instance.pk}')
+
+
+@receiver(post_save, sender=TourPackage)
+def tour_package_counted(sender, instance, created, **kwargs):
+    counters.saved(instance, created)
+
+
+@receiver(post_delete, sender=TourPackage)
+def tour_package_uncounted(sender, instance, **kwargs):
+    counters.deleted(instance)
+
+
+@receiver(post_save, sender=TourDate)
+@receiver(post_delete, sender=TourDate)
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+def tour_detail_changed(sender, instance, **kwargs):
+    catalog_cache.bump('tours', f'tour:{instance.tour_package_id}')
+
+
+@receiver(post_save, sender=TourDate)
+@receiver(post_delete, sender=TourDate)
+@receiver(post_save, sender=TourImage)
+@receiver(post_delete, sender=TourImage)
+def touch_tour_package(sender, instance, **kwargs):
+    # Dates and images have no timestamp of their own; the package's
+    # updated_at stands in for the whole resource in the catalog API
+    TourPackage.objects.filter(pk=instance.tour_package_id).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=TourPackage)
+def package_availability_changed(sender, instance, **kwargs):
+    refresh_availability(instance.pk)
+
+
+@receiver(post_save, sender=TourDate)
+@receiver(post_delete, sender=TourDate)
+def date_availability_changed(sender, instance, **kwargs):
+    # Deferred so dates deleted along with their package do not recreate
+    # the package's summary row mid-cascade
+    package_id = instance.tour_package_id
+    transaction.on_commit(lambda: refresh_availability(package_id))
@@ -0,0 +1,23 @@
+from django import template
+from django.core.files.storage import default_storage
+
+register = template.Library()
+
+
+@register.filter
+def srcset(variants, image_format='jpeg'):
+    """srcset attribute value for one format of an image's generated variants"""
+    if not variants:
+        return ''
+    return ', '.join(
+        f'{default_storage.url(name)} {width}w' for width, name in variants.get(image_format, [])
+    )
+
+
+@register.filter
+def variant_src(variants, fallback=''):
+    """URL of the largest JPEG variant, or `fallback` when none were generated"""
+    if not variants or not variants.get('jpeg'):
+        return fallback
+    width, name = variants['jpeg'][-1]
+    return default_storage.url(name)
@@ -1,3 +1,104 @@
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.test import TestCase
 
-# Create your tests here.
+from .models import TourDate, TourPackage
+from .search import search_packages
+
+
+def create_package(name='Alpine trek', price=100, **fields):
+    values = {
+        'description': '', 'duration': 2, 'max_participants': 10, 'difficulty': 'easy', 'location': 'Test',
+        'included_services': '', 'excluded_services': '', 'itinerary': '',
+    }
+    values.update(fields)
+    return TourPackage.objects.create(name=name, price=price, **values)
+
+
+def create_date(package, days_ahead=30, spots=10):
+    start = date.today() + timedelta(days=days_ahead)
+    return TourDate.objects.create(
+        tour_package=package, start_date=start, end_date=start + timedelta(days=1), available_spots=spots,
+    )
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.package = create_package()
+        cls.tour_date = create_date(cls.package)
+
+    def setUp(self):
+        cache.clear()
+
+    def detail(self):
+        return self.client.get(f'/tours/{self.package.pk}/').content.decode()
+
+    def test_pages_are_served_from_the_cache(self):
+        self.assertIn('Alpine trek', self.detail())
+        # A write that skips the signals leaves the cached page in place
+        TourPackage.objects.filter(pk=self.package.pk).update(name='Coastal walk')
+        self.assertIn('Alpine trek', self.detail())
+
+    def test_saving_a_package_invalidates_its_pages(self):
+        self.assertIn('Alpine trek', self.detail())
+        self.assertIn('Alpine trek', self.client.get('/tours/').content.decode())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.package.name = 'Coastal walk'
+            self.package.save()
+        self.assertIn('Coastal walk', self.detail())
+        self.assertIn('Coastal walk', self.client.get('/tours/').content.decode())
+
+    def test_saving_a_date_invalidates_the_tour_page(self):
+        self.assertIn('10 spots', self.detail())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tour_date.available_spots = 7
+            self.tour_date.save()
+        self.assertIn('7 spots', self.detail())
+
+    def test_signed_in_visitors_are_not_cached(self):
+        self.client.force_login(User.objects.create_user('visitor'))
+        self.assertIn('Alpine trek', self.detail())
+        TourPackage.objects.filter(pk=self.package.pk).update(name='Coastal walk')
+        self.assertIn('Coastal walk', self.detail())
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.trek = create_package('Alpine trek', price=800, difficulty='difficult', location='Alps')
+        cls.lakes = create_package('Lake cruise', price=300, itinerary='Day 3: alpine meadows')
+        cls.hidden = create_package('Alpine hut', price=300, is_active=False)
+
+    def names(self, result):
+        return [package.name for package in result['results']]
+
+    def test_name_matches_rank_first(self):
+        self.assertEqual(self.names(search_packages('alpine')), ['Alpine trek', 'Lake cruise'])
+        # Words match by prefix, and inactive packages never show
+        self.assertEqual(self.names(search_packages('alp')), ['Alpine trek', 'Lake cruise'])
+
+    def test_saving_and_deleting_update_the_index(self):
+        self.lakes.itinerary = 'Day 3: harbour'
+        self.lakes.save()
+        self.assertEqual(self.names(search_packages('alpine')), ['Alpine trek'])
+        self.assertEqual(self.names(search_packages('harbour')), ['Lake cruise'])
+        self.trek.delete()
+        self.assertEqual(search_packages('alpine')['total'], 0)
+
+    def test_facets_ignore_their_own_filter(self):
+        result = search_packages('', difficulty='easy')
+        self.assertEqual(self.names(result), ['Lake cruise'])
+        counts = {facet['value']: facet['count'] for facet in result['facets']['difficulty']}
+        self.assertEqual((counts['easy'], counts['difficult']), (1, 1))
+        prices = {facet['value']: facet['count'] for facet in result['facets']['price']}
+        self.assertEqual((prices['under-500'], prices['500-1000']), (1, 0))
+
+    def test_pages_follow_the_ranking(self):
+        first = search_packages('alpine', limit=1)
+        self.assertEqual((self.names(first), first['total']), (['Alpine trek'], 2))
+        second = search_packages('alpine', limit=1, after=first['next_after'])
+        self.assertEqual(self.names(second), ['Lake cruise'])
+        self.assertIsNone(second['next_after'])
@@ -0,0 +1,58 @@
+"""
+Image resizing for the tour image pipeline.
+
+This module only depends on Pillow, never on Django, so render_variants()
+can run in a freshly spawned worker process (see tours.image_pipeline).
+"""
+import base64
+import io
+
+from PIL import Image, ImageOps
+
+# Widths generated for every image; widths larger than the source are skipped
+VARIANT_WIDTHS = [320, 640, 1280]
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+LQIP_WIDTH = 24
+
+
+def _resize(image, width):
+    if image.width <= width:
+        return image
+    height = max(1, round(image.height * width / image.width))
+    return image.resize((width, height), Image.LANCZOS)
+
+
+def _encode(image, image_format, options):
+    buffer = io.BytesIO()
+    image.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def render_variants(data, widths=VARIANT_WIDTHS):
+    """
+    Decode source image bytes and encode every variant.
+
+    Returns {'width', 'height', 'lqip', 'files'} where files is a list of
+    (format, width, encoded bytes) and lqip is a tiny blurred JPEG data URI
+    to show while the real image loads.
+    """
+    with Image.open(io.BytesIO(data)) as source:
+        image = ImageOps.exif_transpose(source).convert('RGB')
+
+    targets = sorted({min(width, image.width) for width in widths})
+    files = []
+    for width in targets:
+        resized = _resize(image, width)
+        for name, (image_format, options) in FORMATS.items():
+            files.append((name, resized.width, _encode(resized, image_format, options)))
+
+    placeholder = _encode(_resize(image, LQIP_WIDTH), 'JPEG', {'quality': 40})
+    return {
+        'width': image.width,
+        'height': image.height,
+        'lqip': 'data:image/jpeg;base64,' + base64.b64encode(placeholder).decode('ascii'),
+        'files': files,
+    }
@@ -1,19 +1,89 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse, JsonResponse
-from .models import TourPackage, TourDate
+from django.db.models import Prefetch
+from .models import TourPackage, TourDate, TourImage
+from .search import SORT_OPTIONS, search_packages
+from tour_operator.pagination import PAGE_SIZE, CursorPage, decode_cursor, encode_cursor
+from tour_operator.catalog_cache import cache_public_page, catalog_version
 
+# GET parameter for each search facet
+FACET_PARAMS = {'difficulty': 'difficulty', 'price': 'price', 'duration': 'duration'}
+
+@cache_public_page('tours')
 def tour_list(request):
-    tours = TourPackage.objects.filter(is_active=True)
-    return render(request, 'tours/tour_list.html', {'tours': tours})
+    query = request.GET.get('q', '').strip()
+    after = decode_cursor(request.GET.get('after'))
+    if after and len(after) != 2:
+        after = None
+    available_only = request.GET.get('available') == '1'
+    search = search_packages(
+        query,
+        difficulty=request.GET.get('difficulty'),
+        price_band=request.GET.get('price'),
+        duration=request.GET.get('duration'),
+        limit=PAGE_SIZE,
+        after=after,
+        sort=request.GET.get('sort'),
+        available_only=available_only,
+    )
+    next_after = search['next_after']
+    page = CursorPage(search['results'], request.GET, next_cursor=encode_cursor(next_after) if next_after else None)
+
+    # Link each facet option to the current search with that option toggled
+    for facet, param in FACET_PARAMS.items():
+        for option in search['facets'][facet]:
+            params = request.GET.copy()
+            params.pop('after', None)
+            if option['selected']:
+                params.pop(param, None)
+            else:
+                params[param] = option['value']
+            option['querystring'] = params.urlencode()
+
+    # Cursors are only valid for the ordering they were issued under
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('sort', None)
+    sort_options = []
+    for value, label in SORT_OPTIONS:
+        params['sort'] = value
+        sort_options.append({
+            'label': label,
+            'querystring': params.urlencode(),
+            'selected': request.GET.get('sort', 'relevance') == value,
+        })
+    params = request.GET.copy()
+    params.pop('after', None)
+    params.pop('available', None)
+    if not available_only:
+        params['available'] = '1'
 
+    return render(request, 'tours/tour_list.html', {
+        'tours': page,
+        'page': page,
+        'total': search['total'],
+        'facets': search['facets'],
+        'query': query,
+        'sort_options': sort_options,
+        'available_only': available_only,
+        'available_querystring': params.urlencode(),
+    })
+
+@cache_public_page('tour:{tour_id}')
 def tour_detail(request, tour_id):
-    tour = get_object_or_404(TourPackage, id=tour_id, is_active=True)
+    gallery = Prefetch('images', queryset=TourImage.objects.order_by('display_order', 'created_at'))
+    tour = get_object_or_404(TourPackage.objects.prefetch_related(gallery), id=tour_id, is_active=True)
     tour_dates = TourDate.objects.filter(tour_package=tour, is_available=True)
     return render(request, 'tours/tour_detail.html', {
         'tour': tour,
-        'tour_dates': tour_dates
+        'tour_dates': tour_dates,
+        'cache_version': catalog_version(f'tour:{tour.id}'),
     })
 
+@cache_public_page('tours')
 def home(request):
-    featured_tours = TourPackage.objects.filter(is_active=True)[:6]
-    return render(request, 'tours/home.html', {'featured_tours': featured_tours})
+    featured_tours = TourPackage.objects.filter(is_active=True).select_related('availability')[:6]
+    return render(request, 'tours/home.html', {
+        'featured_tours': featured_tours,
+        'cache_version': catalog_version('tours'),
+    })